@@ -1,6 +1,12 @@
 import math
+import numpy as np
+
+# Max. number of iterations of xyz2llh (it converges to 1e-6 m in less
+# than 5 iterations for points above the Earth's surface)
+XYZ2LLH_MAX_ITER = 20
 
 # Ref.: ESA_GNSS-Book_TM-23_Vol_I.pdf Section B.1.2 (Appendix B)
+# x, y, z can be scalars or arrays of points
 def xyz2llh(x,y,z):
     # --- WGS84 constants
     a = 6378137.0
@@ -8,34 +14,48 @@ def xyz2llh(x,y,z):
     # --- derived constants
     b = a - f*a
     e = math.sqrt(math.pow(a,2.0)-math.pow(b,2.0))/a
-    clambda = math.atan2(y,x)
-    p = math.sqrt(pow(x,2.0)+pow(y,2))
-    h_old = 0.0
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    clambda = np.arctan2(y,x)
+    p = np.sqrt(x**2 + y**2)
     # first guess with h=0 meters
-    theta = math.atan2(z,p*(1.0-math.pow(e,2.0)))
-    cs = math.cos(theta)
-    sn = math.sin(theta)
-    N = math.pow(a,2.0)/math.sqrt(math.pow(a*cs,2.0)+math.pow(b*sn,2.0))
-    h = p/cs - N
-    while abs(h-h_old) > 1.0e-6:
-        try:
+    theta = np.arctan2(z,p*(1.0-e**2))
+    cs = np.cos(theta)
+    N = a**2/np.sqrt((a*cs)**2+(b*np.sin(theta))**2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h = p/cs - N
+        # iterate all the points until all of them have converged
+        for Iter in range(XYZ2LLH_MAX_ITER):
             h_old = h
-            theta = math.atan2(z,p*(1.0-math.pow(e,2.0)*N/(N+h)))
-            cs = math.cos(theta)
-            sn = math.sin(theta)
-            N = math.pow(a,2.0)/math.sqrt(math.pow(a*cs,2.0)+math.pow(b*sn,2.0))
-            h = p/cs - N
-        except:
-            pass
+            theta_new = np.arctan2(z,p*(1.0-e**2*N/(N+h)))
+            cs_new = np.cos(theta_new)
+            N_new = a**2/np.sqrt((a*cs_new)**2+(b*np.sin(theta_new))**2)
+            h_new = p/cs_new - N_new
+            # keep the previous values of the points that cannot be updated
+            Ok = np.isfinite(h_new)
+            theta = np.where(Ok, theta_new, theta)
+            cs = np.where(Ok, cs_new, cs)
+            N = np.where(Ok, N_new, N)
+            h = np.where(Ok, h_new, h)
+            if not np.any(np.abs(h-h_old) > 1.0e-6):
+                break
     Rad2Deg = 180.0 / math.pi
+    if np.ndim(h) == 0:
+        return float(clambda) * Rad2Deg, float(theta) * Rad2Deg, float(h)
     return clambda * Rad2Deg, theta * Rad2Deg, h
 
 # Ref.: ESA_GNSS-Book_TM-23_Vol_I.pdf Section B.1.1 (Appendix B)
+# lon, lat, h can be scalars or arrays of points
 def llh2xyz(lon,lat,h):
-    N = (6378137.0 / math.sqrt(1 - 0.0066943799901*(math.sin(math.radians(lat))**2)))
+    lon = np.radians(lon)
+    lat = np.radians(lat)
+    N = (6378137.0 / np.sqrt(1 - 0.0066943799901*(np.sin(lat)**2)))
 
-    X = (N+h)*(math.cos(math.radians(lat))*math.cos(math.radians(lon)))
-    Y = (N+h)*(math.cos(math.radians(lat))*math.sin(math.radians(lon)))
-    Z = ((1-0.0066943799901)*N + h)*(math.sin(math.radians(lat))) 
+    X = (N+h)*(np.cos(lat)*np.cos(lon))
+    Y = (N+h)*(np.cos(lat)*np.sin(lon))
+    Z = ((1-0.0066943799901)*N + h)*(np.sin(lat))
 
+    if np.ndim(X) == 0:
+        return float(X), float(Y), float(Z)
     return X,Y,Z
@@ -37,7 +37,11 @@ def modulo(a,b):
 
 
 def findSun(Year, Doy, Sod):
-    
+
+    # Sod can be a single epoch or an array of epochs of the day
+    Scalar = np.ndim(Sod) == 0
+    Sod = np.atleast_1d(np.asarray(Sod, dtype=np.float64))
+
     d2r = np.pi/180
     AU = 1.49597870e8
 
@@ -54,19 +58,88 @@ def findSun(Year, Doy, Sod):
     slp = (slong-0.005686)*d2r
     sind = np.sin(obliq)* np.sin(slp)
     cosd = np.sqrt(1-sind*sind)
-    sdec = atan2(sind,cosd)/d2r
+    sdec = np.arctan2(sind,cosd)/d2r
     
-    sra = 180 - atan2(sind/cosd/np.tan(obliq),-np.cos(slp)/cosd)/d2r
+    sra = 180 - np.arctan2(sind/cosd/np.tan(obliq),-np.cos(slp)/cosd)/d2r
     
-    sunPosition = np.ones(3)
-    sunPosition[0] = np.cos(sdec*d2r) * np.cos((sra)*d2r) * AU
-    sunPosition[1] = np.cos(sdec*d2r) * np.sin((sra)*d2r) * AU
-    sunPosition[2] = np.sin(sdec*d2r) * AU
+    sunPosition = np.empty((len(Sod), 3))
+    sunPosition[:, 0] = np.cos(sdec*d2r) * np.cos((sra)*d2r) * AU
+    sunPosition[:, 1] = np.cos(sdec*d2r) * np.sin((sra)*d2r) * AU
+    sunPosition[:, 2] = np.sin(sdec*d2r) * AU
     
     # Rotate from inertial to non inertial system (ECI to ECEF)
-    sunPosition = rotate(sunPosition, gstr*d2r, 3)
+    angle = gstr*d2r
+    x = sunPosition[:, 0].copy()
+    sunPosition[:, 0] =  x*np.cos(angle) + sunPosition[:, 1]*np.sin(angle)
+    sunPosition[:, 1] = -x*np.sin(angle) + sunPosition[:, 1]*np.cos(angle)
     
     # print("SUNPOS", JDN, Sod, sdec, sra, slp, sind, cosd, sunPosition)
 
+    if Scalar:
+        return sunPosition[0]
+
     return sunPosition
 
+
+def buildSunTable(Year, Doy, Step):
+
+    # Purpose: compute the Sun positions of a whole day at a regular step,
+    #          so that findSun runs once per day
+
+    # Parameters
+    # ==========
+    # Year, Doy: int
+    #         Day
+    # Step: float
+    #         Step of the table [s]
+
+    # Returns
+    # =======
+    # SunTable: dict
+    #         SunTable["SOD"]: epochs of the table, from 0 to 86400 [s]
+    #         SunTable["POS"]: Sun position in ECEF at each epoch (N x 3)
+
+    Sods = np.arange(0, 86400 + Step, Step, dtype=np.float64)
+    Sods = Sods[Sods <= 86400]
+
+    return {"SOD": Sods, "POS": findSun(Year, Doy, Sods)}
+
+
+def interpolateSun(SunTable, Sod):
+
+    # Purpose: get the Sun position from the day table, interpolating
+    #          linearly between the table epochs
+
+    # Parameters
+    # ==========
+    # SunTable: dict
+    #         Sun table as built by buildSunTable
+    # Sod: float or np.array
+    #         Epoch or epochs [s]
+
+    # Returns
+    # =======
+    # SunPos: np.array
+    #         Sun position in ECEF (3, or N x 3 for an array of epochs)
+
+    Scalar = np.ndim(Sod) == 0
+    Sod = np.atleast_1d(np.asarray(Sod, dtype=np.float64))
+    Sods = SunTable["SOD"]
+
+    # Bracketing epochs of the table
+    Up = np.clip(np.searchsorted(Sods, Sod), 1, len(Sods) - 1)
+    Down = Up - 1
+    Weight = ((Sod - Sods[Down]) / (Sods[Up] - Sods[Down]))[:, None]
+
+    SunPos = SunTable["POS"][Down] + Weight * (SunTable["POS"][Up] - SunTable["POS"][Down])
+
+    # Epochs of the table take the table value directly
+    OnNode = Sods[Up] == Sod
+    SunPos[OnNode] = SunTable["POS"][Up[OnNode]]
+    OnNode = Sods[Down] == Sod
+    SunPos[OnNode] = SunTable["POS"][Down[OnNode]]
+
+    if Scalar:
+        return SunPos[0]
+
+    return SunPos
@@ -1,7 +1,11 @@
 
 import sys, os
 import matplotlib as mpl
+# Figures are only saved to files: use the non-interactive backend, so
+# that they can be rendered without display and in worker processes
+mpl.use("Agg")
 import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import numpy as np
 import conda
@@ -16,6 +20,10 @@ import matplotlib.cbook
 
 from COMMON import GnssConstants
 
+# Markers of the Lines plots that are only line styles (their series
+# are drawn as a LineCollection)
+LINE_STYLES = ["-", "--", "-.", ":"]
+
 def createFigure(PlotConf):
     try:
         fig, ax = plt.subplots(1, 1, figsize = PlotConf["FigSize"])
@@ -163,22 +171,33 @@ def generateLinesPlot(PlotConf):
         if key == "Map" and PlotConf[key] == True:
             drawMap(PlotConf, ax)
 
-    for Label in PlotConf["yData"].keys():
-
-        if "ColorBarDiscrete" in PlotConf:
-            z_data = np.array(PlotConf["zData"][Label].str.slice(1).astype(int))
-            colorbar = cmap(normalize(z_data))
-        else: 
-            colorbar = cmap(normalize(np.array(PlotConf["zData"][Label])))
+    # Points of all the series, drawn at once in a single scatter call
+    # (in the order of the series, so the last ones are on top)
+    xBatch = []
+    yBatch = []
+    cBatch = []
+    xBatch2 = []
+    yBatch2 = []
+    # Segments of all the series, drawn at once as a LineCollection
+    Segments = []
 
+    for Label in PlotConf["yData"].keys():
 
         if "ColorBar" in PlotConf:
             try:
-                ax.scatter(PlotConf["xData"][Label], PlotConf["yData"][Label], 
-                marker = PlotConf["Marker"],
-                s = PlotConf["MarkerSize"],
-                linewidth = LineWidth,
-                c = colorbar)
+                if "ColorBarDiscrete" in PlotConf:
+                    z_data = np.array(PlotConf["zData"][Label].str.slice(1).astype(int))
+                    colorbar = cmap(normalize(z_data))
+                else: 
+                    colorbar = cmap(normalize(np.array(PlotConf["zData"][Label])))
+
+                x_batch = np.asarray(PlotConf["xData"][Label], dtype=float).ravel()
+                y_batch = np.asarray(PlotConf["yData"][Label], dtype=float).ravel()
+                if len(x_batch) == len(y_batch) == len(colorbar):
+                    xBatch.append(x_batch)
+                    yBatch.append(y_batch)
+                    cBatch.append(colorbar.reshape(-1, 4))
+
                 if "Annotation" in PlotConf:
                     x_data = np.array(PlotConf["xData"][Label])
                     y_data = np.array(PlotConf["yData"][Label])
@@ -219,18 +238,52 @@ def generateLinesPlot(PlotConf):
 
             try:
                 if PlotConf["AddPlot"] == 1:
-                    ax.scatter(PlotConf["xData2"][Label], PlotConf["yData2"][Label], 
-                        marker = PlotConf["Marker"], 
-                        s = PlotConf["MarkerSize"],
-                        linewidth = LineWidth,
-                        c = "grey")
+                    x_batch = np.asarray(PlotConf["xData2"][Label], dtype=float).ravel()
+                    y_batch = np.asarray(PlotConf["yData2"][Label], dtype=float).ravel()
+                    if len(x_batch) == len(y_batch):
+                        xBatch2.append(x_batch)
+                        yBatch2.append(y_batch)
             except:
                 pass
+
+        elif PlotConf["Marker"] in LINE_STYLES:
+            Segments.append(np.column_stack((
+                np.asarray(PlotConf["xData"][Label], dtype=float).ravel(),
+                np.asarray(PlotConf["yData"][Label], dtype=float).ravel())))
+
         else:
             ax.plot(PlotConf["xData"][Label], PlotConf["yData"][Label],
             PlotConf["Marker"],
             linewidth = LineWidth)
 
+    if len(xBatch) > 0:
+        try:
+            ax.scatter(np.concatenate(xBatch), np.concatenate(yBatch), 
+            marker = PlotConf["Marker"],
+            s = PlotConf["MarkerSize"],
+            linewidth = LineWidth,
+            c = np.concatenate(cBatch))
+        except:
+            pass
+
+    if len(xBatch2) > 0:
+        try:
+            ax.scatter(np.concatenate(xBatch2), np.concatenate(yBatch2), 
+                marker = PlotConf["Marker"], 
+                s = PlotConf["MarkerSize"],
+                linewidth = LineWidth,
+                c = "grey")
+        except:
+            pass
+
+    if len(Segments) > 0:
+        # One line per series, with the colors of the default cycle
+        Colors = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+        ax.add_collection(LineCollection(Segments,
+        colors = [Colors[i % len(Colors)] for i in range(len(Segments))],
+        linestyles = PlotConf["Marker"],
+        linewidths = LineWidth))
+        ax.autoscale_view()
 
 
     saveFigure(fig, PlotConf["Path"])
@@ -1,136 +1,363 @@
 from InputOutput import LeoPosIdx, LeoQuatIdx, SatPosIdx, SatApoIdx, SatClkIdx, SatBiaIdx
+from InputOutput import groupBySatellite, getSatLabels
+from InputOutput import SatSlotLabels, SatSlotIdx
+from collections import OrderedDict
 import numpy as np
 
 from COMMON import GnssConstants as Const
 from COMMON.Misc import modulo
 from COMMON.Dates import convertYearDoy2JulianDay
 
-def computeLeoComPos(Sod, LeoPosInfo):
+# Number of SP3 samples used in the Lagrange interpolation
+SP3_INTERP_POINTS = 10
 
-    xPos = yPos = zPos = None
+def buildLeoPosStore(LeoPosInfo):
 
-    # try:      # If LeoPosInfo is a dictionary
-    #     # First we ensure Sod index
-    #     sod_index = LeoPosInfo.get("SOD").index(Sod)
+    # Purpose: build the LEO trajectory store from the positions read for
+    #          the day, so that computeLeoComPos does not need to copy and
+    #          scan the whole table for every satellite and epoch
 
-    #     # Iterate the keys of a given dictionary to acquire x, y and z position
-    #     for key in LeoPosInfo.keys():
+    # Parameters
+    # ==========
+    # LeoPosInfo: DataFrame
+    #         LEO POS file info as returned by readLeoPos
 
-    #         # In case of finding one of them, it takes a list (value associated to that key) and finds the correspondent value using sod_index
-    #         if "x" in key:
-    #             xPos = LeoPosInfo.get(key)[sod_index]
+    # Returns
+    # =======
+    # LeoPosStore: dict
+    #         LeoPosStore["SOD"]: epochs [s], sorted
+    #         LeoPosStore["XYZ"]: CoM positions [m], one row per epoch
 
-    #         elif "y" in key:
-    #             yPos = LeoPosInfo.get(key)[sod_index]
+    Sods = LeoPosInfo[LeoPosIdx["SOD"]].to_numpy(dtype=np.float64)
 
-    #         elif "z" in key:
-    #             zPos = LeoPosInfo.get(key)[sod_index]
+    # Sort by SOD, keeping the file order of repeated epochs
+    Order = np.argsort(Sods, kind='stable')
 
-    # except:
-    #     pass
+    # Positions from km to m
+    Xyz = LeoPosInfo[[LeoPosIdx["xCM"], LeoPosIdx["yCM"], LeoPosIdx["zCM"]]].to_numpy()[Order] * 1000
 
-    try:
-        LeoPosInfo = LeoPosInfo.to_numpy()
-        value_position = np.where(LeoPosInfo[:,LeoPosIdx["SOD"]] == Sod)[0][0]
+    LeoPosStore = {
+        "SOD": np.ascontiguousarray(Sods[Order]),
+        "XYZ": np.ascontiguousarray(Xyz),
+    }
 
-        xPos = LeoPosInfo[value_position:, LeoPosIdx["xCM"]][0]*1000
-        yPos = LeoPosInfo[value_position:, LeoPosIdx["yCM"]][0]*1000
-        zPos = LeoPosInfo[value_position:, LeoPosIdx["zCM"]][0]*1000
-    except:
-        pass
+    return LeoPosStore
 
-    return (xPos, yPos, zPos)
+def interpolateLeoPos(Sods, LeoPosStore):
 
+    # Purpose: get the LEO CoM positions at a set of epochs. Epochs of the
+    #          store take the stored position, other epochs within the
+    #          store span are interpolated with a Lagrange polynomial
 
-# -----------------------------------------------------------------------------------------------------------------------
+    # Parameters
+    # ==========
+    # Sods: np.array
+    #         Epochs [s]
+    # LeoPosStore: dict
+    #         LEO trajectory store as built by buildLeoPosStore
 
-def computeSatClkBias(Sod, SatLabel, SatClkInfo):
-    # Things to discuss, there are cases where the Sod is 20 but this clk uses jump of 30 seconds
-    clock_bias = 0
-    close_value_down = close_value_up = 0   # In case of not having any Sod similar, interpolate between the closest values
+    # Returns
+    # =======
+    # LeoComPos: np.array
+    #         CoM positions [m], one row per epoch (0 if not available)
+    # Valid: np.array
+    #         True where the position is available
+
+    Sods = np.atleast_1d(np.asarray(Sods, dtype=np.float64))
+    Times = LeoPosStore["SOD"]
+    Xyz = LeoPosStore["XYZ"]
+    NSamples = len(Times)
 
-    # Setting decimal precision for flaots
-    # np.set_printoptions(suppress=True, precision=32)    # Force pandas to work in complete notation and not scientific notation
-    np.set_printoptions(precision=32)       # Set precision of np to 32 to use all decimals
+    LeoComPos = np.zeros((len(Sods), 3))
+    if NSamples == 0:
+        return LeoComPos, np.zeros(len(Sods), dtype=bool)
 
-    # First, filter by satellite
-    SatClkInfo = SatClkInfo[SatClkInfo[SatClkIdx["CONST"]] == SatLabel[:1]]
-    SatClkInfo = SatClkInfo[SatClkInfo[SatClkIdx["PRN"]] == SatLabel[1:]]
+    Valid = (Sods >= Times[0]) & (Sods <= Times[-1])
 
-    # Converting SOD from object to int
-    SatClkInfo[SatClkIdx["SOD"]] = SatClkInfo[SatClkIdx["SOD"]].astype(int)     # Convert SOD Column from object type to int type
+    # Epochs of the store
+    Idx = np.minimum(np.searchsorted(Times, Sods), NSamples - 1)
+    OnNode = Valid & (Times[Idx] == Sods)
+    LeoComPos[OnNode] = Xyz[Idx[OnNode]]
+
+    # Epochs between samples
+    Interp = Valid & ~OnNode
+    if np.any(Interp):
+        Start, End = findInterpWindow(Times, Sods[Interp], SP3_INTERP_POINTS)
+        Win = Start[:, None] + np.arange(End[0] - Start[0])
+        LeoComPos[Interp] = interpolateLagrange(Sods[Interp], Times[Win], Xyz[Win])
+
+    return LeoComPos, Valid
+
+def computeLeoComPos(Sod, LeoPosInfo):
 
-    try:
-        if Sod in SatClkInfo[SatClkIdx["SOD"]].unique():                     # SatClkInfo returns object type, not int or float type
-            # Get values of SatClkInfo filtered
-            SatClkInfo = SatClkInfo[SatClkInfo[SatClkIdx["SOD"]] == Sod].values
+    # Purpose: get the LEO CoM position at an epoch
 
-            # Get a value of np in the column SatClkIdx["CLK-BIAS"] and in every row and set it to np.float64
-            # set to np.float64 and getting the first value of the given array
-            clock_bias = SatClkInfo[:, SatClkIdx["CLK-BIAS"]].astype(np.float64)[0]
+    # Parameters
+    # ==========
+    # Sod: float
+    #         Epoch [s]
+    # LeoPosInfo: dict
+    #         LEO trajectory store as built by buildLeoPosStore
 
+    # Returns
+    # =======
+    # LeoComPos: np.array
+    #         CoM position [m] (None if the epoch is out of the store span)
 
-        else:
-            # First, we acquire the last element for cases lower than Sod, because un case of having more than 1 option, 
-            # the closer one is the last position of the array
-            close_value_down = SatClkInfo[SatClkInfo[SatClkIdx["SOD"]] < Sod][-1:]     # Getting the last element for cases lower than Sod
-            close_value_down = close_value_down.values
+    # Direct lookup of the epochs of the store
+    Idx = np.searchsorted(LeoPosInfo["SOD"], Sod)
+    if Idx < len(LeoPosInfo["SOD"]) and LeoPosInfo["SOD"][Idx] == Sod:
+        return LeoPosInfo["XYZ"][Idx]
 
-            close_value_up = SatClkInfo[SatClkInfo[SatClkIdx["SOD"]] > Sod][:1]        # Getting the first element for cases higher than Sod
-            close_value_up = close_value_up.values
+    LeoComPos, Valid = interpolateLeoPos([Sod], LeoPosInfo)
+    if not Valid[0]:
+        return None
+
+    return LeoComPos[0]
+
+
+# -----------------------------------------------------------------------------------------------------------------------
+
+def buildSatClkStore(SatClkInfo):
+
+    # Purpose: build the clock store of the day from the per-satellite 
+    #          clock table, with the samples of all the satellites in 
+    #          single arrays so that the clocks of all the satellites of
+    #          an epoch are bracketed with one binary search
+
+    # Parameters
+    # ==========
+    # SatClkInfo: dict
+    #         Per-satellite clock table as returned by readSatClk
+
+    # Returns
+    # =======
+    # SatClkStore: dict
+    #         Samples of all the satellites, in satellite slot order (see 
+    #         SatSlotIdx), after a NaN sample
+    #         SatClkStore["SOD"], SatClkStore["CLK-BIAS"]: samples
+    #         SatClkStore["Start"], SatClkStore["End"]: samples of each
+    #         slot, SatClkStore["SOD"][Start[Slot]:End[Slot]]
+    #         SatClkStore["Key"]: search key of the samples (see 
+    #         getSatClkKey), sorted
+
+    NSlots = len(SatSlotLabels)
+    Sods = [np.full(1, np.nan)]
+    ClkBias = [np.full(1, np.nan)]
+    NSamples = np.zeros(NSlots, dtype=int)
+    for Slot, SatLabel in enumerate(SatSlotLabels):
+        SatClk = SatClkInfo.get(SatLabel)
+        if SatClk is not None:
+            Sods.append(SatClk["SOD"])
+            ClkBias.append(SatClk["CLK-BIAS"])
+            NSamples[Slot] = len(SatClk["SOD"])
+
+    SatClkStore = OrderedDict({})
+    SatClkStore["SOD"] = np.concatenate(Sods)
+    SatClkStore["CLK-BIAS"] = np.concatenate(ClkBias)
+    SatClkStore["End"] = 1 + np.cumsum(NSamples)
+    SatClkStore["Start"] = SatClkStore["End"] - NSamples
+
+    # The key separates the SODs of the slots in consecutive bands
+    Slots = np.repeat(np.arange(NSlots), NSamples)
+    SatClkStore["MinSod"] = np.min(SatClkStore["SOD"][1:], initial=0.0)
+    SatClkStore["Band"] = np.max(SatClkStore["SOD"][1:] - SatClkStore["MinSod"], 
+    initial=0.0) + 2.0
+    SatClkStore["Key"] = np.r_[-np.inf, getSatClkKey(SatClkStore, Slots, 
+    SatClkStore["SOD"][1:])]
+
+    return SatClkStore
+
+# End of buildSatClkStore()
+
+def getSatClkKey(SatClkStore, Slots, Sod):
+
+    # Purpose: get the search key of clock epochs: the SOD within the band
+    #          of the satellite slot (SODs out of the store span are 
+    #          clipped to the band)
+
+    return Slots * SatClkStore["Band"] + \
+        np.clip(Sod - SatClkStore["MinSod"], 0.0, SatClkStore["Band"] - 1.0)
+
+# End of getSatClkKey()
+
+def computeSatClkBias(Sod, SatLabel, SatClkInfo):
 
-            # The idea is to compute first the differences to get the pendent of the line, but doing this we will love the offset
-            # Then, we have to add this offset as a sum
+    # Get the clock samples of the satellite
+    Slot = SatSlotIdx.get(SatLabel)
+    if Slot is None:
+        return 0
 
-            clock_bias = (\
-                            (close_value_up[:, SatClkIdx["CLK-BIAS"]].astype(np.float64)[0] - close_value_down[:, SatClkIdx["CLK-BIAS"]].astype(np.float64)[0])/  \
-                            (close_value_up[:, SatClkIdx["SOD"]][0] - close_value_down[:, SatClkIdx["SOD"]][0]) \
-                        ) * Sod \
-                        + close_value_down[:, SatClkIdx["CLK-BIAS"]].astype(np.float64)[0]      # Adding the offset removed by the last expression
-    except:
-        pass
+    Sods = SatClkInfo["SOD"][SatClkInfo["Start"][Slot]:SatClkInfo["End"][Slot]]
+    ClkBias = SatClkInfo["CLK-BIAS"][SatClkInfo["Start"][Slot]:SatClkInfo["End"][Slot]]
+
+    # Bracket Sod with a binary search
+    Idx = np.searchsorted(Sods, Sod)
+
+    # Sod is one of the clock epochs
+    if Idx < len(Sods) and Sods[Idx] == Sod:
+        return ClkBias[Idx]
+
+    # No samples at both sides of Sod
+    if Idx == 0 or Idx == len(Sods):
+        return 0
+
+    # Linear interpolation between the closest samples
+    clock_bias = ClkBias[Idx - 1] + \
+        (ClkBias[Idx] - ClkBias[Idx - 1]) / (Sods[Idx] - Sods[Idx - 1]) * (Sod - Sods[Idx - 1])
 
     return clock_bias
 
+# End of computeSatClkBias()
+
+def computeSatClkBiasVect(Sod, SatLabels, SatClkInfo):
+
+    # Purpose: compute the clock bias of all the satellites of an epoch,
+    #          interpolating linearly the RINEX CLK samples, with a single
+    #          binary search for all of them
+
+    # Parameters
+    # ==========
+    # Sod: float or np.array
+    #         Epoch [s], one for all the satellites or one per satellite
+    # SatLabels: list
+    #         Satellite labels
+    # SatClkInfo: dict
+    #         Clock store as built by buildSatClkStore
+
+    # Returns
+    # =======
+    # ClkBias: np.array
+    #         Satellite clock biases (0 where they cannot be interpolated)
+
+    NSats = len(SatLabels)
+    Sod = np.broadcast_to(np.asarray(Sod, dtype=np.float64), (NSats,))
+    Slots = np.array([SatSlotIdx[SatLabel] for SatLabel in SatLabels], dtype=int)
+    Start = SatClkInfo["Start"][Slots]
+    End = SatClkInfo["End"][Slots]
+
+    # First sample after Sod of each satellite, kept within its samples
+    Up = np.searchsorted(SatClkInfo["Key"], getSatClkKey(SatClkInfo, Slots, Sod))
+    Up = np.minimum(np.maximum(Up, Start + 1), End - 1)
+    SodDown = SatClkInfo["SOD"][Up - 1]
+    SodUp = SatClkInfo["SOD"][Up]
+    ClkDown = SatClkInfo["CLK-BIAS"][Up - 1]
+    ClkUp = SatClkInfo["CLK-BIAS"][Up]
+
+    # Linear interpolation where Sod is between two samples
+    ClkBias = np.zeros(NSats)
+    Between = (End - Start >= 2) & (SodDown <= Sod) & (Sod <= SodUp)
+    ClkBias[Between] = ClkDown[Between] + (ClkUp[Between] - ClkDown[Between]) / \
+        (SodUp[Between] - SodDown[Between]) * (Sod[Between] - SodDown[Between])
+
+    # Take the clock samples as they are at their own epochs (a single 
+    # sample is only usable there)
+    AtUp = Between & (Sod == SodUp)
+    ClkBias[AtUp] = ClkUp[AtUp]
+    First = np.minimum(Start, len(SatClkInfo["SOD"]) - 1)
+    Single = (End - Start == 1) & (SatClkInfo["SOD"][First] == Sod)
+    ClkBias[Single] = SatClkInfo["CLK-BIAS"][First][Single]
+
+    return ClkBias
+
+# End of computeSatClkBiasVect()
+
 
 # -----------------------------------------------------------------------------------------------------------------------
 
-def computeRcvrApo(Conf, Year, Doy, Sod, SatLabel, LeoQuatInfo):
-    
+def buildLeoAttStore(LeoQuatInfo):
+
+    # Purpose: build the LEO attitude store from the quaternions read for
+    #          the day, with the rotation matrices of all the epochs
+    #          computed at once
+
+    # Parameters
+    # ==========
+    # LeoQuatInfo: DataFrame
+    #         LEO QUATERNIONS file info as returned by readLeoQuat
+
+    # Returns
+    # =======
+    # LeoAttStore: dict
+    #         LeoAttStore["SOD"]: epochs [s], sorted
+    #         LeoAttStore["ROT"]: Satellite Reference Frame to ECI rotation
+    #         matrix of each epoch (N x 3 x 3)
+    #         LeoAttStore["Epoch"]: receiver APOs of the last epoch computed
+    #         (see computeRcvrApoAll)
+
+    Sods = LeoQuatInfo[LeoQuatIdx["SOD"]].to_numpy(dtype=np.float64)
+
+    # Sort by SOD, keeping the file order of repeated epochs
+    Order = np.argsort(Sods, kind='stable')
+    q0, q1, q2, q3 = LeoQuatInfo[[LeoQuatIdx["q0"], LeoQuatIdx["q1"],
+    LeoQuatIdx["q2"], LeoQuatIdx["q3"]]].to_numpy()[Order].T
+
+    # Rotation Matrices of all the epochs
+    Rot = np.empty((len(Sods), 3, 3))
+    Rot[:, 0, 0] = (1 - 2*q2**2 - 2*q3**2)
+    Rot[:, 0, 1] = 2*(q1*q2 - q0*q3)
+    Rot[:, 0, 2] = 2*(q0*q2 + q1*q3)
+    Rot[:, 1, 0] = 2*(q1*q2 + q0*q3)
+    Rot[:, 1, 1] = (1 - 2*q1**2 - 2*q3**2)
+    Rot[:, 1, 2] = 2*(q2*q3 - q0*q1)
+    Rot[:, 2, 0] = 2*(q1*q3 - q0*q2)
+    Rot[:, 2, 1] = 2*(q0*q1 + q2*q3)
+    Rot[:, 2, 2] = (1 - 2*q1**2 - 2*q2**2)
+
+    LeoAttStore = {
+        "SOD": Sods[Order],
+        "ROT": Rot,
+        "Epoch": {},
+    }
+
+    return LeoAttStore
+
+def computeRcvrApoAll(Conf, Year, Doy, Sod, LeoAttStore):
+
+    # Purpose: compute the receiver APO in ECEF for both constellations at
+    #          an epoch. The attitude and Earth rotations are applied once
+    #          per epoch and the result is kept in the store, as all the
+    #          satellites of the epoch share it
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Year, Doy, Sod: int, int, float
+    #         Epoch
+    # LeoAttStore: dict
+    #         LEO attitude store as built by buildLeoAttStore
+
+    # Returns
+    # =======
+    # RcvrApo: dict
+    #         Receiver APO in ECEF [m] per constellation
+    #         RcvrApo["G"], RcvrApo["E"]
+    #         None if the LEO attitude of the epoch is not available
+
+    # Reuse the APOs of the epoch if they are already computed
+    Epoch = LeoAttStore["Epoch"]
+    if Epoch.get("Sod") == Sod:
+        return Epoch["RcvrApo"]
+
     # STEP 1: -------------------------------------------------------------------
     # Acquiring Center of Masses, Antenna Reference Frame and Phase Center Offset
     COM = Conf['LEO_COM_POS']
     ARP = Conf['LEO_ARP_POS']
 
-    if SatLabel[0] == 'G':
-        PCO = Conf['LEO_PCO_GPS']
-    elif SatLabel[0] == 'E':
-        PCO = Conf['LEO_PCO_GAL']
-
     # STEP 2: -------------------------------------------------------------------
     # Acquiring Antenna Phase Center by using the previous data
     COM_to_ARP = np.subtract(ARP, COM)
-    APC_at_SRF = np.add(COM_to_ARP, PCO)       # This is referred to the Satellite Reference Frame, use quarternials to move to ECI coordinates
+    APC_at_SRF = OrderedDict({})
+    APC_at_SRF["G"] = np.array(np.add(COM_to_ARP, Conf['LEO_PCO_GPS']))
+    APC_at_SRF["E"] = np.array(np.add(COM_to_ARP, Conf['LEO_PCO_GAL']))
 
     # STEP 3: -------------------------------------------------------------------
-    # Apply Satellite Quaternions to rotate the Satellite Frame Reference towards the Earth Centered Inertial (ECI) by building the Rotation Matrix
-    LeoQuatInfo = LeoQuatInfo[LeoQuatInfo[LeoQuatIdx["SOD"]] == Sod]
-
-    # Converting SOD from object to int
-    q0 = LeoQuatInfo[LeoQuatIdx["q0"]].iloc[0]
-    q1 = LeoQuatInfo[LeoQuatIdx["q1"]].iloc[0]
-    q2 = LeoQuatInfo[LeoQuatIdx["q2"]].iloc[0]
-    q3 = LeoQuatInfo[LeoQuatIdx["q3"]].iloc[0]
-
-    # Creating Rotation Matrix for later computation
-    rotation_matrix = np.array([[  (1 - 2*q2**2 - 2*q3**2),  2*(q1*q2 - q0*q3),         2*(q0*q2 + q1*q3)],
-                                [   2*(q1*q2 + q0*q3),       (1 - 2*q1**2 - 2*q3**2),   2*(q2*q3 - q0*q1)],
-                                [   2*(q1*q3 - q0*q2),       2*(q0*q1 + q2*q3),         (1 - 2*q1**2 - 2*q2**2)]
-                                ])
-
-    APC_at_SRF = np.array(APC_at_SRF)
-
-    APC_at_ECI = np.dot(rotation_matrix, APC_at_SRF)
+    # Satellite Reference Frame to ECI rotation of the epoch
+    Idx = np.searchsorted(LeoAttStore["SOD"], Sod)
+    if Idx == len(LeoAttStore["SOD"]) or LeoAttStore["SOD"][Idx] != Sod:
+        return None
+    rotation_matrix = LeoAttStore["ROT"][Idx]
 
     # STEP 4: -------------------------------------------------------------------
     # Convert ECI coordinates to ECEF coordinates with the simplified model for Greenwich Siderial Time
@@ -142,14 +369,31 @@ def computeRcvrApo(Conf, Year, Doy, Sod, SatLabel, LeoQuatInfo):
     gstr = modulo(279.690983 + 0.9856473354*JDN + 360*fday + 180, 360)      # Convert o radians and rotate it over the third axis (Applying Earth Rotation)
     gstr = np.deg2rad(gstr)     # Corvert it from degree to radian
 
-
     # Build rotation matrix for ECI to ECEF conversion based on GST
-    rotation_matrix = np.array([[np.cos(gstr),      np.sin(gstr),       0],
-                                [-np.sin(gstr),     np.cos(gstr),       0],
-                                [0,                 0,                  1]
-                                ])
+    gst_matrix = np.array([[np.cos(gstr),      np.sin(gstr),       0],
+                           [-np.sin(gstr),     np.cos(gstr),       0],
+                           [0,                 0,                  1]
+                           ])
+
+    RcvrApo = OrderedDict({})
+    for Constel, Apc in APC_at_SRF.items():
+        RcvrApo[Constel] = np.dot(gst_matrix, np.dot(rotation_matrix, Apc))
+
+    # Keep the APOs of the epoch
+    Epoch["Sod"] = Sod
+    Epoch["RcvrApo"] = RcvrApo
+
+    return RcvrApo
+
+def computeRcvrApo(Conf, Year, Doy, Sod, SatLabel, LeoQuatInfo):
 
-    APC_at_ECEF_coordinates = np.dot(rotation_matrix, APC_at_ECI)
+    # Receiver APO of the constellation of the satellite (None if the LEO
+    # attitude is not available)
+    RcvrApoAll = computeRcvrApoAll(Conf, Year, Doy, Sod, LeoQuatInfo)
+    if RcvrApoAll is None:
+        return None
+
+    APC_at_ECEF_coordinates = RcvrApoAll[SatLabel[0]]
 
     return APC_at_ECEF_coordinates
 
@@ -171,49 +415,183 @@ def lagrange_interpolation(x, x_values, y_values):
         y += y_values[i] * lagrange_basis(x, x_values, i)
     return y
 
-def computeSatComPos(TransmissionTime, SatPosInfo, SatLabel): # Apply Lagrange 10 points
-    
-    # Filter to get 10 points of its data
-    # This is not working because the step is about 300 points
-    # if Sod < 50:
-    #     n_min = 0
-    #     n_max = (100 - Sod) / 10
-    # else:
-    #     n_min = 1
-    #     n_min = 5
+def buildSatPosStore(SatPosInfo):
 
-    # SatPosInfo = SatPosInfo[SatPosInfo[SatPosIdx["SOD"]].astype(int) > n_min * Sod]
-    # SatPosInfo = SatPosInfo[SatPosInfo[SatPosIdx["SOD"]].astype(int) < (Sod + n_max*10) ]
-    SatPosInfo = SatPosInfo[SatPosInfo[SatPosIdx["CONST"]] == SatLabel[:1]]
-    SatPosInfo = SatPosInfo[SatPosInfo[SatPosIdx["PRN"]] == SatLabel[1:]]
+    # Purpose: build the per-satellite ephemeris store from the SP3 positions
+    #          read for the day, so that computeSatComPos does not need to
+    #          filter and re-cast the whole table for every satellite and epoch
 
+    # Parameters
+    # ==========
+    # SatPosInfo: DataFrame
+    #         SAT POS file info as returned by readSatPos
 
-    times = SatPosInfo[SatPosIdx["SOD"]].values
-    times = times.astype(int)
+    # Returns
+    # =======
+    # SatPosStore: dict
+    #         Ephemeris per satellite, sorted by SOD
+    #         SatPosStore["G01"]["SOD"]: epochs [s]
+    #         SatPosStore["G01"]["XYZ"]: CoM positions [m], one row per epoch
 
-    xSatPos = SatPosInfo[SatPosIdx["xCM"]].values
-    xSatPos = xSatPos.astype(float)
+    # Positions from km to m
+    Xyz = SatPosInfo[[SatPosIdx["xCM"], SatPosIdx["yCM"], SatPosIdx["zCM"]]].to_numpy() * 1000
 
-    ySatPos = SatPosInfo[SatPosIdx["yCM"]].values
-    ySatPos = ySatPos.astype(float)
+    SatPosStore = groupBySatellite(getSatLabels(SatPosInfo, SatPosIdx),
+    SatPosInfo[SatPosIdx["SOD"]].to_numpy(),
+    {"XYZ": Xyz})
 
-    zSatPos = SatPosInfo[SatPosIdx["zCM"]].values
-    zSatPos = zSatPos.astype(float)
+    return SatPosStore
 
-    # Get the indices of the 10 closest times to TransmissionTime
-    closest_indices = np.argsort(np.abs(times - TransmissionTime))[:10]
+def findInterpWindow(Times, Time, NPoints):
 
-    # Select the corresponding times and positions for interpolation
-    closest_times = times[closest_indices]
-    closest_x = xSatPos[closest_indices]*1000
-    closest_y = ySatPos[closest_indices]*1000
-    closest_z = zSatPos[closest_indices]*1000
+    # Purpose: find by bisection the window of NPoints samples closest to Time
+    #          in a sorted array of sample epochs
 
-    x_CoM = lagrange_interpolation(TransmissionTime, closest_times, closest_x)
-    y_CoM = lagrange_interpolation(TransmissionTime, closest_times, closest_y)
-    z_CoM = lagrange_interpolation(TransmissionTime, closest_times, closest_z)
-    
-    return (x_CoM, y_CoM, z_CoM)
+    # Parameters
+    # ==========
+    # Times: np.array
+    #         Sorted sample epochs
+    # Time: float or np.array
+    #         Interpolation epoch(s)
+    # NPoints: int
+    #         Number of samples of the window (all the samples if there
+    #         are fewer)
+
+    # Returns
+    # =======
+    # Start, End: int or np.array
+    #         Window limits, Times[Start:End], one per interpolation epoch
+
+    NSamples = len(Times)
+    NPoints = min(NPoints, NSamples)
+
+    # Center the window around the interpolation epoch and clip it to the data
+    Start = np.clip(np.searchsorted(Times, Time) - NPoints // 2, 0, NSamples - NPoints)
+
+    return Start, Start + NPoints
+
+def computeLagrangeWeights(WinTimes):
+
+    # Purpose: compute the barycentric weights of a batch of Lagrange
+    #          interpolation windows
+
+    # Parameters
+    # ==========
+    # WinTimes: np.array
+    #         Sample epochs of each window, one window per row (N x P)
+
+    # Returns
+    # =======
+    # Weights: np.array
+    #         Barycentric weights w_j = 1 / prod_k!=j (t_j - t_k) (N x P)
+
+    NPoints = WinTimes.shape[1]
+
+    # Differences between every pair of nodes of each window
+    Diff = WinTimes[:, :, None] - WinTimes[:, None, :]
+    Diff[:, np.arange(NPoints), np.arange(NPoints)] = 1.0
+
+    return 1.0 / np.prod(Diff, axis=2)
+
+def interpolateLagrange(Times, WinTimes, WinValues):
+
+    # Purpose: evaluate a batch of Lagrange polynomials with the barycentric
+    #          formula
+
+    # Parameters
+    # ==========
+    # Times: np.array
+    #         Interpolation epochs (N)
+    # WinTimes: np.array
+    #         Sample epochs of each window (N x P)
+    # WinValues: np.array
+    #         Sample values of each window (N x P x K)
+
+    # Returns
+    # =======
+    # Values: np.array
+    #         Interpolated values (N x K)
+
+    Weights = computeLagrangeWeights(WinTimes)
+
+    # Distance from the interpolation epoch to the nodes
+    Dt = Times[:, None] - WinTimes
+    OnNode = Dt == 0.0
+    Dt[OnNode] = 1.0
+
+    Coefs = Weights / Dt
+    Values = np.einsum('np,npk->nk', Coefs, WinValues) / \
+        np.sum(Coefs, axis=1)[:, None]
+
+    # Epochs matching a node take the sample value directly
+    Rows, Cols = np.nonzero(OnNode)
+    Values[Rows] = WinValues[Rows, Cols]
+
+    return Values
+
+def interpolateSatPos(Times, SatLabels, SatPosInfo):
+
+    # Purpose: interpolate the SP3 CoM positions of many satellites and/or
+    #          epochs at once with a 10-point Lagrange polynomial
+
+    # Parameters
+    # ==========
+    # Times: np.array
+    #         Interpolation epochs, e.g. transmission times [s]
+    # SatLabels: list
+    #         Satellite label of each epoch
+    # SatPosInfo: dict
+    #         SP3 ephemeris store as built by buildSatPosStore
+
+    # Returns
+    # =======
+    # SatComPos: np.array
+    #         CoM positions [m], one row per epoch (N x 3)
+
+    Times = np.asarray(Times, dtype=np.float64)
+    SatLabels = np.asarray(SatLabels)
+    SatComPos = np.zeros((len(Times), 3))
+
+    WinTimes = np.zeros((len(Times), SP3_INTERP_POINTS))
+    WinPos = np.zeros((len(Times), SP3_INTERP_POINTS, 3))
+    Batch = np.zeros(len(Times), dtype=bool)
+
+    # Gather the interpolation windows of each satellite
+    for SatLabel in np.unique(SatLabels):
+        SatEph = SatPosInfo.get(SatLabel)
+        if SatEph is None:
+            continue
+
+        Rows = np.flatnonzero(SatLabels == SatLabel)
+        NSamples = len(SatEph["SOD"])
+
+        # Short ephemeris: interpolate with all the available samples
+        if NSamples < SP3_INTERP_POINTS:
+            for Row in Rows:
+                for Axis in range(3):
+                    SatComPos[Row, Axis] = lagrange_interpolation(Times[Row],
+                    SatEph["SOD"], SatEph["XYZ"][:, Axis])
+            continue
+
+        Start, End = findInterpWindow(SatEph["SOD"], Times[Rows], SP3_INTERP_POINTS)
+        Idx = Start[:, None] + np.arange(SP3_INTERP_POINTS)
+
+        WinTimes[Rows] = SatEph["SOD"][Idx]
+        WinPos[Rows] = SatEph["XYZ"][Idx]
+        Batch[Rows] = True
+
+    # Evaluate all the polynomials in one go
+    if np.any(Batch):
+        SatComPos[Batch] = interpolateLagrange(Times[Batch], WinTimes[Batch], WinPos[Batch])
+
+    return SatComPos
+
+def computeSatComPos(TransmissionTime, SatPosInfo, SatLabel): # Apply Lagrange 10 points
+
+    # Interpolate the single satellite through the batched engine
+    SatComPos = interpolateSatPos([TransmissionTime], [SatLabel], SatPosInfo)[0]
+
+    return (SatComPos[0], SatComPos[1], SatComPos[2])
 
 
 # -----------------------------------------------------------------------------------------------------------------------
@@ -233,43 +611,153 @@ def applySagnac(SatComPos, FlightTime):
 
 # -----------------------------------------------------------------------------------------------------------------------
 
-def computeSatApo(SatLabel, SatComPos, RcvrPos, SunPos, SatApoInfo):
-    SatApoInfo = SatApoInfo[SatApoInfo[SatApoIdx["CONST"]] == SatLabel[:1]]
-    SatApoInfo = SatApoInfo[SatApoInfo[SatApoIdx["PRN"]] == SatLabel[1:]]
+def computeSatAttitude(SatComPos, SunPos):
 
-    # From Center of Masses, Receiver Position, Sun Position and Antenna Phase Offset, compute Antenna Phase Offset position
+    # Purpose: compute the yaw-steering attitude of a set of satellites
 
-    norm = np.linalg.norm(SatComPos)
-    k = SatComPos / norm
+    # Parameters
+    # ==========
+    # SatComPos: np.array
+    #         Satellite CoM positions in ECEF, one row per satellite (N x 3)
+    # SunPos: np.array
+    #         Sun position in ECEF (3), or one per satellite (N x 3)
 
-    norm = np.linalg.norm(SunPos - SatComPos)
-    e = (SunPos - SatComPos) / norm
-    j = np.cross(k, e)
-    # j = np.dot(k, e)
+    # Returns
+    # =======
+    # R: np.array
+    #         Rotation matrices with the body frame unit vectors i, j, k
+    #         as rows (N x 3 x 3)
+
+    SatComPos = np.atleast_2d(SatComPos)
+
+    # k: from the satellite to the Earth center (along the position vector)
+    k = SatComPos / np.linalg.norm(SatComPos, axis=1)[:, None]
+
+    # e: from the satellite to the Sun
+    e = SunPos - SatComPos
+    e = e / np.linalg.norm(e, axis=1)[:, None]
 
+    # j = k x e, i = j x k
+    j = np.cross(k, e)
     i = np.cross(j, k)
-    # i = np.dot(j, k)
 
-    R = np.array([i, j, k])
+    return np.stack([i, j, k], axis=1)
+
+def computeSatApoVect(SatComPos, RcvrPos, SunPos):
+
+    # Purpose: rotate the APOs of a set of satellites with their attitude
+
+    # Parameters
+    # ==========
+    # SatComPos: np.array
+    #         Satellite CoM positions in ECEF (N x 3)
+    # RcvrPos: np.array
+    #         Offsets rotated by the attitude, as in computeSatApo (3 or N x 3)
+    # SunPos: np.array
+    #         Sun position in ECEF (3 or N x 3)
+
+    # Returns
+    # =======
+    # Apo: np.array
+    #         Rotated APOs, one row per satellite (N x 3)
+
+    R = computeSatAttitude(SatComPos, SunPos)
+    RcvrPos = np.broadcast_to(RcvrPos, (len(R), 3))
+
+    return np.einsum('nij,nj->ni', R, RcvrPos)
+
+def computeSatApo(SatComPos, RcvrPos, SunPos):
+
+    # From Center of Masses, Receiver Position, Sun Position and Antenna Phase Offset, compute Antenna Phase Offset position
 
     # APO = SatComPos + np.dot(R, RcvrPos)
-    APO = np.dot(R, RcvrPos)
+    APO = computeSatApoVect(SatComPos, RcvrPos, SunPos)[0]
 
     return APO
 
 
 # -----------------------------------------------------------------------------------------------------------------------
 
-def getSatBias(GammaF1F2, SatLabel, SatBiaInfo):
+def buildSatBiaTable(SatBiaInfo):
+
+    # Purpose: build the table of iono-free satellite biases from the BIA
+    #          file, so that getSatBias does not need to filter the file
+    #          and combine the biases for every satellite and epoch
+
+    # Parameters
+    # ==========
+    # SatBiaInfo: DataFrame
+    #         SAT BIA file info as returned by readSatBia
+
+    # Returns
+    # =======
+    # SatBiaTable: dict
+    #         Iono-free biases [m] of each satellite slot (see SatSlotIdx), 
+    #         combined with the Gamma of its constellation (0 if the 
+    #         satellite is not in the file)
+    #         SatBiaTable["CodeBias"][SatSlotIdx["G01"]]
+    #         SatBiaTable["PhaseBias"], SatBiaTable["ClockBias"]
+
+    SatBiaTable = OrderedDict({})
+    for Key in ["CodeBias", "PhaseBias", "ClockBias"]:
+        SatBiaTable[Key] = np.zeros(len(SatSlotLabels))
+
+    # Gamma of the satellites of the file
+    Slots = np.array([SatSlotIdx[Label] \
+        for Label in getSatLabels(SatBiaInfo, SatBiaIdx)], dtype=int)
+    GammaF1F2 = np.array([Const.GPS_GAMMA_L1L2 if Label[0] == 'G' \
+        else Const.GAL_GAMMA_E1E5A for Label in SatSlotLabels])[Slots]
+
+    # Iono-free combination of the biases of both frequencies
+    for Key, F1, F2 in [("CodeBias", "OBS_f1_C", "OBS_f2_C"),
+    ("PhaseBias", "OBS_f1_P", "OBS_f2_P"),
+    ("ClockBias", "CLK_f1_C", "CLK_f2_C")]:
+        SatBiaTable[Key][Slots] = (SatBiaInfo[SatBiaIdx[F1]].to_numpy() + \
+            GammaF1F2 * SatBiaInfo[SatBiaIdx[F2]].to_numpy()) / (1 + GammaF1F2)
+
+    return SatBiaTable
 
-    SatBiaInfo = SatBiaInfo[SatBiaInfo[SatBiaIdx["CONST"]] == SatLabel[:1]]
-    SatBiaInfo = SatBiaInfo[SatBiaInfo[SatBiaIdx["PRN"]] == SatLabel[1:]]
+def getSatBias(SatLabel, SatBiaTable):
 
-    CodeBias = (SatBiaInfo[SatBiaIdx["OBS_f1_C"]].astype(float) + GammaF1F2 * SatBiaInfo[SatBiaIdx["OBS_f2_C"]].astype(float)) / (1 + GammaF1F2)
-    PhaseBias = (SatBiaInfo[SatBiaIdx["OBS_f1_P"]].astype(float) + GammaF1F2 * SatBiaInfo[SatBiaIdx["OBS_f2_P"]].astype(float)) / (1 + GammaF1F2)
-    ClockBias = (SatBiaInfo[SatBiaIdx["CLK_f1_C"]].astype(float) + GammaF1F2 * SatBiaInfo[SatBiaIdx["CLK_f2_C"]].astype(float)) / (1 + GammaF1F2)
+    # Purpose: get the iono-free biases of a satellite
 
-    return CodeBias, PhaseBias, ClockBias
+    # Parameters
+    # ==========
+    # SatLabel: str
+    #         Satellite label
+    # SatBiaTable: dict
+    #         Bias table as built by buildSatBiaTable
+
+    # Returns
+    # =======
+    # CodeBias, PhaseBias, ClockBias: float
+    #         Iono-free code, phase and clock biases [m]
+
+    Slot = SatSlotIdx[SatLabel]
+
+    return SatBiaTable["CodeBias"][Slot], SatBiaTable["PhaseBias"][Slot], \
+        SatBiaTable["ClockBias"][Slot]
+
+def getSatBiasVect(SatLabels, SatBiaTable):
+
+    # Purpose: get the iono-free biases of all the satellites of an epoch
+
+    # Parameters
+    # ==========
+    # SatLabels: list
+    #         Satellite labels
+    # SatBiaTable: dict
+    #         Bias table as built by buildSatBiaTable
+
+    # Returns
+    # =======
+    # CodeBias, PhaseBias, ClockBias: np.array
+    #         Iono-free code, phase and clock biases [m] of each satellite
+
+    Slots = np.array([SatSlotIdx[SatLabel] for SatLabel in SatLabels], dtype=int)
+
+    return SatBiaTable["CodeBias"][Slots], SatBiaTable["PhaseBias"][Slots], \
+        SatBiaTable["ClockBias"][Slots]
 
 
 # -----------------------------------------------------------------------------------------------------------------------
@@ -277,9 +765,10 @@ def getSatBias(GammaF1F2, SatLabel, SatBiaInfo):
 def computeDtr(SatComPos_1, SatComPos, Sod, Sod_1):
     # DTR = -2 * (Satellite Position * Velocity Satellite)/ Speed of Light
 
-    velocity = (SatComPos - SatComPos_1) / (Sod - Sod_1)
+    velocity = (np.asarray(SatComPos) - np.asarray(SatComPos_1)) / (Sod - Sod_1)
 
-    dtr = -2 * (SatComPos * velocity) / (Const.SPEED_OF_LIGHT)
+    # Scalar product of the position and the velocity
+    dtr = -2 * np.dot(SatComPos, velocity) / (Const.SPEED_OF_LIGHT)
 
     return dtr
 
@@ -316,20 +805,69 @@ def computeGeoRange(SatCopPos, RcvrPos):
 
 # -----------------------------------------------------------------------------------------------------------------------
 
-def estimateRcvrClk(CodeResidual, SigmaUERE):
-    rcvr_clk_bias_estimate = 0
-    CodeResidual = np.array(CodeResidual)
-    SigmaUERE = np.array(SigmaUERE)
-    
-    # Calculate weights as the inverse of the variances (SigmaUERE squared)
-    if SigmaUERE != 0:
-        weights = 1 / (SigmaUERE ** 2)
+def estimateRcvrClk(CodeResidual, SigmaUERE, ClkGroup=None, OutlierThr=0):
+
+    # Purpose: estimate the receiver clock of an epoch as the weighted
+    #          average of the code residuals of all its satellites, 
+    #          rejecting outliers one by one and, optionally, with one
+    #          clock per constellation (i.e. clock plus inter-system bias)
+
+    # Parameters
+    # ==========
+    # CodeResidual: np.array
+    #         Code residuals of the satellites of the epoch [m]
+    # SigmaUERE: np.array
+    #         Sigma UERE of the satellites (0: satellite not used) [m]
+    # ClkGroup: np.array
+    #         Clock estimated for each satellite (e.g. 0 for GPS and 1 
+    #         for Galileo), None to estimate a single clock
+    # OutlierThr: float
+    #         Max. normalized residual |Res - Clk|/Sigma of the satellites
+    #         (0: no outlier rejection)
+
+    # Returns
+    # =======
+    # RcvrClk: np.array
+    #         Receiver clock of each satellite [m] (clock of its group, 0
+    #         if the group has no satellites)
+    # Used: np.array
+    #         Satellites used in the estimation (not rejected)
+
+    CodeResidual = np.asarray(CodeResidual, dtype=np.float64)
+    SigmaUERE = np.asarray(SigmaUERE, dtype=np.float64)
+    if ClkGroup is None:
+        ClkGroup = np.zeros(len(CodeResidual), dtype=int)
+    ClkGroup = np.asarray(ClkGroup, dtype=int)
+    NGroups = ClkGroup.max() + 1 if len(ClkGroup) > 0 else 0
 
-        # Compute the weighted average of the residuals
-        weighted_sum = np.sum(weights * CodeResidual)
-        total_weight = np.sum(weights)
-
-        # Calculate the receiver clock bias estimate
-        rcvr_clk_bias_estimate = weighted_sum / total_weight
-    
-    return rcvr_clk_bias_estimate
\ No newline at end of file
+    # Calculate weights as the inverse of the variances (SigmaUERE squared)
+    Used = SigmaUERE != 0
+    Weights = np.zeros(len(CodeResidual))
+    Weights[Used] = 1 / (SigmaUERE[Used] ** 2)
+
+    while True:
+        # Weighted average of the residuals of each group
+        WeightedSum = np.bincount(ClkGroup, Weights * Used * CodeResidual, NGroups)
+        TotalWeight = np.bincount(ClkGroup, Weights * Used, NGroups)
+        GroupClk = np.zeros(NGroups)
+        np.divide(WeightedSum, TotalWeight, out=GroupClk, where=TotalWeight > 0)
+        RcvrClk = GroupClk[ClkGroup]
+
+        if OutlierThr <= 0 or not np.any(Used):
+            break
+
+        # Reject the worst satellite if it exceeds the threshold and its 
+        # group keeps enough satellites to detect further outliers
+        NormRes = np.zeros(len(CodeResidual))
+        NormRes[Used] = np.abs(CodeResidual[Used] - RcvrClk[Used]) / SigmaUERE[Used]
+        NUsed = np.bincount(ClkGroup, Used, NGroups)
+        NormRes[NUsed[ClkGroup] < 3] = 0
+        Worst = np.argmax(NormRes)
+        if NormRes[Worst] <= OutlierThr:
+            break
+
+        Used[Worst] = False
+
+    # End of while True
+
+    return RcvrClk, Used
@@ -26,14 +26,14 @@ Common = os.path.dirname(os.path.dirname(
 sys.path.insert(0, Common)
 from collections import OrderedDict
 from COMMON import GnssConstants as Const
-from COMMON.Misc import findSun, crossProd
+from COMMON.Misc import interpolateSun, crossProd
 import numpy as np
 
 
 from Correction_functions import computeLeoComPos, computeSatClkBias, applySagnac, computeRcvrApo, getUERE, \
-                                computeSatComPos, computeSatApo, getSatBias, computeDtr, computeGeoRange, estimateRcvrClk
-from COMMON.Misc import findSun
-from InputOutput import LeoPosIdx
+                                computeSatComPos, computeSatApo, getSatBias, computeDtr, computeGeoRange, estimateRcvrClk, \
+                                computeSatClkBiasVect, computeRcvrApoAll, interpolateSatPos, computeSatApoVect, \
+                                getSatBiasVect
 
 STATUS_OK = 1
 
@@ -44,9 +44,9 @@ def runCorrectMeas(Year,
                     LeoPosInfo,
                     LeoQuatInfo,
                     SatPosInfo, 
-                    SatApoInfo,
                     SatClkInfo,
                     SatBiaInfo,
+                    SunInfo,
                     CorrPrevInfo
                     # SatComPos_1,
                     # Sod_1
@@ -81,17 +81,17 @@ def runCorrectMeas(Year,
     #         Preprocessed observations for current epoch per sat
     #         PreproObsInfo["G01"]["C1"]
     # LeoPosInfo: dict
-    #         containing the LEO reference positions
+    #         containing the LEO trajectory store
     # LeoQuatInfo: dict
-    #         containing the LEO quaternions
+    #         containing the LEO attitude store
     # SatPosInfo: dict
-    #         containing the SP3 file info
-    # SatApoInfo: dict
-    #         containing the ANTEX file info
+    #         containing the SP3 ephemeris store per satellite
     # SatClkInfo: dict
-    #         containing the RINEX CLK file info
+    #         containing the satellite clock store (see buildSatClkStore)
     # SatBiaInfo: dict
-    #         containing the BIA file info
+    #         containing the iono-free satellite biases table
+    # SunInfo: dict
+    #         containing the Sun positions table of the day
     # SatComPos_1: dict
     #         containing the previous satellite positions
     # Sod_1: dict
@@ -181,12 +181,24 @@ def runCorrectMeas(Year,
     # ----------------------------------------------------------------------------------------------------------------------------
 
         Sod = SatPrepro["Sod"]
-        SatCorrInfo["Doy"] = LeoPosInfo[LeoPosIdx["DOY"]]
-        SatCorrInfo["Year"] = LeoPosInfo[LeoPosIdx["YEAR"]]
+        SatCorrInfo["Doy"] = Doy
 
         RcvrRefPosXyzCom = computeLeoComPos(Sod, LeoPosInfo)    # Compute the Center of Masses (CoM)
 
-        if SatPrepro["Status"] == STATUS_OK:
+        # Satellites cannot be corrected without the LEO position
+        if RcvrRefPosXyzCom is None and SatPrepro["Status"] == STATUS_OK:
+            sys.stderr.write("WARNING: No LEO position at SOD %s, %s not corrected\n" %
+            (Sod, SatLabel))
+
+        # Nor without the LEO attitude
+        RcvrPosXyz = None
+        if SatPrepro["Status"] == STATUS_OK and RcvrRefPosXyzCom is not None:
+            RcvrPosXyz = computeRcvrApo(Conf, Year, Doy, Sod, SatLabel, LeoQuatInfo)
+            if RcvrPosXyz is None:
+                sys.stderr.write("WARNING: No LEO attitude at SOD %s, %s not corrected\n" %
+                (Sod, SatLabel))
+
+        if SatPrepro["Status"] == STATUS_OK and RcvrPosXyz is not None:
 
             SatClkBias = computeSatClkBias(Sod, SatLabel, SatClkInfo)     # Compute Satellite Clock Bias (Linear interpolation between closer inputs) 
 
@@ -194,7 +206,6 @@ def runCorrectMeas(Year,
 
             TransmissionTime = Sod - DeltaT - SatClkBias        # Compute Transmission Time
 
-            RcvrPosXyz = computeRcvrApo(Conf, Year, Doy, Sod, SatLabel, LeoQuatInfo)
             SatCorrInfo["LeoApoX"] = RcvrPosXyz[0]
             SatCorrInfo["LeoApoY"] = RcvrPosXyz[1]
             SatCorrInfo["LeoApoZ"] = RcvrPosXyz[2]
@@ -213,9 +224,9 @@ def runCorrectMeas(Year,
             SatCorrInfo["SatY"] = SatComPos[1]
             SatCorrInfo["SatZ"] = SatComPos[2]
 
-            SunPos = findSun(SatCorrInfo["Year"].iloc[0], SatCorrInfo["Doy"].iloc[0], Sod)
+            SunPos = interpolateSun(SunInfo, Sod)         # Sun position from the table of the day
 
-            Apo = computeSatApo(SatLabel, SatComPos, RcvrPosXyz, SunPos, SatApoInfo)   # Compute Antenna Phase Offset in ECEF from ANTEX APOs in satellite-body reference frame
+            Apo = computeSatApo(SatComPos, RcvrPosXyz, SunPos)   # Compute Antenna Phase Offset in ECEF, rotating the APO by the satellite yaw-steering attitude
             SatCorrInfo["SatApoX"] = Apo[0]
             SatCorrInfo["SatApoY"] = Apo[1]
             SatCorrInfo["SatApoZ"] = Apo[2]
@@ -223,7 +234,7 @@ def runCorrectMeas(Year,
 
             SatCopPos = SatComPos + Apo         # Apply APOs to the Satellite Position
 
-            SatCorrInfo["SatCodeBia"], SatCorrInfo["SatPhaseBia"], SatClkBias = getSatBias(GammaF1F2, SatLabel, SatBiaInfo)   #Get SAtellite Biases in meters
+            SatCorrInfo["SatCodeBia"], SatCorrInfo["SatPhaseBia"], SatClkBias = getSatBias(SatLabel, SatBiaInfo)   #Get SAtellite Biases in meters
 
             if CorrPrevInfo[SatLabel]["SatComPos_Prev"][0] != 0 and CorrPrevInfo[SatLabel]["SatComPos_Prev"][1] and CorrPrevInfo[SatLabel]["SatComPos_Prev"][2]:
                 SatCorrInfo["Dtr"] = computeDtr(CorrPrevInfo[SatLabel]["SatComPos_Prev"], SatComPos, Sod, CorrPrevInfo[SatLabel]["Sod_Prev"])            # Compute relativistic correction
@@ -243,17 +254,9 @@ def runCorrectMeas(Year,
 
             SatCorrInfo["GEOM-RNGE"] = computeGeoRange(SatCopPos, RcvrRefPosXyz)             # COmpute Geometrical Range
 
-            SatCorrInfo["CodeResidual"] = SatCorrInfo["CorrCode"] - SatCorrInfo["GEOM-RNGE"]                          # Comute the first Residual removing the geometrical range (They include Recevier Clock Estimation)
+            SatCorrInfo["CodeResidual"] = SatCorrInfo["CorrCode"] - SatCorrInfo["GEOM-RNGE"]                          # Comute the first Residual removing the geometrical range (They include the Receiver Clock, see correctRcvrClk)
             SatCorrInfo["PhaseResidual"]  = SatCorrInfo["CorrPhase"] - SatCorrInfo["GEOM-RNGE"] 
 
-        try:
-            SatCorrInfo["RcvrClk"] = estimateRcvrClk(SatCorrInfo["CodeResidual"], SatCorrInfo["SigmaUere"])      # Estimate the Receiver Clock first guess as a weighted average of the residuals  
-
-            SatCorrInfo["CodeResidual"] -= SatCorrInfo["RcvrClk"]     # Remove Receiver Clock from residuals
-            SatCorrInfo["PhaseResidual"] -= SatCorrInfo["RcvrClk"]
-        except:
-            pass
-
 
         # Assigning values
         SatCorrInfo["Sod"] = Sod
@@ -276,3 +279,260 @@ def runCorrectMeas(Year,
         CorrInfo[SatLabel] = SatCorrInfo
 
     return CorrInfo, RcvrRefPosXyz, RcvrRefPosLlh
+
+def runCorrectMeasVect(Year,
+                    Doy,
+                    Conf, 
+                    PreproObsInfo, 
+                    LeoPosInfo,
+                    LeoQuatInfo,
+                    SatPosInfo, 
+                    SatClkInfo,
+                    SatBiaInfo,
+                    SunInfo,
+                    CorrPrevInfo
+                    ):
+
+    # Purpose: same as runCorrectMeas, but processing all the satellites
+    #          of the epoch at once with array operations instead of
+    #          satellite by satellite (CORR_MODE 1)
+
+    # Parameters
+    # ==========
+    # Same as runCorrectMeas
+
+    # Returns
+    # =======
+    # Same as runCorrectMeas
+
+    # Initialize output
+    CorrInfo = OrderedDict({})
+    RcvrRefPosXyz = np.zeros(3)
+    RcvrRefPosLlh = np.zeros(3)
+
+    SatLabels = list(PreproObsInfo.keys())
+    if len(SatLabels) == 0:
+        return CorrInfo, RcvrRefPosXyz, RcvrRefPosLlh
+
+    # All the satellites of the epoch share the same SoD
+    Sod = PreproObsInfo[SatLabels[0]]["Sod"]
+
+    RcvrRefPosXyzCom = computeLeoComPos(Sod, LeoPosInfo)    # Compute the Center of Masses (CoM)
+
+    # Select the satellites to be corrected
+    Ok = np.array([SatPrepro["Status"] == STATUS_OK 
+    for SatPrepro in PreproObsInfo.values()], dtype=bool)
+
+    # Satellites cannot be corrected without the LEO position
+    if RcvrRefPosXyzCom is None:
+        for SatLabel in np.array(SatLabels)[Ok]:
+            sys.stderr.write("WARNING: No LEO position at SOD %s, %s not corrected\n" %
+            (Sod, SatLabel))
+        Ok[:] = False
+
+    # Nor without the LEO attitude
+    RcvrApoAll = computeRcvrApoAll(Conf, Year, Doy, Sod, LeoQuatInfo)
+    if RcvrApoAll is None:
+        for SatLabel in np.array(SatLabels)[Ok]:
+            sys.stderr.write("WARNING: No LEO attitude at SOD %s, %s not corrected\n" %
+            (Sod, SatLabel))
+        Ok[:] = False
+
+    OkLabels = [SatLabel for SatLabel, SatOk in zip(SatLabels, Ok) if SatOk]
+    NOk = len(OkLabels)
+
+    if NOk > 0:
+        OkPrepro = [PreproObsInfo[SatLabel] for SatLabel in OkLabels]
+        C1 = np.array([SatPrepro["C1"] for SatPrepro in OkPrepro], dtype=np.float64)
+        IfC = np.array([SatPrepro["IF_C"] for SatPrepro in OkPrepro], dtype=np.float64)
+        IfP = np.array([SatPrepro["IF_P"] for SatPrepro in OkPrepro], dtype=np.float64)
+        IsGps = np.array([SatLabel[0] == 'G' for SatLabel in OkLabels], dtype=bool)
+        IsGal = np.array([SatLabel[0] == 'E' for SatLabel in OkLabels], dtype=bool)
+
+        # Compute Satellite Clock Biases and Transmission Times
+        SatClkBias = computeSatClkBiasVect(Sod, OkLabels, SatClkInfo)
+        TransmissionTime = Sod - C1/Const.SPEED_OF_LIGHT - SatClkBias
+
+        # Receiver APO of each constellation, picked per satellite
+        RcvrApo = np.array([RcvrApoAll[SatLabel[0]] for SatLabel in OkLabels])
+        RcvrRefPos = RcvrRefPosXyzCom + RcvrApo
+
+        # Satellite CoM positions at transmission time
+        SatComPos = interpolateSatPos(TransmissionTime, OkLabels, SatPosInfo)
+
+        # Flight Time (same units as runCorrectMeas)
+        FlightTime = (np.linalg.norm(SatComPos - RcvrRefPos, axis=1) / Const.SPEED_OF_LIGHT)*1000
+
+        # Apply Sagnac correction
+        Angle = Const.OMEGA_EARTH * FlightTime
+        CosAngle = np.cos(Angle)
+        SinAngle = np.sin(Angle)
+        SatComPos = np.column_stack((CosAngle*SatComPos[:, 0] + SinAngle*SatComPos[:, 1],
+                                    -SinAngle*SatComPos[:, 0] + CosAngle*SatComPos[:, 1],
+                                    SatComPos[:, 2]))
+
+        # Satellite APOs, with the Sun position looked up once for the epoch
+        SunPos = interpolateSun(SunInfo, Sod)
+        Apo = computeSatApoVect(SatComPos, RcvrApo, SunPos)
+        SatCopPos = SatComPos + Apo
+
+        # Get Satellite Biases in meters
+        SatCodeBia, SatPhaseBia, SatClkBias = getSatBiasVect(OkLabels, SatBiaInfo)
+        SatClkBias = SatClkBias.copy()
+
+        # Relativistic correction where a previous position is available
+        Dtr = np.zeros(NOk)
+        for iSat, SatLabel in enumerate(OkLabels):
+            SatComPosPrev = CorrPrevInfo[SatLabel]["SatComPos_Prev"]
+            if SatComPosPrev[0] != 0 and SatComPosPrev[1] and SatComPosPrev[2]:
+                Dtr[iSat] = computeDtr(SatComPosPrev, SatComPos[iSat], Sod, 
+                CorrPrevInfo[SatLabel]["Sod_Prev"])
+        SatClkBias += Dtr
+
+        # Sigma UERE from Conf
+        SigmaUere = np.where(IsGps, Conf['GPS_UERE'], 
+        np.where(IsGal, Conf['GAL_UERE'], 0))
+
+        # Corrected measurements
+        CorrCode = IfC + SatClkBias + SatCodeBia
+        CorrPhase = IfP + SatClkBias + SatPhaseBia
+
+        # Geometrical Range and first residuals
+        GeomRange = np.linalg.norm(SatCopPos - RcvrRefPos, axis=1)
+        CodeResidual = CorrCode - GeomRange
+        PhaseResidual = CorrPhase - GeomRange
+
+        RcvrRefPosXyz = RcvrRefPos[-1]
+
+    # Build the output info in the order of the preprocessed observations
+    iSat = 0
+    for SatLabel, SatOk in zip(SatLabels, Ok):
+        SatPrepro = PreproObsInfo[SatLabel]
+
+        # Initialize output info (see runCorrectMeas)
+        SatCorrInfo = {
+            "Sod": SatPrepro["Sod"],
+            "Doy": Doy,
+            "Elevation": SatPrepro["Elevation"],
+            "Azimuth": SatPrepro["Azimuth"],
+            "Flag": 0,
+            "LeoX": 0.0,
+            "LeoY": 0.0,
+            "LeoZ": 0.0,
+            "LeoApoX": 0.0,
+            "LeoApoY": 0.0,
+            "LeoApoZ": 0.0,
+            "SatX": 0.0,
+            "SatY": 0.0,
+            "SatZ": 0.0,
+            "SatApoX": 0.0,
+            "SatApoY": 0.0,
+            "SatApoZ": 0.0,
+            "ApoProj": 0.0,
+            "SatClk": 0.0,
+            "SatCodeBia": 0.0,
+            "SatPhaseBia": 0.0,
+            "FlightTime": 0.0,
+            "Dtr": 0.0,
+            "CorrCode": 0.0,
+            "CorrPhase": 0.0,
+            "GeomRange": 0.0,
+            "CodeResidual": 0.0,
+            "PhaseResidual": 0.0,
+            "RcvrClk": 0.0,
+            "SigmaUere": 0.0,
+
+        } # End of SatCorrInfo
+
+        if SatOk:
+            SatCorrInfo["LeoApoX"], SatCorrInfo["LeoApoY"], SatCorrInfo["LeoApoZ"] = RcvrApo[iSat]
+            SatCorrInfo["LeoX"], SatCorrInfo["LeoY"], SatCorrInfo["LeoZ"] = RcvrRefPos[iSat]
+            SatCorrInfo["FlightTime"] = FlightTime[iSat]
+            SatCorrInfo["SatX"], SatCorrInfo["SatY"], SatCorrInfo["SatZ"] = SatComPos[iSat]
+            SatCorrInfo["SatApoX"], SatCorrInfo["SatApoY"], SatCorrInfo["SatApoZ"] = Apo[iSat]
+            SatCorrInfo["SatCodeBia"] = SatCodeBia[iSat]
+            SatCorrInfo["SatPhaseBia"] = SatPhaseBia[iSat]
+            SatCorrInfo["Dtr"] = Dtr[iSat]
+            SatCorrInfo["SigmaUere"] = SigmaUere[iSat]
+            SatCorrInfo["CorrCode"] = CorrCode[iSat]
+            SatCorrInfo["CorrPhase"] = CorrPhase[iSat]
+            SatCorrInfo["SatClk"] = SatClkBias[iSat]
+            SatCorrInfo["GEOM-RNGE"] = GeomRange[iSat]
+            SatCorrInfo["CodeResidual"] = CodeResidual[iSat]
+            SatCorrInfo["PhaseResidual"] = PhaseResidual[iSat]
+
+            # Flag the satellite as used if it has been fully corrected
+            if Dtr[iSat] != 0 and CorrCode[iSat] != 0 and CorrPhase[iSat] != 0 \
+            and GeomRange[iSat] != 0:
+                SatCorrInfo["Flag"] = 1
+
+            iSat = iSat + 1
+
+        CorrInfo[SatLabel] = SatCorrInfo
+
+    return CorrInfo, RcvrRefPosXyz, RcvrRefPosLlh
+
+def correctRcvrClk(Conf, CorrInfo):
+
+    # Purpose: estimate the receiver clock of an epoch with all its 
+    #          corrected satellites and remove it from their residuals
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # CorrInfo: dict
+    #         Corrected measurements of the epoch per sat, as returned 
+    #         by runCorrectMeas
+
+    # Returns
+    # =======
+    # CorrInfo: dict
+    #         Same as the input, with the receiver clock and residuals
+    #         updated. CorrInfo["G01"]["ClkUsed"] tells whether the
+    #         corrected satellite was used in the clock estimation (False
+    #         if rejected as an outlier, and then flagged as not used, or
+    #         if its residual is not finite or it has no Sigma UERE)
+
+    # Satellites corrected at the epoch
+    SatLabels = [SatLabel for SatLabel, SatCorrInfo in CorrInfo.items() 
+    if "GEOM-RNGE" in SatCorrInfo]
+    if len(SatLabels) == 0:
+        return CorrInfo
+
+    CodeResidual = np.array([CorrInfo[SatLabel]["CodeResidual"] for SatLabel in SatLabels], 
+    dtype=np.float64)
+    SigmaUere = np.array([CorrInfo[SatLabel]["SigmaUere"] for SatLabel in SatLabels], 
+    dtype=np.float64)
+
+    # One clock per constellation if the inter-system bias is estimated
+    ClkGroup = np.zeros(len(SatLabels), dtype=int)
+    if Conf["RCVR_CLK_ISB"] == 1:
+        ClkGroup = np.array([SatLabel[0] == 'E' for SatLabel in SatLabels], dtype=int)
+
+    # Only the satellites with a valid residual and weight enter the 
+    # estimation (e.g. without ephemeris the residual is NaN)
+    Valid = np.isfinite(CodeResidual) & (SigmaUere > 0)
+
+    # Estimate the Receiver Clock as a weighted average of the residuals
+    ValidClk, ValidUsed = estimateRcvrClk(CodeResidual[Valid], SigmaUere[Valid], 
+    ClkGroup[Valid], Conf["RCVR_CLK_OUT_THR"])
+
+    # Satellites left out take the clock of their group
+    GroupClk = np.zeros(ClkGroup.max() + 1)
+    GroupClk[ClkGroup[Valid]] = ValidClk
+    RcvrClk = GroupClk[ClkGroup]
+    Used = np.zeros(len(SatLabels), dtype=bool)
+    Used[Valid] = ValidUsed
+
+    # Remove Receiver Clock from residuals
+    for iSat, SatLabel in enumerate(SatLabels):
+        SatCorrInfo = CorrInfo[SatLabel]
+        SatCorrInfo["RcvrClk"] = RcvrClk[iSat]
+        SatCorrInfo["CodeResidual"] = SatCorrInfo["CodeResidual"] - RcvrClk[iSat]
+        SatCorrInfo["PhaseResidual"] = SatCorrInfo["PhaseResidual"] - RcvrClk[iSat]
+        SatCorrInfo["ClkUsed"] = bool(Used[iSat])
+        if not Used[iSat]:
+            SatCorrInfo["Flag"] = 0
+
+    return CorrInfo
@@ -17,9 +17,13 @@
 ########################################################################
 
 import sys, os
+import glob
+from concurrent.futures import ProcessPoolExecutor
 from pandas import unique
 from pandas import read_csv
-from InputOutput import CorrIdx
+from pandas import DataFrame
+from InputOutput import CorrIdx, CorrFmt
+from InputOutput import getBinOutputPath, readBinOutput, isBinOutputUpToDate
 from InputOutput import REJECTION_CAUSE_DESC
 sys.path.append(os.getcwd() + '/' + \
     os.path.dirname(sys.argv[0]) + '/' + 'COMMON')
@@ -60,7 +64,7 @@ def convert_satlabel_to_const(value):
 
 
 # Plot Satellite Tracks
-def plotSatTracks(PreproObsFile, CorrData):
+def plotSatTracks(PreproObsFile, CorrData, Figures):
     PlotConf = {}
 
     PlotConf["Type"] = "Lines"
@@ -94,20 +98,11 @@ def plotSatTracks(PreproObsFile, CorrData):
     PlotConf["ColorBarMin"] = 0.
     PlotConf["ColorBarMax"] = 90.
 
-    # Transform ECEF to Geodetic
-    CorrData[CorrIdx["SAT-X"]].to_numpy()
-    CorrData[CorrIdx["SAT-Y"]].to_numpy()
-    CorrData[CorrIdx["SAT-Z"]].to_numpy()
-    DataLen = len(CorrData[CorrIdx["SAT-X"]])
-    Longitude = np.zeros(DataLen)
-    Latitude = np.zeros(DataLen)
+    # Transform ECEF to Geodetic (all the points at once)
     # transformer = Transformer.from_crs('epsg:4978', 'epsg:4326')
-    for index in range(DataLen):
-        x = CorrData[CorrIdx["SAT-X"]][index]
-        y = CorrData[CorrIdx["SAT-Y"]][index]
-        z = CorrData[CorrIdx["SAT-Z"]][index]
-        Longitude[index], Latitude[index], h = xyz2llh(x, y, z)
-        # Latitude[index], Longitude[index], h = transformer.transform(x, y, z)
+    Longitude, Latitude, h = xyz2llh(CorrData[CorrIdx["SAT-X"]].to_numpy(),
+                                     CorrData[CorrIdx["SAT-Y"]].to_numpy(),
+                                     CorrData[CorrIdx["SAT-Z"]].to_numpy())
 
     PlotConf["xData"] = {}
     PlotConf["yData"] = {}
@@ -119,11 +114,11 @@ def plotSatTracks(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'SAT_TRACKS_D011Y24.png'
 
-    # Call generatePlot from Plots library
-    generatePlot(PlotConf)
+    # Add the figure to the ones to be rendered by generatePlot
+    Figures.append(dict(PlotConf))
 
 # Plot Flight Time
-def plotFlightTime(PreproObsFile, CorrData):
+def plotFlightTime(PreproObsFile, CorrData, Figures):
     PlotConf = {}
 
     GPS_Data = CorrData[CorrData[CorrIdx["CONST"]] == 'G']
@@ -167,7 +162,7 @@ def plotFlightTime(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'GPS_FLIGHT_TIME_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
     # ----------------------------------------------------------------------------------------------
 
@@ -207,10 +202,10 @@ def plotFlightTime(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'Galileo_FLIGHT_TIME_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
 # Plot DTR
-def plotDTR(PreproObsFile, CorrData):
+def plotDTR(PreproObsFile, CorrData, Figures):
     PlotConf = {}
 
     GPS_Data = CorrData[CorrData[CorrIdx["CONST"]] == 'G']
@@ -254,7 +249,7 @@ def plotDTR(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'GPS_DTR_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
     # ----------------------------------------------------------------------------------------------
 
@@ -294,14 +289,14 @@ def plotDTR(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'Galileo_DTR_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
 
 
 
 
 # Plot Code Residuals
-def plotResidualsCode(PreproObsFile, CorrData):
+def plotResidualsCode(PreproObsFile, CorrData, Figures):
     PlotConf = {}
 
     GPS_Data = CorrData[CorrData[CorrIdx["CONST"]] == 'G']
@@ -345,7 +340,7 @@ def plotResidualsCode(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'GPS_Code_Residuals_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
     # ----------------------------------------------------------------------------------------------
 
@@ -385,12 +380,12 @@ def plotResidualsCode(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'Galileo_Code_Residuals_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
 
 
 # Plot Phase Residuals
-def plotResidualsPhase(PreproObsFile, CorrData):
+def plotResidualsPhase(PreproObsFile, CorrData, Figures):
     PlotConf = {}
 
     GPS_Data = CorrData[CorrData[CorrIdx["CONST"]] == 'G']
@@ -434,7 +429,7 @@ def plotResidualsPhase(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'GPS_Phase_Residuals_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
     # ----------------------------------------------------------------------------------------------
 
@@ -474,88 +469,216 @@ def plotResidualsPhase(PreproObsFile, CorrData):
 
     PlotConf["Path"] = sys.argv[1] + '/OUT/CORR/FIGURES/' + 'Galileo_Phase_Residuals_D011Y24.png'
 
-    generatePlot(PlotConf)
+    Figures.append(dict(PlotConf))
 
 
 
 
 # Plot Receiver Clock
-def plotReceiverClock(PreproObsFile, CorrData):
+def plotReceiverClock(PreproObsFile, CorrData, Figures):
     pass
 
 
 
 
-def generateCorrPlots(PreproObsFile):
+def readCorrData(CorrFile, Columns, MemMap=True):
+
+    # Purpose: read at once the columns of a CORR file needed by the plots
+
+    # Parameters
+    # ==========
+    # CorrFile: str
+    #         Path to the CORR file
+    # Columns: list
+    #         Names of the columns to read, as in CorrIdx
+    # MemMap: bool
+    #         Map the file (or its binary columnar output, if it is up to
+    #         date) in memory instead of reading it
+
+    # Returns
+    # =======
+    # CorrData: DataFrame
+    #         Columns labelled with their CorrIdx position
+
+    # Load the binary columnar output if it is complete and up to date
+    if isBinOutputUpToDate(CorrFile):
+        BinData = readBinOutput(getBinOutputPath(CorrFile), Columns, MemMap)
+        return DataFrame(OrderedDict([(CorrIdx[Column], BinData[Column]) 
+        for Column in Columns]))
+
+    # Else parse the text columns with their types: int (%d), str (%s) 
+    # or float
+    ColTypes = OrderedDict({})
+    for Column in Columns:
+        ColFmt = CorrFmt[CorrIdx[Column]]
+        ColTypes[CorrIdx[Column]] = np.int64 if ColFmt.endswith("d") else \
+            str if ColFmt.endswith("s") else np.float64
+
+    return read_csv(CorrFile, sep=r'\s+', engine='c', skiprows=1, header=None,
+    usecols=list(ColTypes.keys()), dtype=ColTypes, memory_map=MemMap)
+
+# End of readCorrData()
+
+def renderPlots(Figures, NProcs=1):
+
+    # Purpose: render the figures with generatePlot, in parallel if
+    #          several processes are requested (each figure is 
+    #          independent from the others)
+
+    # Parameters
+    # ==========
+    # Figures: list
+    #         PlotConf of the figures to render
+    # NProcs: int
+    #         Number of processes rendering the figures
+
+    # Returns
+    # =======
+    # Nothing
+
+    NProcs = min(NProcs, len(Figures))
+
+    # Render the figures in this process
+    if NProcs <= 1:
+        for PlotConf in Figures:
+            generatePlot(PlotConf)
+
+    # Dispatch the figures to the workers
+    else:
+        with ProcessPoolExecutor(max_workers=NProcs) as Pool:
+            # Raise the exception of any failed figure
+            for Result in Pool.map(generatePlot, Figures):
+                pass
+
+        # End of with ProcessPoolExecutor(...)
+
+# End of renderPlots()
+
+def generateCorrPlots(PreproObsFile, NProcs=1):
     
     # Purpose: generate output plots regarding Correction results
 
+    # Parameters
+    # ==========
+    # PreproObsFile: str
+    #         Path to the CORR file
+    # NProcs: int
+    #         Number of processes rendering the figures
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Figures to render, configured by the plot functions
+    Figures = []
+
+    # Read at once the cols we need from CORR file for all the plots
+    CorrData = readCorrData(PreproObsFile, ["SOD", "CONST", "PRN", "ELEV", "FLAG",
+    "SAT-X", "SAT-Y", "SAT-Z", "FLIGHT-TIME", "DTR", "CODE-RES", "PHASE-RES", 
+    "RCVR-CLK"])
+
     # Satellite Tracks
     # ----------------------------------------------------------
-    # Read the cols we need from PREPRO OBS file
-    CorrData = read_csv(PreproObsFile, delim_whitespace=True, skiprows=1, header=None,\
-    usecols=[CorrIdx["SAT-X"],CorrIdx["SAT-Y"],CorrIdx["SAT-Z"],CorrIdx["CONST"],CorrIdx["PRN"],CorrIdx["FLAG"],CorrIdx["ELEV"]])
-    
     print('INFO: Plot Satellite Tracks ...')
 
     # Configure plot and call plot generation function
-    plotSatTracks(PreproObsFile, CorrData)
+    plotSatTracks(PreproObsFile, CorrData, Figures)
 
     # Flight Time
     # ----------------------------------------------------------
-    # Read the cols we need from PREPRO OBS file
-    CorrData = read_csv(PreproObsFile, delim_whitespace=True, skiprows=1, header=None,\
-    usecols=[CorrIdx["SOD"],CorrIdx["CONST"],CorrIdx["PRN"],CorrIdx["FLAG"],CorrIdx["FLIGHT-TIME"], CorrIdx["ELEV"]])
-    
     print('INFO: Plot Flight Time...')
 
     # Configure plot and call plot generation function
-    plotFlightTime(PreproObsFile, CorrData)
+    plotFlightTime(PreproObsFile, CorrData, Figures)
 
 
     # DTR (Relativistic Effect)
     # ----------------------------------------------------------
-    # Read the cols we need from PREPRO OBS file
-    CorrData = read_csv(PreproObsFile, delim_whitespace=True, skiprows=1, header=None,\
-    usecols=[CorrIdx["SOD"],CorrIdx["CONST"],CorrIdx["PRN"],CorrIdx["FLAG"],CorrIdx["DTR"], CorrIdx["ELEV"]])
-    
     print('INFO: Plot DTR...')
 
     # Configure plot and call plot generation function
-    plotDTR(PreproObsFile, CorrData)
+    plotDTR(PreproObsFile, CorrData, Figures)
 
 
     # Code Residuals
     # ----------------------------------------------------------
-    # Read the cols we need from PREPRO OBS file
-    CorrData = read_csv(PreproObsFile, delim_whitespace=True, skiprows=1, header=None,\
-    usecols=[CorrIdx["SOD"],CorrIdx["CONST"],CorrIdx["PRN"],CorrIdx["FLAG"],CorrIdx["CODE-RES"]])
-    
     print('INFO: Plot Code Residuals...')
 
     # Configure plot and call plot generation function
-    plotResidualsCode(PreproObsFile, CorrData)
+    plotResidualsCode(PreproObsFile, CorrData, Figures)
 
 
     # Phase Residuals
     # ----------------------------------------------------------
-    # Read the cols we need from PREPRO OBS file
-    CorrData = read_csv(PreproObsFile, delim_whitespace=True, skiprows=1, header=None,\
-    usecols=[CorrIdx["SOD"],CorrIdx["CONST"],CorrIdx["PRN"],CorrIdx["FLAG"],CorrIdx["PHASE-RES"]])
-    
     print('INFO: Plot Phase Residuals...')
 
     # Configure plot and call plot generation function
-    plotResidualsPhase(PreproObsFile, CorrData)
+    plotResidualsPhase(PreproObsFile, CorrData, Figures)
 
 
     # Clock Receiver
     # ----------------------------------------------------------
-    # Read the cols we need from PREPRO OBS file
-    CorrData = read_csv(PreproObsFile, delim_whitespace=True, skiprows=1, header=None,\
-    usecols=[CorrIdx["SOD"],CorrIdx["CONST"],CorrIdx["PRN"],CorrIdx["RCVR-CLK"]])
-    
     print('INFO: Plot Receiver Clock...')
 
     # Configure plot and call plot generation function
-    plotReceiverClock(PreproObsFile, CorrData)
\ No newline at end of file
+    plotReceiverClock(PreproObsFile, CorrData, Figures)
+
+    # Render the figures
+    # ----------------------------------------------------------
+    print('INFO: Rendering %d figures...' % len(Figures))
+
+    renderPlots(Figures, NProcs)
+
+# End of generateCorrPlots()
+
+#######################################################
+# MAIN BODY
+#######################################################
+
+# Generate the CORR figures of a scenario already processed, out of the
+# SENTUS run:
+#   CorrectionsPlots.py $SCEN_PATH [-p N] [CORR files]
+#   -p N: render the figures with N processes
+#   By default, the figures of all the CORR files of the scenario
+if __name__ == "__main__":
+
+    # The scenario path goes first, as the figure paths are built
+    # from sys.argv[1]
+    Scen = sys.argv[1] if len(sys.argv) > 1 and sys.argv[1] != '-p' else None
+    NProcs = 1
+    CorrFiles = []
+
+    Args = sys.argv[2:]
+    i = 0
+    while i < len(Args):
+        # Number of rendering processes
+        if Args[i] == '-p':
+            try:
+                NProcs = int(Args[i + 1])
+            except (IndexError, ValueError):
+                NProcs = 0
+            i = i + 2
+
+        # CORR files
+        else:
+            CorrFiles.append(Args[i])
+            i = i + 1
+
+    if Scen is None or NProcs < 1:
+        sys.stderr.write("ERROR: Please provide path to SCENARIO, "\
+            "optionally followed by -p N (number of processes rendering "\
+            "figures) and the CORR files to plot\n")
+        sys.exit(-1)
+
+    # By default, all the CORR files of the scenario
+    if len(CorrFiles) == 0:
+        CorrFiles = sorted(glob.glob(os.path.join(Scen, "OUT", "CORR", "CORR_*.dat")))
+
+    for CorrFile in CorrFiles:
+        print("INFO: Reading file: %s and generating CORR figures..." % CorrFile)
+
+        generateCorrPlots(CorrFile, NProcs)
+
+#######################################################
+# End of CorrectionsPlots.py
+#######################################################
@@ -20,6 +20,8 @@
 # Import External and Internal functions and Libraries
 #----------------------------------------------------------------------
 import sys, os
+import pickle
+import hashlib
 from collections import OrderedDict
 from COMMON.Dates import convertYearMonthDay2JulianDay
 from COMMON import GnssConstants as Const
@@ -28,6 +30,10 @@ import numpy as np
 import pandas as pd
 
 import warnings
+
+# Silence the pandas FutureWarnings once for the whole run, not per epoch
+warnings.simplefilter(action='ignore', category=FutureWarning)
+
 # Input interfaces
 #----------------------------------------------------------------------
 # CONF
@@ -55,6 +61,28 @@ ObsIdxC["C2"]=6
 ObsIdxC["S1"]=7
 ObsIdxC["S2"]=8
 
+# OBS file reading block size [bytes]
+OBS_BLOCK_SIZE = 4 * 1024 * 1024
+
+# Output files write buffer size [bytes]
+OUTPUT_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Binary outputs: suffix of their directory, number of records 
+# converted to columns at once, suffix of the column chunks written 
+# until the output is closed and file marking the output as complete
+BIN_OUTPUT_SUFFIX = "_COLS"
+BIN_OUTPUT_CHUNK_ROWS = 16384
+BIN_OUTPUT_CHUNK_SUFFIX = ".chunk"
+BIN_OUTPUT_DONE = "DONE"
+
+# Satellite slots (fixed position of each satellite in per-satellite arrays)
+SatSlotLabels = ["%s%02d" % (Constel, Prn) \
+    for Constel in ['G', 'E'] \
+        for Prn in range(1, Const.MAX_NUM_SATS_CONSTEL + 1)]
+SatSlotIdx = OrderedDict({})
+for Slot, Label in enumerate(SatSlotLabels):
+    SatSlotIdx[Label]=Slot
+
 # LEO POS file columns
 LeoPosIdx = OrderedDict({})
 LeoPosIdx["SOD"]=0
@@ -116,6 +144,13 @@ SatBiaIdx["CLK_f2_P"] = 7
 SatBiaIdx["OBS_f1_P"] = 8
 SatBiaIdx["OBS_f2_P"] = 9
 
+# Input product files column types (float64 if not listed)
+ProductColTypes = OrderedDict({})
+ProductColTypes["DOY"]=np.int64
+ProductColTypes["YEAR"]=np.int64
+ProductColTypes["CONST"]="category"
+ProductColTypes["PRN"]=np.uint8
+
 # Output interfaces
 #----------------------------------------------------------------------
 # PREPRO OBS 
@@ -127,6 +162,7 @@ PreproHdr = "\
 PreproFmt = "%6d %6s %8.3f %8.3f %4d %4d %4d "\
     "%15.3f %15.3f %15.3f %15.3f %8.3f %8.3f %10.3f %10.3f %10.3f %10.3f "\
     "%15.3f %15.3f %15.3f".split()
+PreproLineFmt = "".join(Fmt + " " for Fmt in PreproFmt) + "\n"
 
 # File columns
 PreproIdx = OrderedDict({})
@@ -196,6 +232,7 @@ CorrFmt = "%05d %1s %02d %8.3f %8.3f %4d %14.3f %14.3f %14.3f %8.3f %8.3f %8.3f
 "%14.3f %14.3f %14.3f %8.3f %8.3f %8.3f %14.3f %8.3f %8.3f %8.3f %14.3f " \
 "%14.3f %14.3f %14.3f %10.4f %10.4f %14.3f " \
 "%10.4f".split()
+CorrLineFmt = "".join(Fmt + " " for Fmt in CorrFmt) + "\n"
 
 # File columns
 CorrIdx = OrderedDict({})
@@ -230,6 +267,39 @@ CorrIdx["PHASE-RES"]=27
 CorrIdx["RCVR-CLK"]=28
 CorrIdx["SUERE"]=29
 
+# POS
+# Header
+PosHdr = "\
+#SOD DOY          LON          LAT          ALT          POS-X          POS-Y          POS-Z       RCVR-CLK        ISB NSV NIT    GDOP    PDOP    HDOP    VDOP    TDOP        HPE        VPE FLAG\n"
+
+# Line format
+PosFmt = "%05d %03d %12.7f %12.7f %12.3f %14.3f %14.3f %14.3f %14.3f %10.3f " \
+"%3d %3d %7.2f %7.2f %7.2f %7.2f %7.2f %10.3f %10.3f %4d".split()
+PosLineFmt = "".join(Fmt + " " for Fmt in PosFmt) + "\n"
+
+# File columns
+PosIdx = OrderedDict({})
+PosIdx["SOD"]=0
+PosIdx["DOY"]=1
+PosIdx["LON"]=2
+PosIdx["LAT"]=3
+PosIdx["ALT"]=4
+PosIdx["POS-X"]=5
+PosIdx["POS-Y"]=6
+PosIdx["POS-Z"]=7
+PosIdx["RCVR-CLK"]=8
+PosIdx["ISB"]=9
+PosIdx["NSV"]=10
+PosIdx["NITER"]=11
+PosIdx["GDOP"]=12
+PosIdx["PDOP"]=13
+PosIdx["HDOP"]=14
+PosIdx["VDOP"]=15
+PosIdx["TDOP"]=16
+PosIdx["HPE"]=17
+PosIdx["VPE"]=18
+PosIdx["FLAG"]=19
+
 
 # Input functions
 #----------------------------------------------------------------------
@@ -471,6 +541,25 @@ def readConf(CfgFile):
                             # Increment number of read parameters
                             NReadParams = NReadParams + 1
 
+                        # Binary columnar outputs selection [0:OFF|1:ON]
+                        # (along with the PREPRO and CORR text outputs)
+                        #--------------------------------------------------------------------       
+                        elif Key=='BIN_OUT':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [0], [1])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # PVT outputs selection [0:OFF|1:ON]
+                        #--------------------------------------------------------------------       
+                        elif Key=='PVT_OUT':
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, [0], [1])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
                         # Satellite ACRONYM
                         #-----------------------------------------------
                         elif Key=='SAT_ACRONYM':
@@ -737,6 +826,62 @@ def readConf(CfgFile):
                             # Increment number of read parameters
                             NReadParams = NReadParams + 1
 
+                        # Preprocessing mode
+                        #-----------------------------------------------
+                        # 0: satellite by satellite
+                        # 1: not available
+                        # 2: whole day at once, per satellite arc
+                        #-----------------------------------------------
+                        elif Key== 'PREPRO_MODE': 
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, 
+                            [0], [2])
+                            if Conf[Key] == 1:
+                                sys.stderr.write("ERROR: PREPRO_MODE 1 is not "\
+                                "available. Use 0 or 2\n")
+                                sys.exit(-1)
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Corrections mode
+                        #-----------------------------------------------
+                        # 0: satellite by satellite
+                        # 1: vectorized over the satellites of the epoch
+                        #-----------------------------------------------
+                        elif Key== 'CORR_MODE': 
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, 
+                            [0], [1])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Receiver clock estimation
+                        #-----------------------------------------------
+                        # 0: one clock for all the satellites
+                        # 1: one clock per constellation (Inter-System 
+                        #    Bias)
+                        #-----------------------------------------------
+                        elif Key== 'RCVR_CLK_ISB': 
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, 
+                            [0], [1])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
+                        # Receiver clock outlier threshold [sigmas]
+                        # (0: no outlier rejection)
+                        #-----------------------------------------------
+                        elif Key== 'RCVR_CLK_OUT_THR': 
+                            # Check parameter and load it in Conf
+                            Conf[Key] = checkConfParam(Key, Fields, 1, 1, 
+                            [0], [100])
+
+                            # Increment number of read parameters
+                            NReadParams = NReadParams + 1
+
     return Conf
 
 # End of readConf()
@@ -756,6 +901,20 @@ def processConf(Conf):
     #         Dictionary containing configuration with
     #         Julian Days
     
+    # Optional parameters default values
+    if "PREPRO_MODE" not in Conf:
+        Conf["PREPRO_MODE"] = 0
+    if "CORR_MODE" not in Conf:
+        Conf["CORR_MODE"] = 0
+    if "RCVR_CLK_ISB" not in Conf:
+        Conf["RCVR_CLK_ISB"] = 0
+    if "RCVR_CLK_OUT_THR" not in Conf:
+        Conf["RCVR_CLK_OUT_THR"] = 0
+    if "PVT_OUT" not in Conf:
+        Conf["PVT_OUT"] = 0
+    if "BIN_OUT" not in Conf:
+        Conf["BIN_OUT"] = 0
+
     ConfCopy = Conf.copy()
     for Key in ConfCopy:
         Value = ConfCopy[Key]
@@ -797,55 +956,238 @@ def splitLine(Line):
 # End of splitLine()
 
 
-def readObsEpoch(f):
+def parseObsLines(Lines, ObsIdx):
+
+    # Purpose: convert the split lines of one OBS record type (codes or
+    #          phases) into a typed array
+
+    # Parameters
+    # ==========
+    # Lines: list
+    #         Split lines
+    # ObsIdx: OrderedDict
+    #         Columns map of the record type (ObsIdxC or ObsIdxP)
+
+    # Returns
+    # =======
+    # Obs: np.array
+    #         One row per line, columns as in ObsIdx. The PRN column
+    #         holds the satellite slot (see SatSlotIdx). Lines of unknown
+    #         satellites are skipped
+
+    Obs = np.zeros((len(Lines), max(ObsIdx.values()) + 1))
+    if len(Lines) == 0:
+        return Obs
+
+    NCols = Obs.shape[1]
+    Tokens = np.array([Line[:NCols] for Line in Lines])
+
+    # Skip the lines of the satellites without slot
+    Known = np.array([Label in SatSlotIdx for Label in Tokens[:, ObsIdx["PRN"]]])
+    if not np.all(Known):
+        sys.stderr.write("WARNING: Unknown satellite(s) %s in OBS file, %d lines skipped\n" %
+        (" ".join(np.unique(Tokens[~Known, ObsIdx["PRN"]])), np.sum(~Known)))
+        Tokens = Tokens[Known]
+        Obs = Obs[Known]
+
+    for Name, Idx in ObsIdx.items():
+        if Name == "PRN":
+            # Map the labels to satellite slots
+            Labels, Inverse = np.unique(Tokens[:, Idx], return_inverse=True)
+            Slots = np.array([SatSlotIdx[Label] for Label in Labels])
+            Obs[:, Idx] = Slots[Inverse]
+
+        else:
+            Obs[:, Idx] = Tokens[:, Idx].astype(np.float64)
+
+    return Obs
+
+# End of parseObsLines()
+
+
+def parseObsBlock(Lines):
+
+    # Purpose: parse a block of complete OBS epochs and split it in epochs
+    #          with the codes and phases aligned by satellite
+
+    # Parameters
+    # ==========
+    # Lines: list
+    #         Lines of complete epochs
+
+    # Returns
+    # =======
+    # Epochs: list
+    #         ObsInfo of each epoch (see readObsEpochs)
+
+    Epochs = []
+
+    # Split the codes and phases records
+    CodesObs = parseObsLines([Line.split() for Line in Lines if Line[0] == 'C'], ObsIdxC)
+    PhaseObs = parseObsLines([Line.split() for Line in Lines if Line[0] != 'C'], ObsIdxP)
+
+    # Find the limits of the epochs of the phases
+    PhaseBounds = np.flatnonzero(np.diff(PhaseObs[:, ObsIdxP["SOD"]])) + 1
+    PhaseStarts = np.r_[0, PhaseBounds]
+    PhaseEpochs = dict(zip(PhaseObs[PhaseStarts, ObsIdxP["SOD"]],
+    zip(PhaseStarts, np.r_[PhaseBounds, len(PhaseObs)])))
+
+    # Satellite slot to phase row lookup
+    PhaseRow = np.full(len(SatSlotLabels), -1)
+
+    # Loop over the epochs of the codes
+    CodeBounds = np.flatnonzero(np.diff(CodesObs[:, ObsIdxC["SOD"]])) + 1
+    for Start, End in zip(np.r_[0, CodeBounds], np.r_[CodeBounds, len(CodesObs)]):
+        EpochCodes = CodesObs[Start:End]
+        Sod = EpochCodes[0, ObsIdxC["SOD"]]
+        PhaseLimits = PhaseEpochs.pop(Sod, None)
+        if PhaseLimits is None:
+            sys.stderr.write("WARNING: No phase measurements at SOD %d, "\
+                "%d code measurements skipped\n" % (Sod, len(EpochCodes)))
+            continue
+        EpochPhases = PhaseObs[PhaseLimits[0]:PhaseLimits[1]]
+
+        # Align the phases to the codes
+        PhaseRow[:] = -1
+        PhaseRow[EpochPhases[:, ObsIdxP["PRN"]].astype(int)] = np.arange(len(EpochPhases))
+        Rows = PhaseRow[EpochCodes[:, ObsIdxC["PRN"]].astype(int)]
+        Found = Rows >= 0
+
+        # Report the measurements without their pair
+        if not np.all(Found):
+            sys.stderr.write("WARNING: No phase measurement of %s at SOD %d, "\
+                "code measurements skipped\n" % (" ".join(SatSlotLabels[int(Slot)]
+                for Slot in EpochCodes[~Found, ObsIdxC["PRN"]]), Sod))
+        if np.sum(Found) < len(EpochPhases):
+            Paired = np.zeros(len(EpochPhases), dtype=bool)
+            Paired[Rows[Found]] = True
+            sys.stderr.write("WARNING: No code measurement of %s at SOD %d, "\
+                "phase measurements skipped\n" % (" ".join(SatSlotLabels[int(Slot)]
+                for Slot in EpochPhases[~Paired, ObsIdxP["PRN"]]), Sod))
+
+        Epochs.append([EpochCodes[Found], EpochPhases[Rows[Found]]])
+
+    # Epochs of the phases without codes
+    for Sod, PhaseLimits in PhaseEpochs.items():
+        sys.stderr.write("WARNING: No code measurements at SOD %d, "\
+            "%d phase measurements skipped\n" % (Sod, PhaseLimits[1] - PhaseLimits[0]))
+
+    return Epochs
+
+# End of parseObsBlock()
+
+
+def readObsEpochs(f, BlockSize=OBS_BLOCK_SIZE):
     
-    # Purpose: read one epoch of OBS file (all the LoS)
+    # Purpose: read the OBS file by blocks and yield its epochs one by one
     
     # Parameters
     # ==========
     # f: file descriptor
     #         OBS file
+    # BlockSize: int
+    #         Approximate size of the blocks read [bytes]
 
     # Returns
     # =======
-    # EpochObsC: list
-    #         list of the split lines for Codes
-    # EpochObsP: list
-    #         list of the split lines for Phases
-    #         EpochInfoC[1][1] is the second field of the 
-    #         second line
+    # Generator of ObsInfo: list
+    #         ObsInfo[0]: np.array with the Codes of the epoch,
+    #         columns as in ObsIdxC
+    #         ObsInfo[1]: np.array with the Phases of the epoch,
+    #         columns as in ObsIdxP
+    #         Both arrays are aligned by satellite: ObsInfo[0][i] and 
+    #         ObsInfo[1][i] belong to the same satellite. The PRN column
+    #         holds the satellite slot: SatSlotLabels[int(Slot)] is the label
     
+    # Lines of the last epoch of the previous block
+    Pending = []
+
+    while True:
+        # Read a block of complete lines
+        Lines = f.readlines(BlockSize)
+        EndOfFile = (len(Lines) == 0)
+
+        # Discard blank and comment lines
+        Lines = Pending + [Line for Line in Lines if Line.strip() and Line[0] != '#']
+        Pending = []
+        if len(Lines) == 0:
+            return
+
+        # Keep the last epoch for the next block, as it may be incomplete
+        if not EndOfFile:
+            LastSod = Lines[-1].split()[ObsIdxC["SOD"]]
+            Cut = len(Lines)
+            while Cut > 0 and Lines[Cut - 1].split()[ObsIdxC["SOD"]] == LastSod:
+                Cut = Cut - 1
+            Pending = Lines[Cut:]
+            Lines = Lines[:Cut]
+
+        # Yield the complete epochs of the block
+        if len(Lines) > 0:
+            for ObsInfo in parseObsBlock(Lines):
+                yield ObsInfo
+
+        if EndOfFile:
+            return
+
+# End of readObsEpochs()
+
 
-    EpochObsC = []
-    EpochObsP = []
+def readObsDay(f, BlockSize=OBS_BLOCK_SIZE):
     
-    # Read one line
-    Line = f.readline()
-    if(not Line):
-        return []
-    LineSplit = splitLine(Line)
-    Sod = LineSplit[ObsIdxC["SOD"]]
-    SodNext = Sod
-
-    while SodNext == Sod:
-        if (LineSplit[0] == 'C'):
-            EpochObsC.append(LineSplit)
-        else:
-            EpochObsP.append(LineSplit)
-        Pointer = f.tell()
-        Line = f.readline()
-        LineSplit = splitLine(Line)
-        try: 
-            SodNext = LineSplit[ObsIdxC["SOD"]]
+    # Purpose: read the whole OBS file at once
+    
+    # Parameters
+    # ==========
+    # f: file descriptor
+    #         OBS file
+    # BlockSize: int
+    #         Approximate size of the blocks read [bytes]
 
-        except:
-            return EpochObsC, EpochObsP
+    # Returns
+    # =======
+    # ObsInfo: list
+    #         ObsInfo[0]: np.array with the Codes of all the epochs,
+    #         columns as in ObsIdxC
+    #         ObsInfo[1]: np.array with the Phases of all the epochs,
+    #         columns as in ObsIdxP
+    #         Rows are sorted by epoch and aligned by satellite, as in
+    #         readObsEpochs
 
-    f.seek(Pointer)
+    Epochs = list(readObsEpochs(f, BlockSize))
+    if len(Epochs) == 0:
+        return [np.zeros((0, max(ObsIdxC.values()) + 1)),
+        np.zeros((0, max(ObsIdxP.values()) + 1))]
 
-    return EpochObsC, EpochObsP
+    return [np.concatenate([Epoch[0] for Epoch in Epochs]),
+    np.concatenate([Epoch[1] for Epoch in Epochs])]
 
-# End of readObsEpoch()
+# End of readObsDay()
+
+
+def splitObsEpochs(ObsInfo):
+
+    # Purpose: yield one by one the epochs of OBS measurements read at once
+
+    # Parameters
+    # ==========
+    # ObsInfo: list
+    #         OBS info of several epochs, as returned by readObsDay
+
+    # Returns
+    # =======
+    # Generator of ObsInfo: list
+    #         OBS info of each epoch, as yielded by readObsEpochs
+
+    CodesObs = ObsInfo[0]
+    PhaseObs = ObsInfo[1]
+
+    Bounds = np.flatnonzero(np.diff(CodesObs[:, ObsIdxC["SOD"]])) + 1
+    for Start, End in zip(np.r_[0, Bounds], np.r_[Bounds, len(CodesObs)]):
+        if End > Start:
+            yield [CodesObs[Start:End], PhaseObs[Start:End]]
+
+# End of splitObsEpochs()
 
 
 def createOutputFile(Path, Hdr):
@@ -867,12 +1209,12 @@ def createOutputFile(Path, Hdr):
     # Display Message
     print("INFO: Creating file: %s..." % Path)
 
-    # Create output directory, if needed
-    if not os.path.exists(os.path.dirname(Path)):
-        os.makedirs(os.path.dirname(Path))
+    # Create output directory, if needed (several days may create it at
+    # the same time)
+    os.makedirs(os.path.dirname(Path), exist_ok=True)
 
     # Open PREPRO OBS file
-    f = open(Path, 'w')
+    f = open(Path, 'w', buffering=OUTPUT_BUFFER_SIZE)
 
     # Write header
     f.write(Hdr)
@@ -882,7 +1224,50 @@ def createOutputFile(Path, Hdr):
 # End of createOutputFile()
 
 
-def generatePreproFile(fpreprobs, PreproObsInfo):
+def buildPreproRecords(PreproObsInfo):
+
+    # Purpose: build the output records of the Preprocessing results
+
+    # Parameters
+    # ==========
+    # PreproObsInfo: dict
+    #         Dictionary containing Preprocessing info for the 
+    #         current epoch
+
+    # Returns
+    # =======
+    # Records: list
+    #         Output fields of each satellite (tuple), as in PreproFmt
+
+    # One record per satellite, columns as in PreproIdx
+    Records = [(
+        SatPreproObs["Sod"],
+        SatLabel,
+        SatPreproObs["Elevation"],
+        SatPreproObs["Azimuth"],
+        SatPreproObs["Valid"],
+        SatPreproObs["RejectionCause"],
+        SatPreproObs["Status"],
+        SatPreproObs["C1"],
+        SatPreproObs["C2"],
+        SatPreproObs["L1Meters"],
+        SatPreproObs["L2Meters"],
+        SatPreproObs["S1"],
+        SatPreproObs["S2"],
+        SatPreproObs["RangeRateL1"],
+        SatPreproObs["RangeRateStepL1"],
+        SatPreproObs["PhaseRateL1"],
+        SatPreproObs["PhaseRateStepL1"],
+        SatPreproObs["IF_C"],
+        SatPreproObs["IF_P"],
+        SatPreproObs["SmoothIF"])
+        for SatLabel, SatPreproObs in PreproObsInfo.items()]
+
+    return Records
+
+# End of buildPreproRecords()
+
+def generatePreproFile(fpreprobs, PreproObsInfo, BinOut=None):
 
     # Purpose: generate output file with Preprocessing results
 
@@ -893,42 +1278,21 @@ def generatePreproFile(fpreprobs, PreproObsInfo):
     # PreproObsInfo: dict
     #         Dictionary containing Preprocessing info for the 
     #         current epoch
+    # BinOut: dict
+    #         Binary PREPRO OBS output (see createBinOutput), None if 
+    #         disabled
 
     # Returns
     # =======
     # Nothing
 
-    # Loop over satellites
-    for SatLabel, SatPreproObs in PreproObsInfo.items():
-        # Prepare outputs
-        Outputs = OrderedDict({})
-        Outputs["SOD"] = SatPreproObs["Sod"]
-        Outputs["PRN"] = SatLabel
-        Outputs["ELEV"] = SatPreproObs["Elevation"]
-        Outputs["AZIM"] = SatPreproObs["Azimuth"]
-        Outputs["VALID"] = SatPreproObs["Valid"]
-        Outputs["REJECT"] = SatPreproObs["RejectionCause"]
-        Outputs["STATUS"] = SatPreproObs["Status"]
-        Outputs["C1"] = SatPreproObs["C1"]
-        Outputs["C2"] = SatPreproObs["C2"]
-        Outputs["L1"] = SatPreproObs["L1Meters"]
-        Outputs["L2"] = SatPreproObs["L2Meters"]
-        Outputs["S1"] = SatPreproObs["S1"]
-        Outputs["S2"] = SatPreproObs["S2"]
-        Outputs["CODE_RATE"] = SatPreproObs["RangeRateL1"]
-        Outputs["CODE_RATE_STEP"] = SatPreproObs["RangeRateStepL1"]
-        Outputs["PHASE_RATE"] = SatPreproObs["PhaseRateL1"]
-        Outputs["PHASE_RATE_STEP"] = SatPreproObs["PhaseRateStepL1"]
-        Outputs["CODE_IF"] = SatPreproObs["IF_C"]
-        Outputs["PHASE_IF"] = SatPreproObs["IF_P"]
-        Outputs["SMOOTH_IF"] = SatPreproObs["SmoothIF"]
-        # Outputs["GEOMFREE"] = SatPreproObs["GeomFree_P"]
-
-        # Write line
-        for i, result in enumerate(Outputs):
-            fpreprobs.write(((PreproFmt[i] + " ") % Outputs[result]))
-
-        fpreprobs.write("\n")
+    Records = buildPreproRecords(PreproObsInfo)
+
+    # Write the epoch at once
+    fpreprobs.write("".join([PreproLineFmt % Record for Record in Records]))
+
+    if BinOut is not None:
+        appendBinOutput(BinOut, Records)
 
 # End of generatePreproFile
 
@@ -971,249 +1335,624 @@ def openInputFile(Path):
 
 
 
-# --------------------------------------------------------------------------------------------------------------------------------
+def groupBySatellite(Labels, Sods, Columns):
 
-def readLeoPos(SatPosFile):
-    first_line = True
+    # Purpose: split columns read from a product file in per-satellite
+    #          contiguous float64 arrays sorted by SOD
 
-    fields = []
-    dict = {}
+    # Parameters
+    # ==========
+    # Labels: np.array
+    #         Satellite label of each row (e.g. "G01")
+    # Sods: np.array
+    #         SOD of each row
+    # Columns: dict
+    #         Arrays to split, one row per file row
 
-    with open(SatPosFile, 'r') as f:
-        Lines = f.readlines()
+    # Returns
+    # =======
+    # SatTable: dict
+    #         Per-satellite arrays, sorted by SOD
+    #         SatTable["G01"]["SOD"], SatTable["G01"][Column]
 
-        for Line in Lines:
+    SatTable = {}
 
-            if first_line and '#' in Line:
-                first_line = False
-                number_fields = len(Line.split())
+    # Sort by satellite and then by SOD
+    Order = np.lexsort((Sods, Labels))
+    Labels = Labels[Order]
 
-                for i in range(0, number_fields):
-                    dict[i] = []
+    # Split the rows in contiguous blocks, one per satellite
+    Bounds = np.flatnonzero(Labels[1:] != Labels[:-1]) + 1
+    for Start, End in zip(np.r_[0, Bounds], np.r_[Bounds, len(Labels)]):
+        SatRows = Order[Start:End]
+        SatTable[str(Labels[Start])] = {
+            "SOD": np.ascontiguousarray(Sods[SatRows], dtype=np.float64)
+        }
+        for Column, Values in Columns.items():
+            SatTable[str(Labels[Start])][Column] = \
+                np.ascontiguousarray(Values[SatRows], dtype=np.float64)
 
-                fields = list(dict.keys()) 
+    return SatTable
 
-            elif not first_line and '#' not in Line:
-                line_splited = Line.split()
+# End of groupBySatellite()
 
-                for i in range(0, number_fields):
-                    dict[fields[i-1]].append(float(line_splited[i-1]))
 
-    return pd.DataFrame.from_dict(dict)
+def readProductFile(Path, ColIdx, HdrLines=0):
 
-# End of readLeoPos()
+    # Purpose: load an input product file (LEO POS, LEO QUAT, SAT POS, 
+    #          SAT APO, SAT CLK, SAT BIA) straight into typed columns
 
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to file
+    # ColIdx: OrderedDict
+    #         File columns map (LeoPosIdx, SatPosIdx...)
+    # HdrLines: int
+    #         Number of header lines not starting with '#'
 
-# --------------------------------------------------------------------------------------------------------------------------------
-def readLeoQuat(SatPosFile):
-    first_line = True
+    # Returns
+    # =======
+    # Info: DataFrame
+    #         File content, one typed column per ColIdx entry, labelled
+    #         by its index: Info[ColIdx["SOD"]]
 
-    fields = []
-    dict = {}
+    # Build the schema from the columns map
+    ColTypes = OrderedDict({})
+    for Name, Idx in ColIdx.items():
+        ColTypes[Idx] = ProductColTypes.get(Name, np.float64)
 
-    with open(SatPosFile, 'r') as f:
-        Lines = f.readlines()
+    # Parse the file with the C engine
+    Info = pd.read_csv(Path, sep=r'\s+', header=None, comment='#',
+    skiprows=HdrLines, usecols=list(ColTypes.keys()), dtype=ColTypes,
+    engine='c')
+
+    return Info
+
+# End of readProductFile()
+
+
+def getSatLabels(Info, ColIdx):
+
+    # Purpose: build the satellite labels (e.g. "G01") of a product file
+    #          read with readProductFile
+
+    # Parameters
+    # ==========
+    # Info: DataFrame
+    #         File content
+    # ColIdx: OrderedDict
+    #         File columns map
+
+    # Returns
+    # =======
+    # Labels: np.array
+    #         Satellite label of each row
+
+    Consts = Info[ColIdx["CONST"]].to_numpy().astype(str)
+    Prns = np.char.zfill(Info[ColIdx["PRN"]].to_numpy().astype(str), 2)
+
+    return np.char.add(Consts, Prns)
+
+# End of getSatLabels()
 
-        for Line in Lines:
 
-            if first_line and '#' in Line:
-                first_line = False
-                number_fields = len(Line.split())
+def readLeoPos(LeoPosFile):
 
-                for i in range(0, number_fields):
-                    dict[i] = []
+    # Purpose: read LEO POS file
 
-                fields = list(dict.keys()) 
+    return readProductFile(LeoPosFile, LeoPosIdx)
 
-            elif not first_line and '#' not in Line:
-                line_splited = Line.split()
+# End of readLeoPos()
+
+
+def readLeoQuat(LeoQuatFile):
 
-                for i in range(0, number_fields):
-                    dict[fields[i-1]].append(float(line_splited[i-1]))
+    # Purpose: read LEO QUATERNIONS file
 
-    return pd.DataFrame.from_dict(dict)
+    return readProductFile(LeoQuatFile, LeoQuatIdx)
 
 # End of readLeoQuat()
 
 
-# --------------------------------------------------------------------------------------------------------------------------------
 def readSatPos(SatPosFile):
-    first_line = True
 
-    fields = []
-    dict = {}
+    # Purpose: read SAT POS file (SP3 positions)
 
-    with open(SatPosFile, 'r') as f:
-        Lines = f.readlines()
+    return readProductFile(SatPosFile, SatPosIdx)
 
-        for Line in Lines:
+# End of readSatPos()
 
-            if first_line and '#' in Line:
-                first_line = False
-                number_fields = len(Line.split())
 
-                for i in range(0, number_fields):
-                    dict[i] = []
+def readSatApo(SatApoFile):
 
-                fields = list(dict.keys()) 
+    # Purpose: read SAT APO file (ANTEX offsets)
 
-            elif not first_line and '#' not in Line:
-                line_splited = Line.split()
+    return readProductFile(SatApoFile, SatApoIdx, HdrLines=1)
 
-                for i in range(0, number_fields):
-                    dict[fields[i-1]].append(line_splited[i-1])
+# End of readSatApo()
 
-    return pd.DataFrame.from_dict(dict)
 
-# End of readSatPos()
+def readSatClk(SatClkFile):
 
+    # Purpose: read SAT CLK file and build the per-satellite clock table
 
-# --------------------------------------------------------------------------------------------------------------------------------
-def readSatApo(SatPosFile):
-    first_line = True
+    # Returns
+    # =======
+    # SatClkInfo: dict
+    #         Clock table per satellite, sorted by SOD
+    #         SatClkInfo["G01"]["SOD"], SatClkInfo["G01"]["CLK-BIAS"]
 
-    fields = []
-    dict = {}
+    SatClkInfo = readProductFile(SatClkFile, SatClkIdx)
 
-    with open(SatPosFile, 'r') as f:
-        Lines = f.readlines()
+    # Build the per-satellite clock table
+    return groupBySatellite(getSatLabels(SatClkInfo, SatClkIdx),
+    SatClkInfo[SatClkIdx["SOD"]].to_numpy(),
+    {"CLK-BIAS": SatClkInfo[SatClkIdx["CLK-BIAS"]].to_numpy()})
 
-        for Line in Lines:
+# End of readSatClk()
 
-            if first_line:
-                first_line = False
-                number_fields = len(Line.split())
 
-                for i in range(0, number_fields):
-                    dict[i] = []
+def readSatBia(SatBiaFile):
 
-                fields = list(dict.keys()) 
+    # Purpose: read SAT BIA file
 
-            elif not first_line:
-                line_splited = Line.split()
+    return readProductFile(SatBiaFile, SatBiaIdx, HdrLines=1)
 
-                for i in range(0, number_fields):
-                    dict[fields[i-1]].append(line_splited[i-1])
+# End of readSatBia()
 
-    return pd.DataFrame.from_dict(dict)
 
-# End of readSatApo()
+# Static inputs loaded in this process, by file and reader
+StaticInputCache = {}
 
+def hashInputFile(Path):
 
-# --------------------------------------------------------------------------------------------------------------------------------
-def readSatClk(SatPosFile):
-    first_line = True
+    # Purpose: compute the hash of the content of an input file
 
-    fields = []
-    dict = {}
+    Hash = hashlib.sha1()
+    with open(Path, 'rb') as f:
+        for Chunk in iter(lambda: f.read(1 << 20), b''):
+            Hash.update(Chunk)
 
-    with open(SatPosFile, 'r') as f:
-        Lines = f.readlines()
+    return Hash.hexdigest()
 
-        for Line in Lines:
+# End of hashInputFile()
 
-            if first_line and '#' in Line:
-                first_line = False
-                number_fields = len(Line.split())
 
-                for i in range(0, number_fields):
-                    dict[i] = []
+def loadStaticInput(Path, Reader, CacheDir=None):
 
-                fields = list(dict.keys()) 
+    # Purpose: load an input product fixed for the whole scenario (e.g. 
+    #          SAT APO, SAT BIA) only once. The product is kept in memory
+    #          and, if CacheDir is given, in a binary file there, so that
+    #          later runs of the scenario skip the parsing. The file is
+    #          parsed again only if its content changes: a different
+    #          modification time or size triggers a content hash check
 
-            elif not first_line and '#' not in Line:
-                line_splited = Line.split()
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to file
+    # Reader: function
+    #         Function reading the file (readSatApo, readSatBia...)
+    # CacheDir: str
+    #         Directory of the on-disk cache (None to disable it)
+
+    # Returns
+    # =======
+    # Info: object
+    #         File content, as returned by Reader
+
+    Stat = os.stat(Path)
+    Stamp = (Stat.st_mtime_ns, Stat.st_size)
+    Key = (os.path.abspath(Path), Reader.__name__)
+
+    # Look for the product in memory and then on disk
+    Cached = StaticInputCache.get(Key)
+    CacheFile = None
+    if CacheDir is not None:
+        CacheFile = os.path.join(CacheDir, "%s.%s.pkl" % 
+        (os.path.basename(Path), Reader.__name__))
+        if Cached is None and os.path.isfile(CacheFile):
+            try:
+                with open(CacheFile, 'rb') as f:
+                    Cached = pickle.load(f)
+            except Exception:
+                Cached = None
+
+    # Check the content of the file if it has been touched
+    Save = False
+    if Cached is not None and Cached["Stamp"] != Stamp:
+        Hash = hashInputFile(Path)
+        if Hash == Cached["Hash"]:
+            Cached["Stamp"] = Stamp
+            Save = True
+        else:
+            Cached = None
 
-                for i in range(0, number_fields):
-                    dict[fields[i-1]].append(line_splited[i-1])
+    # Parse the file
+    if Cached is None:
+        Cached = {
+            "Stamp": Stamp,
+            "Hash": hashInputFile(Path),
+            "Info": Reader(Path),
+        }
+        Save = True
 
-    return pd.DataFrame.from_dict(dict)
+    StaticInputCache[Key] = Cached
 
-# End of readSatClk()
+    # Update the on-disk cache, through a temporary file of the process 
+    # so that an interrupted run or the other days running in parallel 
+    # do not leave it corrupted
+    if Save and CacheFile is not None:
+        os.makedirs(CacheDir, exist_ok=True)
+        TmpFile = "%s.%d.tmp" % (CacheFile, os.getpid())
+        with open(TmpFile, 'wb') as f:
+            pickle.dump(Cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(TmpFile, CacheFile)
+
+    return Cached["Info"]
+
+# End of loadStaticInput()
 
 
 # --------------------------------------------------------------------------------------------------------------------------------
-def readSatBia(SatPosFile):
-    first_line = True
+def buildCorrRecords(CorrInfo):
 
-    fields = []
-    dict = {}
+    # Purpose: build the output records of the corrected measurements
 
-    with open(SatPosFile, 'r') as f:
-        Lines = f.readlines()
+    # Parameters
+    # ==========
+    # CorrInfo: dict
+    #         Corrected measurements for the current epoch per sat
 
-        for Line in Lines:
+    # Returns
+    # =======
+    # Records: list
+    #         Output fields of each satellite (tuple), as in CorrFmt
+
+    # One record per satellite, columns as in CorrIdx
+    Records = [(
+        SatCorrInfo["Sod"],
+        SatLabel[:1],
+        int(SatLabel[1:]),
+        SatCorrInfo["Elevation"],
+        SatCorrInfo["Azimuth"],
+        SatCorrInfo["Flag"],
+        SatCorrInfo["LeoX"],
+        SatCorrInfo["LeoY"],
+        SatCorrInfo["LeoZ"],
+        SatCorrInfo["LeoApoX"],
+        SatCorrInfo["LeoApoY"],
+        SatCorrInfo["LeoApoZ"],
+        SatCorrInfo["SatX"],
+        SatCorrInfo["SatY"],
+        SatCorrInfo["SatZ"],
+        SatCorrInfo["SatApoX"],
+        SatCorrInfo["SatApoY"],
+        SatCorrInfo["SatApoZ"],
+        SatCorrInfo["SatClk"],
+        SatCorrInfo["SatCodeBia"],
+        SatCorrInfo["SatPhaseBia"],
+        SatCorrInfo["FlightTime"],      # TOF stands for Time of Flight
+        SatCorrInfo["Dtr"],
+        SatCorrInfo["CorrCode"],
+        SatCorrInfo["CorrPhase"],
+        SatCorrInfo["GeomRange"],
+        SatCorrInfo["CodeResidual"],
+        SatCorrInfo["PhaseResidual"],
+        SatCorrInfo["RcvrClk"],
+        SatCorrInfo["SigmaUere"])
+        for SatLabel, SatCorrInfo in CorrInfo.items()]
+
+    return Records
+
+# End of buildCorrRecords()
+
+def generateCorrFile(fcorr, CorrInfo, BinOut=None):
+
+    # Purpose: generate output file with the corrected measurements
+
+    # Parameters
+    # ==========
+    # fcorr: file descriptor
+    #         Descriptor for CORR output file
+    # CorrInfo: dict
+    #         Corrected measurements for the current epoch per sat
+    # BinOut: dict
+    #         Binary CORR output (see createBinOutput), None if disabled
+
+    # Returns
+    # =======
+    # Nothing
 
-            if first_line:
-                first_line = False
-                number_fields = len(Line.split())
+    Records = buildCorrRecords(CorrInfo)
 
-                for i in range(0, number_fields):
-                    dict[i] = []
+    # Write the epoch at once
+    fcorr.write("".join([CorrLineFmt % Record for Record in Records]))
 
-                fields = list(dict.keys()) 
+    if BinOut is not None:
+        appendBinOutput(BinOut, Records)
 
-            elif not first_line:
-                line_splited = Line.split()
+# End of generateCorrFile
 
-                for i in range(0, number_fields):
-                    dict[fields[i-1]].append(line_splited[i-1])
 
-    return pd.DataFrame.from_dict(dict)
+# --------------------------------------------------------------------------------------------------------------------------------
+def generatePosFile(fpos, PosInfo):
 
-# End of readSatApo()
+    # Purpose: generate output file with the navigation solution
+
+    # Parameters
+    # ==========
+    # fpos: file descriptor
+    #         Descriptor for POS output file
+    # PosInfo: dict
+    #         Navigation solution per field, one value per epoch, as
+    #         returned by runPvt
+
+    # Returns
+    # =======
+    # Nothing
+
+    # Prepare outputs
+    Outputs = OrderedDict({})
+    Outputs["SOD"] = PosInfo["Sod"]
+    Outputs["DOY"] = PosInfo["Doy"]
+    Outputs["LON"] = PosInfo["Lon"]
+    Outputs["LAT"] = PosInfo["Lat"]
+    Outputs["ALT"] = PosInfo["Alt"]
+    Outputs["POS-X"] = PosInfo["X"]
+    Outputs["POS-Y"] = PosInfo["Y"]
+    Outputs["POS-Z"] = PosInfo["Z"]
+    Outputs["RCVR-CLK"] = PosInfo["RcvrClk"]
+    Outputs["ISB"] = PosInfo["Isb"]
+    Outputs["NSV"] = PosInfo["NSats"]
+    Outputs["NITER"] = PosInfo["NIter"]
+    Outputs["GDOP"] = PosInfo["Gdop"]
+    Outputs["PDOP"] = PosInfo["Pdop"]
+    Outputs["HDOP"] = PosInfo["Hdop"]
+    Outputs["VDOP"] = PosInfo["Vdop"]
+    Outputs["TDOP"] = PosInfo["Tdop"]
+    Outputs["HPE"] = PosInfo["Hpe"]
+    Outputs["VPE"] = PosInfo["Vpe"]
+    Outputs["FLAG"] = PosInfo["Flag"]
+
+    # Write all the epochs at once
+    fpos.write("".join(PosLineFmt % Values for Values in zip(*Outputs.values())))
+
+# End of generatePosFile
 
 
 # --------------------------------------------------------------------------------------------------------------------------------
-def generateCorrFile(fcorr, CorrInfo):
-    for SatLabel, SatCorrInfo in CorrInfo.items():
-        # Prepare outputs
-        Outputs = OrderedDict({})
-        Outputs["SOD"] = SatCorrInfo["Sod"]
-        Outputs["CONST"] = SatLabel[:1]
-        Outputs["PRN"] = int(SatLabel[1:])
-        Outputs["ELEV"] = SatCorrInfo["Elevation"]
-        Outputs["AZIM"] = SatCorrInfo["Azimuth"]
-        Outputs["FLAG"] = SatCorrInfo["Flag"]
-
-        Outputs["LEO-X"] = SatCorrInfo["LeoX"]
-        Outputs["LEO-Y"] = SatCorrInfo["LeoY"]
-        Outputs["LEO-Z"] = SatCorrInfo["LeoZ"]
-
-        Outputs["LEO-APO-X"] = SatCorrInfo["LeoApoX"]
-        Outputs["LEO-APO-Y"] = SatCorrInfo["LeoApoY"]
-        Outputs["LEO-APO-Z"] = SatCorrInfo["LeoApoZ"]
-
-        Outputs["SAT-X"] = SatCorrInfo["SatX"]
-        Outputs["SAT-Y"] = SatCorrInfo["SatY"]
-        Outputs["SAT-Z"] = SatCorrInfo["SatZ"]
-
-        Outputs["SAT-APO-X"] = SatCorrInfo["SatApoX"]
-        Outputs["SAT-APO-Y"] = SatCorrInfo["SatApoY"]
-        Outputs["SAT-APO-Z"] = SatCorrInfo["SatApoZ"]
-
-        Outputs["SAT-CLK"] = SatCorrInfo["SatClk"]
-        Outputs["SAT-CODE-BIA"] = SatCorrInfo["SatCodeBia"]
-        Outputs["SAT-PHASE-BIA"] = SatCorrInfo["SatPhaseBia"]
-
-        Outputs["TOF"] = SatCorrInfo["FlightTime"]      # TOF stands for Time of Flight
-        Outputs["DTR"] = SatCorrInfo["Dtr"]
-        Outputs["CORR-CODE"] = SatCorrInfo["CorrCode"]
-        Outputs["CORR-PHASE"] = SatCorrInfo["CorrPhase"]
-        Outputs["GEOM-RNGE"] = SatCorrInfo["GeomRange"]
-
-        Outputs["CODE-RES"] = SatCorrInfo["CodeResidual"]
-        Outputs["PHASE-RES"] = SatCorrInfo["PhaseResidual"]
-        Outputs["RCVR-CLK"] = SatCorrInfo["RcvrClk"]
-
-        Outputs["SUERE"] =SatCorrInfo["SigmaUere"]
-
-        warnings.simplefilter(action='ignore', category=FutureWarning)
-
-        # Write line
-        for i, result in enumerate(Outputs):
-            fcorr.write(((CorrFmt[i] + " ") % Outputs[result]))
-
-        fcorr.write("\n")
-
-# End of generatePreproFile
\ No newline at end of file
+def getBinOutputPath(Path):
+
+    # Purpose: get the path to the binary output of a text output file
+    #          (a directory with one .npy file per column)
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to the text output file
+
+    # Returns
+    # =======
+    # BinPath: str
+    #         Path to the binary output
+
+    return os.path.splitext(Path)[0] + BIN_OUTPUT_SUFFIX
+
+# End of getBinOutputPath()
+
+def createBinOutput(Path, ColIdx, Fmt):
+
+    # Purpose: create a binary columnar output, written along with a 
+    #          text output file from its same records
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to the text output file
+    # ColIdx: dict
+    #         Column names of the records, as in CorrIdx
+    # Fmt: list
+    #         Line format of the text output, giving the column types
+    #         (%d: int64, %s: str, float64 otherwise)
+
+    # Returns
+    # =======
+    # BinOut: dict
+    #         Binary output, to be filled with appendBinOutput and
+    #         completed with closeBinOutput
+
+    BinOut = OrderedDict({})
+    BinOut["Path"] = getBinOutputPath(Path)
+    BinOut["Names"] = list(ColIdx.keys())
+    BinOut["Types"] = [np.int64 if ColFmt.endswith("d") else 
+    str if ColFmt.endswith("s") else np.float64 for ColFmt in Fmt]
+    BinOut["Pending"] = []
+    BinOut["NChunks"] = 0
+
+    # Display Message
+    print("INFO: Creating file: %s..." % BinOut["Path"])
+
+    # Create output directory, if needed
+    os.makedirs(BinOut["Path"], exist_ok=True)
+
+    # The output is not complete until it is closed. Remove the chunks 
+    # left by an interrupted run
+    for File in os.listdir(BinOut["Path"]):
+        if File == BIN_OUTPUT_DONE or File.endswith(BIN_OUTPUT_CHUNK_SUFFIX):
+            os.remove(os.path.join(BinOut["Path"], File))
+
+    return BinOut
+
+# End of createBinOutput()
+
+def getBinChunkPath(BinOut, Name, iChunk):
+
+    # Purpose: get the path to a chunk of a column of a binary output
+
+    return os.path.join(BinOut["Path"], "%s.%06d%s" % 
+    (Name, iChunk, BIN_OUTPUT_CHUNK_SUFFIX))
+
+# End of getBinChunkPath()
+
+def flushBinOutput(BinOut):
+
+    # Purpose: convert the pending records of a binary output to columns
+    #          and write them to disk, one chunk file per column
+
+    # Parameters
+    # ==========
+    # BinOut: dict
+    #         Binary output, as returned by createBinOutput
+
+    # Returns
+    # =======
+    # Nothing
+
+    if len(BinOut["Pending"]) == 0:
+        return
+
+    Columns = list(zip(*BinOut["Pending"]))
+    for Name, Column, Type in zip(BinOut["Names"], Columns, BinOut["Types"]):
+        if Type is np.int64:
+            # Same truncation as the %d text format
+            Chunk = np.trunc(np.array(Column, dtype=np.float64)).astype(np.int64)
+        else:
+            Chunk = np.array(Column, dtype=Type)
+        with open(getBinChunkPath(BinOut, Name, BinOut["NChunks"]), 'wb') as f:
+            np.save(f, Chunk)
+    BinOut["NChunks"] = BinOut["NChunks"] + 1
+    BinOut["Pending"] = []
+
+# End of flushBinOutput()
+
+def appendBinOutput(BinOut, Records):
+
+    # Purpose: add records to a binary output
+
+    # Parameters
+    # ==========
+    # BinOut: dict
+    #         Binary output, as returned by createBinOutput
+    # Records: list
+    #         Output fields of each row (tuple), as in the text output
+
+    # Returns
+    # =======
+    # Nothing
+
+    BinOut["Pending"].extend(Records)
+    if len(BinOut["Pending"]) >= BIN_OUTPUT_CHUNK_ROWS:
+        flushBinOutput(BinOut)
+
+# End of appendBinOutput()
+
+def closeBinOutput(BinOut):
+
+    # Purpose: complete a binary output: join the chunks of each column 
+    #          in its .npy file, one chunk at a time, and mark the output
+    #          as complete at the end
+
+    # Parameters
+    # ==========
+    # BinOut: dict
+    #         Binary output, as returned by createBinOutput
+
+    # Returns
+    # =======
+    # Nothing
+
+    flushBinOutput(BinOut)
+
+    for Name, Type in zip(BinOut["Names"], BinOut["Types"]):
+        ChunkPaths = [getBinChunkPath(BinOut, Name, iChunk) 
+        for iChunk in range(BinOut["NChunks"])]
+
+        # Size and type of the column (the strings take the widest one)
+        Chunks = [np.load(ChunkPath, mmap_mode='r') for ChunkPath in ChunkPaths]
+        NRows = sum(len(Chunk) for Chunk in Chunks)
+        Dtype = np.dtype(Type)
+        if Type is str:
+            Dtype = max([Chunk.dtype for Chunk in Chunks] + [Dtype], 
+            key=lambda ChunkType: ChunkType.itemsize)
+
+        # Write the column through a temporary file
+        ColPath = os.path.join(BinOut["Path"], Name + ".npy")
+        TmpPath = "%s.%d.tmp" % (ColPath, os.getpid())
+        Column = np.lib.format.open_memmap(TmpPath, mode='w+', dtype=Dtype, 
+        shape=(NRows,))
+        Row = 0
+        for Chunk in Chunks:
+            Column[Row:Row + len(Chunk)] = Chunk
+            Row = Row + len(Chunk)
+        Column.flush()
+        del Column, Chunks
+        os.replace(TmpPath, ColPath)
+
+        for ChunkPath in ChunkPaths:
+            os.remove(ChunkPath)
+
+    # End of for Name, Type in zip(BinOut["Names"], BinOut["Types"])
+
+    # All the columns are written
+    open(os.path.join(BinOut["Path"], BIN_OUTPUT_DONE), 'w').close()
+
+# End of closeBinOutput()
+
+def isBinOutputUpToDate(Path):
+
+    # Purpose: check if the binary output of a text output file is 
+    #          complete and not older than the text file
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to the text output file
+
+    # Returns
+    # =======
+    # UpToDate: bool
+    #         True if the binary output can be read instead of the text
+
+    Done = os.path.join(getBinOutputPath(Path), BIN_OUTPUT_DONE)
+
+    return os.path.isfile(Done) and os.path.isfile(Path) and \
+        os.path.getmtime(Done) >= os.path.getmtime(Path)
+
+# End of isBinOutputUpToDate()
+
+def readBinOutput(Path, Columns=None, MemMap=True):
+
+    # Purpose: read columns of a binary output
+
+    # Parameters
+    # ==========
+    # Path: str
+    #         Path to the binary output or to its text output file
+    # Columns: list
+    #         Names of the columns to read, as in CorrIdx or PreproIdx
+    #         (None to read all of them)
+    # MemMap: bool
+    #         Map the columns in memory instead of reading them
+
+    # Returns
+    # =======
+    # Data: dict
+    #         Array of each column, by name
+
+    if not os.path.isdir(Path):
+        Path = getBinOutputPath(Path)
+
+    if Columns is None:
+        Columns = sorted(os.path.splitext(File)[0] for File in os.listdir(Path) 
+        if File.endswith(".npy"))
+
+    Data = OrderedDict({})
+    for Name in Columns:
+        Data[Name] = np.load(os.path.join(Path, Name + ".npy"), 
+        mmap_mode='r' if MemMap else None)
+
+    return Data
+
+# End of readBinOutput()
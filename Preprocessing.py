@@ -26,13 +26,348 @@ Common = os.path.dirname(os.path.dirname(
 sys.path.insert(0, Common)
 from collections import OrderedDict
 from COMMON import GnssConstants as Const
-from InputOutput import ObsIdxC, ObsIdxP, REJECTION_CAUSE
+from InputOutput import ObsIdxC, ObsIdxP, REJECTION_CAUSE, SatSlotLabels
 from InputOutput import FLAG, VALUE, TH, CSNEPOCHS, CSNPOINTS, CSPDEGREE
 import numpy as np
 
 # Preprocessing internal functions
 #-----------------------------------------------------------------------
 
+# Per-frequency keys of the preprocessed observations and rejection causes
+FreqInfo = [
+    # (Phase, Code, Wave, Phase Rate, Phase Rate Step, Code Rate, Code Rate Step,
+    #  Phase Rate cause, Phase Rate Step cause, Code Rate cause, Code Rate Step cause)
+    ("L1", "C1", "F1", "PhaseRateL1", "PhaseRateStepL1", "RangeRateL1", "RangeRateStepL1",
+    REJECTION_CAUSE["MAX_PHASE_RATE_F1"], REJECTION_CAUSE["MAX_PHASE_RATE_STEP_F1"],
+    REJECTION_CAUSE["MAX_CODE_RATE_F1"], REJECTION_CAUSE["MAX_CODE_RATE_STEP_F1"]),
+    ("L2", "C2", "F2", "PhaseRateL2", "PhaseRateStepL2", "RangeRateL2", "RangeRateStepL2",
+    REJECTION_CAUSE["MAX_PHASE_RATE_F2"], REJECTION_CAUSE["MAX_PHASE_RATE_STEP_F2"],
+    REJECTION_CAUSE["MAX_CODE_RATE_F2"], REJECTION_CAUSE["MAX_CODE_RATE_STEP_F2"]),
+]
+
+# Wavelengths and Gamma of each satellite slot (see SatSlotIdx)
+SlotWave = np.array([[Const.GPS_L1_WAVE, Const.GPS_L2_WAVE] if Label[0] == 'G' \
+    else [Const.GAL_E1_WAVE, Const.GAL_E5A_WAVE] for Label in SatSlotLabels])
+SlotGamma = np.array([Const.GPS_GAMMA_L1L2 if Label[0] == 'G' \
+    else Const.GAL_GAMMA_E1E5A for Label in SatSlotLabels])
+
+def initPreproState(Conf):
+
+    # Purpose: build the preprocessing filter state of all the satellites
+    #          as a structure of arrays, one array per field indexed by the
+    #          satellite slot (see SatSlotIdx). Fields depending on the
+    #          frequency have one column per frequency (0: f1, 1: f2)
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+
+    # Returns
+    # =======
+    # PrevPreproObsInfo: dict
+    #         Preprocessing state of the previous epoch
+    #         PrevPreproObsInfo["PrevC"][SatSlotIdx["G01"], 0]
+
+    NSlots = len(SatSlotLabels)
+    NPoints = int(Conf["CYCLE_SLIPS"][CSNPOINTS])
+    NEpochs = int(Conf["CYCLE_SLIPS"][CSNEPOCHS])
+    Degree = int(Conf["CYCLE_SLIPS"][CSPDEGREE])
+
+    PrevPreproObsInfo = {
+        "PrevEpoch": np.full(NSlots, 86400.0),                  # Previous SoD
+
+        "ResetHatchFilter": np.ones(NSlots, dtype=int),         # Flag to reset Hatch filter
+        "Ksmooth": np.zeros(NSlots),                            # Hatch filter K
+        "PrevSmooth": np.zeros(NSlots),                         # Previous Smooth Observable
+        "IF_P_Prev": np.zeros(NSlots),                          # Previous IF of the phases
+
+        "PrevL": np.full((NSlots, 2), Const.NAN),               # Previous Phases
+        "PrevPhaseRate": np.full((NSlots, 2), Const.NAN),       # Previous Phase Rates
+        "PrevC": np.full((NSlots, 2), Const.NAN),               # Previous Codes
+        "PrevRangeRate": np.full((NSlots, 2), Const.NAN),       # Previous Code Rates
+        "PrevRej": np.zeros(NSlots, dtype=int),                 # Previous Rejection Cause
+
+        "CycleSlipBuffIdx": np.zeros(NSlots, dtype=int),        # Number of samples in CS buffer
+        "CycleSlipBuffHead": np.zeros(NSlots, dtype=int),       # Oldest sample of the full CS ring buffer
+        "CycleSlipFlagIdx": np.zeros(NSlots, dtype=int),        # Index of CS flag array
+        "GF_L_Prev": np.zeros((NSlots, NPoints)),               # Previous GF carrier phase observables
+        "GF_Epoch_Prev": np.zeros((NSlots, NPoints)),           # Previous epochs
+        "CycleSlipFlags": np.zeros((NSlots, NEpochs)),          # Last cycle slips flags
+        "CycleSlipDetectFlag": np.zeros(NSlots, dtype=int),     # Flag indicating if a cycle slip has been detected
+
+        "CsFitRef": np.zeros((NSlots, 3)),                      # CS fit reference epoch, GF and time scale
+        "CsFitMoments": np.zeros((NSlots, 2 * Degree + 1)),     # CS fit sums of the time powers
+        "CsFitCross": np.zeros((NSlots, Degree + 1)),           # CS fit sums of the time powers by GF
+        "CsFitUpdates": np.zeros(NSlots, dtype=int),            # CS fit updates since the last rebuild
+
+        "PrealignOffset": np.zeros(NSlots),                     # Phase prealignment offset
+    }
+
+    return PrevPreproObsInfo
+
+# End of function initPreproState()
+
+def snapshotPreproState(PrevPreproObsInfo):
+
+    # Purpose: take a copy of the preprocessing state
+
+    return {Field: Values.copy() for Field, Values in PrevPreproObsInfo.items()}
+
+# End of function snapshotPreproState()
+
+def resetCycleSlipState(PrevPreproObsInfo, Slot):
+
+    # Purpose: reinitialize the cycle slips detection of a satellite
+
+    PrevPreproObsInfo["GF_L_Prev"][Slot] = 0.0
+    PrevPreproObsInfo["GF_Epoch_Prev"][Slot] = 0.0
+    PrevPreproObsInfo["CycleSlipBuffIdx"][Slot] = 0
+    PrevPreproObsInfo["CycleSlipBuffHead"][Slot] = 0
+    PrevPreproObsInfo["CycleSlipFlags"][Slot] = 0.0
+    PrevPreproObsInfo["CycleSlipFlagIdx"][Slot] = 0
+
+# End of function resetCycleSlipState()
+
+def buildCycleSlipFit(PrevPreproObsInfo, Slot):
+
+    # Purpose: build the least-squares normal equations of the polynomial
+    #          fit to the GF samples in the CS buffer of a satellite.
+    #          Time is referred to the newest sample and scaled by the 
+    #          buffer time span, and GF to the newest GF, to keep the 
+    #          normal equations well conditioned
+
+    # Parameters
+    # ==========
+    # PrevPreproObsInfo: dict
+    #         Preprocessing state (see initPreproState)
+    # Slot: int
+    #         Satellite slot
+
+    # Returns
+    # =======
+    # Nothing, the CsFit* fields of the satellite are rebuilt
+
+    GF_L_Prev = PrevPreproObsInfo["GF_L_Prev"][Slot]
+    GF_Epoch_Prev = PrevPreproObsInfo["GF_Epoch_Prev"][Slot]
+    NMoments = PrevPreproObsInfo["CsFitMoments"].shape[1]
+    NCross = PrevPreproObsInfo["CsFitCross"].shape[1]
+
+    # Reference: newest sample and time span of the buffer
+    Newest = (PrevPreproObsInfo["CycleSlipBuffHead"][Slot] - 1) % len(GF_L_Prev)
+    RefEpoch = GF_Epoch_Prev[Newest]
+    RefGF = GF_L_Prev[Newest]
+    Scale = max(RefEpoch - GF_Epoch_Prev.min(), 1.0)
+    PrevPreproObsInfo["CsFitRef"][Slot] = (RefEpoch, RefGF, Scale)
+
+    # Sums of the time powers and of the time powers by GF
+    Powers = ((GF_Epoch_Prev - RefEpoch) / Scale)[:, None] ** np.arange(NMoments)
+    PrevPreproObsInfo["CsFitMoments"][Slot] = Powers.sum(axis=0)
+    PrevPreproObsInfo["CsFitCross"][Slot] = \
+        np.dot(GF_L_Prev - RefGF, Powers[:, :NCross])
+    PrevPreproObsInfo["CsFitUpdates"][Slot] = 0
+
+# End of function buildCycleSlipFit()
+
+def updateCycleSlipFit(PrevPreproObsInfo, Slot, OldEpoch, OldGF, NewEpoch, NewGF):
+
+    # Purpose: slide the CS fit normal equations of a satellite, removing
+    #          the oldest sample of the buffer and adding the new one. 
+    #          The equations are rebuilt from the buffer once every 
+    #          buffer length updates to bound the accumulated rounding
+
+    # Parameters
+    # ==========
+    # PrevPreproObsInfo: dict
+    #         Preprocessing state (see initPreproState)
+    # Slot: int
+    #         Satellite slot
+    # OldEpoch, OldGF: float
+    #         Sample leaving the buffer
+    # NewEpoch, NewGF: float
+    #         Sample entering the buffer
+
+    # Returns
+    # =======
+    # Nothing, the CsFit* fields of the satellite are updated
+
+    PrevPreproObsInfo["CsFitUpdates"][Slot] += 1
+    if PrevPreproObsInfo["CsFitUpdates"][Slot] >= PrevPreproObsInfo["GF_L_Prev"].shape[1]:
+        buildCycleSlipFit(PrevPreproObsInfo, Slot)
+        return
+
+    RefEpoch, RefGF, Scale = PrevPreproObsInfo["CsFitRef"][Slot]
+    NMoments = PrevPreproObsInfo["CsFitMoments"].shape[1]
+    NCross = PrevPreproObsInfo["CsFitCross"].shape[1]
+
+    OldPowers = ((OldEpoch - RefEpoch) / Scale) ** np.arange(NMoments)
+    NewPowers = ((NewEpoch - RefEpoch) / Scale) ** np.arange(NMoments)
+    PrevPreproObsInfo["CsFitMoments"][Slot] += NewPowers - OldPowers
+    PrevPreproObsInfo["CsFitCross"][Slot] += \
+        (NewGF - RefGF) * NewPowers[:NCross] - (OldGF - RefGF) * OldPowers[:NCross]
+
+# End of function updateCycleSlipFit()
+
+def predictCycleSlipFit(PrevPreproObsInfo, Slot, Sod):
+
+    # Purpose: predict the GF of a satellite at Sod with the polynomial
+    #          fitted to the CS buffer, solving the small normal equations
+
+    # Parameters
+    # ==========
+    # PrevPreproObsInfo: dict
+    #         Preprocessing state (see initPreproState)
+    # Slot: int
+    #         Satellite slot
+    # Sod: float
+    #         Epoch of the prediction
+
+    # Returns
+    # =======
+    # TargetPred: float
+    #         Predicted GF
+
+    RefEpoch, RefGF, Scale = PrevPreproObsInfo["CsFitRef"][Slot]
+    Moments = PrevPreproObsInfo["CsFitMoments"][Slot]
+    Cross = PrevPreproObsInfo["CsFitCross"][Slot]
+    NCross = len(Cross)
+
+    # Normal matrix: Hankel matrix of the time powers sums
+    Normal = Moments[np.add.outer(np.arange(NCross), np.arange(NCross))]
+    try:
+        Polynom = np.linalg.solve(Normal, Cross)
+    except np.linalg.LinAlgError:
+        Polynom = np.linalg.lstsq(Normal, Cross, rcond=None)[0]
+
+    return RefGF + np.polynomial.polynomial.polyval((Sod - RefEpoch) / Scale, Polynom)
+
+# End of function predictCycleSlipFit()
+
+def detectCycleSlips(Conf, PhaseObs, PrevPreproObsInfo):
+
+    # Purpose: detect cycle slips on the Geometry-Free combination of the 
+    #          phases, fitting a polynomial to the previous GF measurements
+    #          and comparing the predicted value with the observed one.
+    #          The GF samples are kept in a ring buffer and the fit in its
+    #          normal equations, which are updated incrementally when a
+    #          sample enters the buffer instead of refitting every epoch
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # PhaseObs: np.array
+    #         Phases of the current epoch (columns as in ObsIdxP)
+    # PrevPreproObsInfo: dict
+    #         Preprocessing state (see initPreproState)
+
+    # Returns
+    # =======
+    # Nothing, CycleSlipDetectFlag is raised in PrevPreproObsInfo
+
+    # Get state fields
+    GF_L_Prev = PrevPreproObsInfo["GF_L_Prev"]
+    GF_Epoch_Prev = PrevPreproObsInfo["GF_Epoch_Prev"]
+    CycleSlipBuffIdx = PrevPreproObsInfo["CycleSlipBuffIdx"]
+    CycleSlipBuffHead = PrevPreproObsInfo["CycleSlipBuffHead"]
+    CycleSlipFlags = PrevPreproObsInfo["CycleSlipFlags"]
+    CycleSlipFlagIdx = PrevPreproObsInfo["CycleSlipFlagIdx"]
+
+    NPoints = int(Conf["CYCLE_SLIPS"][CSNPOINTS])
+    NEpochs = int(Conf["CYCLE_SLIPS"][CSNEPOCHS])
+
+    # Loop over Phase measurements
+    for SatPhaseObs in PhaseObs:
+
+        # Get SOD
+        Sod = SatPhaseObs[ObsIdxP["SOD"]]
+
+        # Get satellite slot
+        Slot = int(SatPhaseObs[ObsIdxP["PRN"]])
+
+        # Compute Geometry-Free in cycles
+        GF_Lcy = SatPhaseObs[ObsIdxP["L1"]] - SatPhaseObs[ObsIdxP["L2"]]
+
+        # Check Data Gaps
+        # (with respect to the last position of the buffer, which is
+        # the newest sample once the buffer is full)
+        Head = CycleSlipBuffHead[Slot]
+        DeltaT = Sod - GF_Epoch_Prev[Slot, (Head - 1) % NPoints]
+        if DeltaT > Conf["MAX_DATA_GAP"][TH]:
+            # Reinitialize CS detection
+            resetCycleSlipState(PrevPreproObsInfo, Slot)
+
+        # Get N
+        N = CycleSlipBuffIdx[Slot]
+
+        # If the buffer is full, we can detect the cycle slip with a polynom
+        if N == NPoints:
+            # Predict value evaluating the polynom fitted to the buffer
+            TargetPred = predictCycleSlipFit(PrevPreproObsInfo, Slot, Sod)
+
+            # Compute Residual
+            Residual = abs(GF_Lcy - TargetPred)
+
+            # Compute CS flag
+            CsFlag = Residual > Conf["CYCLE_SLIPS"][TH]
+
+            # Update CS flag buffer
+            CycleSlipFlagIdx[Slot] = (CycleSlipFlagIdx[Slot] + 1) % NEpochs
+            CycleSlipFlags[Slot, CycleSlipFlagIdx[Slot]] = CsFlag
+
+            # Check if threshold was exceeded CSNEPOCHS times
+            if (np.sum(CycleSlipFlags[Slot]) == NEpochs):
+                # Cycle Slip detected
+                PrevPreproObsInfo["CycleSlipDetectFlag"][Slot] = 1
+
+                # Reinitialize some variables
+                PrevPreproObsInfo["PrevC"][Slot] = Const.NAN                     # Previous Codes
+                PrevPreproObsInfo["PrevL"][Slot] = Const.NAN                     # Previous Phases
+                PrevPreproObsInfo["PrevRangeRate"][Slot] = Const.NAN             # Previous Code Rates
+                PrevPreproObsInfo["PrevPhaseRate"][Slot] = Const.NAN             # Previous Phase Rates
+
+                # Reinitialize CS detection
+                resetCycleSlipState(PrevPreproObsInfo, Slot)
+
+                # Raise flag to reset Hatch filter
+                PrevPreproObsInfo["ResetHatchFilter"][Slot] = 1
+
+            # If threshold was exceeded less than CSNEPOCHS times,
+            # don't update the buffer and set the measurement to invalid
+            elif CsFlag == 1:
+                pass
+
+            # If threshold was not exceeded
+            else:
+                # Store new sample in place of the oldest one
+                OldEpoch = GF_Epoch_Prev[Slot, Head]
+                OldGF = GF_L_Prev[Slot, Head]
+                GF_L_Prev[Slot, Head] = GF_Lcy
+                GF_Epoch_Prev[Slot, Head] = Sod
+                CycleSlipBuffHead[Slot] = (Head + 1) % NPoints
+
+                # Update the fit, replacing the oldest sample
+                updateCycleSlipFit(PrevPreproObsInfo, Slot, 
+                OldEpoch, OldGF, Sod, GF_Lcy)
+
+            # End of if (np.sum(CycleSlipFlags[Slot]) == NEpochs)
+
+        # Buffer is not full, need to add new GF observable
+        else:
+            GF_L_Prev[Slot, N] = GF_Lcy
+            GF_Epoch_Prev[Slot, N] = Sod
+            CycleSlipBuffIdx[Slot] += 1
+
+            # Build the fit once the buffer is full
+            if CycleSlipBuffIdx[Slot] == NPoints:
+                buildCycleSlipFit(PrevPreproObsInfo, Slot)
+
+        # End of if N == NPoints:
+
+    # end of for SatPhaseObs in PhaseObs:
+
+# End of function detectCycleSlips()
+
 
 def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
     
@@ -62,10 +397,12 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
     # Conf: dict
     #         Configuration dictionary
     # ObsInfo: list
-    #         OBS info for current epoch
+    #         OBS info for current epoch, as yielded by readObsEpochs
+    #         (Codes and Phases arrays aligned by satellite)
     # PrevPreproObsInfo: dict
-    #         Preprocessed observations for previous epoch per sat
-    #         PrevPreproObsInfo["G01"]["C1"]
+    #         Preprocessing state of the previous epoch, one array per
+    #         field indexed by satellite slot (see initPreproState)
+    #         PrevPreproObsInfo["PrevC"][SatSlotIdx["G01"], 0]
 
     # Returns
     # =======
@@ -79,126 +416,33 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
 
     # if check Cycle Slips activated
     if (Conf["CYCLE_SLIPS"][FLAG] == 1):
-
-        # Loop over Phase measurements
-        for iObs, SatPhaseObs in enumerate(PhaseObs):
-
-            # Get SOD
-            Sod = float(SatPhaseObs[ObsIdxP["SOD"]])
-
-            # Get satellite label
-            SatLabel = SatPhaseObs[ObsIdxP["PRN"]]
-
-            # Compute Geometry-Free in cycles
-            GF_Lcy = float(SatPhaseObs[ObsIdxP["L1"]]) - float(SatPhaseObs[ObsIdxP["L2"]])
-
-            # Check Data Gaps
-            DeltaT = Sod - PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"][-1]
-            if DeltaT > Conf["MAX_DATA_GAP"][TH]:
-                # Reinitialize CS detection
-                PrevPreproObsInfo[SatLabel]["GF_L_Prev"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS])
-                PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS])
-                PrevPreproObsInfo[SatLabel]["CycleSlipBuffIdx"] = 0
-                PrevPreproObsInfo[SatLabel]["CycleSlipFlags"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNEPOCHS])
-                PrevPreproObsInfo[SatLabel]["CycleSlipFlagIdx"] = 0
-
-            # Cycle slips detection
-            # fit a polynomial using previous GF measurements to compare the predicted value
-            # with the observed one
-            # --------------------------------------------------------------------------------------------------------------------
-            # Get N
-            N = PrevPreproObsInfo[SatLabel]["CycleSlipBuffIdx"]
-
-            # If the buffer is full, we can detect the cycle slip with a polynom
-            if N == (Conf["CYCLE_SLIPS"][CSNPOINTS]):
-                # Adjust polynom to the samples in the buffer
-                Polynom = np.polynomial.polynomial.polyfit(PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"],
-                PrevPreproObsInfo[SatLabel]["GF_L_Prev"],
-                int(Conf["CYCLE_SLIPS"][CSPDEGREE]))
-
-                # Predict value evaluating the polynom
-                TargetPred = np.polynomial.polynomial.polyval(Sod,
-                Polynom)
-
-                # Compute Residual
-                Residual = abs(GF_Lcy - TargetPred)
-
-                # Compute CS flag
-                CsFlag = Residual > Conf["CYCLE_SLIPS"][TH]
-
-                # Update CS flag buffer
-                PrevPreproObsInfo[SatLabel]["CycleSlipFlagIdx"] = \
-                    (PrevPreproObsInfo[SatLabel]["CycleSlipFlagIdx"] + 1) % \
-                        int(Conf["CYCLE_SLIPS"][CSNEPOCHS])
-                PrevPreproObsInfo[SatLabel]["CycleSlipFlags"][PrevPreproObsInfo[SatLabel]["CycleSlipFlagIdx"]] = \
-                    CsFlag
-
-                # Check if threshold was exceeded CSNEPOCHS times
-                if (np.sum(PrevPreproObsInfo[SatLabel]["CycleSlipFlags"]) == \
-                    int(Conf["CYCLE_SLIPS"][CSNEPOCHS])):
-                    # Cycle Slip detected
-                    PrevPreproObsInfo[SatLabel]["CycleSlipDetectFlag"] = 1
-
-                    # Reinitialize some variables
-                    PrevPreproObsInfo[SatLabel]["PrevC1"] = Const.NAN                                     # Previous Code
-                    PrevPreproObsInfo[SatLabel]["PrevC2"] = Const.NAN                                     # Previous Code
-                    PrevPreproObsInfo[SatLabel]["PrevL1"] = Const.NAN                                     # Previous Phase
-                    PrevPreproObsInfo[SatLabel]["PrevL2"] = Const.NAN                                     # Previous Phase
-                    PrevPreproObsInfo[SatLabel]["PrevRangeRateL1"] = Const.NAN                            # Previous Code Rate
-                    PrevPreproObsInfo[SatLabel]["PrevRangeRateL2"] = Const.NAN                            # Previous Code Rate
-                    PrevPreproObsInfo[SatLabel]["PrevPhaseRateL1"] = Const.NAN                            # Previous Phase Rate
-                    PrevPreproObsInfo[SatLabel]["PrevPhaseRateL2"] = Const.NAN                            # Previous Phase Rate
-
-                    # Reinitialize CS detection
-                    PrevPreproObsInfo[SatLabel]["GF_L_Prev"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS])
-                    PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS])
-                    PrevPreproObsInfo[SatLabel]["CycleSlipBuffIdx"] = 0
-                    PrevPreproObsInfo[SatLabel]["CycleSlipFlags"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNEPOCHS])
-                    PrevPreproObsInfo[SatLabel]["CycleSlipFlagIdx"] = 0
-
-                    # Raise flag to reset Hatch filter
-                    PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 1
-
-                # If threshold was exceeded less than CSNEPOCHS times,
-                # don't update the buffer and set the measurement to invalid
-                elif CsFlag == 1:
-                    # PrevPreproObsInfo[SatLabel]["CycleSlipDetectFlag"] = -1
-                    pass
-
-                # If threshold was not exceeded
-                else:
-                    # Leave space for the new sample
-                    PrevPreproObsInfo[SatLabel]["GF_L_Prev"][:-1] = PrevPreproObsInfo[SatLabel]["GF_L_Prev"][1:]
-                    PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"][:-1] = PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"][1:]
-
-                    # Store new sample
-                    PrevPreproObsInfo[SatLabel]["GF_L_Prev"][-1] = GF_Lcy
-                    PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"][-1] = Sod
-
-                # End of if (np.sum(PrevPreproObsInfo[SatLabel]["CycleSlipFlags"])
-
-            # Buffer is not full, need to add new GF observable
-            else:
-                PrevPreproObsInfo[SatLabel]["GF_L_Prev"][N] = GF_Lcy
-                PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"][N] = Sod
-                PrevPreproObsInfo[SatLabel]["CycleSlipBuffIdx"] += 1
-
-                # PrevPreproObsInfo[SatLabel]["CycleSlipDetectFlag"] = -1
-
-            # End of if N == (Conf["CYCLE_SLIPS"][CSNPOINTS])::
-
-        # end of for iObs, SatPhaseObs in enumerate(PhaseObs):
+        # Detect cycle slips on all the satellites
+        detectCycleSlips(Conf, PhaseObs, PrevPreproObsInfo)
 
     # End of if (Conf["CYCLE_SLIPS"][FLAG] == 1)
 
+    # Get state fields
+    PrevEpoch = PrevPreproObsInfo["PrevEpoch"]
+    ResetHatchFilter = PrevPreproObsInfo["ResetHatchFilter"]
+    Ksmooth = PrevPreproObsInfo["Ksmooth"]
+    PrevSmooth = PrevPreproObsInfo["PrevSmooth"]
+    IF_P_Prev = PrevPreproObsInfo["IF_P_Prev"]
+    PrevL = PrevPreproObsInfo["PrevL"]
+    PrevPhaseRate = PrevPreproObsInfo["PrevPhaseRate"]
+    PrevC = PrevPreproObsInfo["PrevC"]
+    PrevRangeRate = PrevPreproObsInfo["PrevRangeRate"]
+    CycleSlipDetectFlag = PrevPreproObsInfo["CycleSlipDetectFlag"]
+    PrealignOffset = PrevPreproObsInfo["PrealignOffset"]
+
     # Initialize output
     PreproObsInfo = OrderedDict({})
 
     # Loop over Code measurements
     for iObs, SatCodesObs in enumerate(CodesObs):
 
-        # Get satellite label
-        SatLabel = SatCodesObs[ObsIdxC["PRN"]]
+        # Get satellite slot and label
+        Slot = int(SatCodesObs[ObsIdxC["PRN"]])
+        SatLabel = SatSlotLabels[Slot]
 
         # Get constellation
         Constel = SatLabel[0]
@@ -227,17 +471,11 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
             # Gamma Galileo
             GammaF1F2 = Const.GAL_GAMMA_E1E5A
 
-        # Get Phases
+        # Get Phases (aligned with the Codes by readObsEpochs)
         SatPhaseObs = PhaseObs[iObs]
 
-        while SatPhaseObs[ObsIdxP["PRN"]] != SatLabel:
-            PhaseObs.pop(iObs)
-            SatPhaseObs = PhaseObs[iObs]
-
-        assert(SatLabel == SatPhaseObs[ObsIdxP["PRN"]])
-
         # Initialize output info
-        SatPreproObsInfo = {
+        PreproObs = {
             "Sod": 0.0,                   # Second of day
             
             "Elevation": 0.0,             # Elevation
@@ -271,62 +509,32 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
             "PhaseRateL2": Const.NAN,     # L2 Phase Rate
             "PhaseRateStepL2": Const.NAN, # L2 Phase Rate Step
 
-        } # End of SatPreproObsInfo
+        } # End of PreproObs
 
         # Prepare outputs
         # Get SoD
-        SatPreproObsInfo["Sod"] = float(SatCodesObs[ObsIdxC["SOD"]])
+        PreproObs["Sod"] = SatCodesObs[ObsIdxC["SOD"]]
         # Get Elevation
-        SatPreproObsInfo["Elevation"] = float(SatCodesObs[ObsIdxC["ELEV"]])
+        PreproObs["Elevation"] = SatCodesObs[ObsIdxC["ELEV"]]
         # Get Azimuth
-        SatPreproObsInfo["Azimuth"] = float(SatCodesObs[ObsIdxC["AZIM"]])
+        PreproObs["Azimuth"] = SatCodesObs[ObsIdxC["AZIM"]]
         # Get C1
-        SatPreproObsInfo["C1"] = float(SatCodesObs[ObsIdxC["C1"]])
+        PreproObs["C1"] = SatCodesObs[ObsIdxC["C1"]]
         # Get C1
-        SatPreproObsInfo["C2"] = float(SatCodesObs[ObsIdxC["C2"]])
+        PreproObs["C2"] = SatCodesObs[ObsIdxC["C2"]]
         # Get L1 in cycles and in m
-        SatPreproObsInfo["L1"] = float(SatPhaseObs[ObsIdxP["L1"]])
-        SatPreproObsInfo["L1Meters"] = float(SatPhaseObs[ObsIdxP["L1"]]) * Wave["F1"]
+        PreproObs["L1"] = SatPhaseObs[ObsIdxP["L1"]]
+        PreproObs["L1Meters"] = SatPhaseObs[ObsIdxP["L1"]] * Wave["F1"]
         # Get S1
-        SatPreproObsInfo["S1"] = float(SatCodesObs[ObsIdxC["S1"]])
+        PreproObs["S1"] = SatCodesObs[ObsIdxC["S1"]]
         # Get L2 in cycles and in m
-        SatPreproObsInfo["L2"] = float(SatPhaseObs[ObsIdxP["L2"]])
-        SatPreproObsInfo["L2Meters"] = float(SatPhaseObs[ObsIdxP["L2"]]) * Wave["F2"]
+        PreproObs["L2"] = SatPhaseObs[ObsIdxP["L2"]]
+        PreproObs["L2Meters"] = SatPhaseObs[ObsIdxP["L2"]] * Wave["F2"]
         # Get S2
-        SatPreproObsInfo["S2"] = float(SatCodesObs[ObsIdxC["S2"]])
-        
-        # Prepare output for the satellite
-        PreproObsInfo[SatLabel] = SatPreproObsInfo
-
-    # Loop over satellites
-    for SatLabel, PreproObs in PreproObsInfo.items():
-
-        # Get constellation
-        Constel = SatLabel[0]
-        
-        Wave = {}
-        # Get wavelengths
-        if Constel == 'G':
-
-            # L1 wavelength
-            Wave["F1"] = Const.GPS_L1_WAVE
-
-            # L2 wavelength
-            Wave["F2"] = Const.GPS_L2_WAVE
-
-            # Gamma GPS
-            GammaF1F2 = Const.GPS_GAMMA_L1L2
-
-        elif Constel == 'E':
-
-            # E1 wavelength
-            Wave["F1"] = Const.GAL_E1_WAVE
+        PreproObs["S2"] = SatCodesObs[ObsIdxC["S2"]]
 
-            # E5a wavelength
-            Wave["F2"] = Const.GAL_E5A_WAVE
-
-            # Gamma
-            GammaF1F2 = Const.GAL_GAMMA_E1E5A
+        # Prepare output for the satellite
+        PreproObsInfo[SatLabel] = PreproObs
 
         # Get epoch
         Epoch = PreproObs["Sod"]
@@ -334,7 +542,7 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
         # Check data gaps
         # ----------------------------------------------------------
         # Compute gap between previous and current observation
-        DeltaT = Epoch - PrevPreproObsInfo[SatLabel]["PrevEpoch"]
+        DeltaT = Epoch - PrevEpoch[Slot]
 
         # If there is a gap
         if DeltaT > Conf["MAX_DATA_GAP"][TH]:
@@ -346,24 +554,16 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
                     PreproObs["RejectionCause"] = REJECTION_CAUSE["DATA_GAP"]
 
             # Reinitialize some variables
-            PrevPreproObsInfo[SatLabel]["PrevC1"] = Const.NAN                                     # Previous Code
-            PrevPreproObsInfo[SatLabel]["PrevC2"] = Const.NAN                                     # Previous Code
-            PrevPreproObsInfo[SatLabel]["PrevL1"] = Const.NAN                                     # Previous Phase
-            PrevPreproObsInfo[SatLabel]["PrevL2"] = Const.NAN                                     # Previous Phase
-            PrevPreproObsInfo[SatLabel]["PrevRangeRateL1"] = Const.NAN                            # Previous Code Rate
-            PrevPreproObsInfo[SatLabel]["PrevRangeRateL2"] = Const.NAN                            # Previous Code Rate
-            PrevPreproObsInfo[SatLabel]["PrevPhaseRateL1"] = Const.NAN                            # Previous Phase Rate
-            PrevPreproObsInfo[SatLabel]["PrevPhaseRateL2"] = Const.NAN                            # Previous Phase Rate
+            PrevC[Slot] = Const.NAN                                   # Previous Codes
+            PrevL[Slot] = Const.NAN                                   # Previous Phases
+            PrevRangeRate[Slot] = Const.NAN                           # Previous Code Rates
+            PrevPhaseRate[Slot] = Const.NAN                           # Previous Phase Rates
 
             # Reinitialize CS detection
-            PrevPreproObsInfo[SatLabel]["GF_L_Prev"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS])
-            PrevPreproObsInfo[SatLabel]["GF_Epoch_Prev"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS])
-            PrevPreproObsInfo[SatLabel]["CycleSlipBuffIdx"] = 0
-            PrevPreproObsInfo[SatLabel]["CycleSlipFlags"] = [0.0] * int(Conf["CYCLE_SLIPS"][CSNEPOCHS])
-            PrevPreproObsInfo[SatLabel]["CycleSlipFlagIdx"] = 0
+            resetCycleSlipState(PrevPreproObsInfo, Slot)
 
             # Raise flag to reset Hatch filter
-            PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 1
+            ResetHatchFilter[Slot] = 1
 
         # End of if DeltaT > Conf["MAX_DATA_GAP"][TH]:
 
@@ -377,7 +577,6 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
         # If satellite shall be rejected due to C/N0 (only if activated in conf)
         # --------------------------------------------------------------------------------------------------------------------
         if (Conf["MIN_SNR"][FLAG] == 1):
-            # 42000 E05 <20
             if(PreproObs["S1"] < float(Conf["MIN_SNR"][VALUE])):
                 # Indicate the rejection cause
                 PreproObs["RejectionCause"] = REJECTION_CAUSE["MIN_SNR_F1"]
@@ -403,13 +602,12 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
 
         # End of if (Conf["MAX_PSR_OUTRNG"][FLAG] == 1)
 
-        # 54 E27 Cycle Slip
         # Account for Cycle Slips flags
-        if PrevPreproObsInfo[SatLabel]["CycleSlipDetectFlag"] == 1:
+        if CycleSlipDetectFlag[Slot] == 1:
             # Indicate the rejection cause
             PreproObs["RejectionCause"] = REJECTION_CAUSE["CYCLE_SLIP"]
             PreproObs["Valid"] = 0
-            PrevPreproObsInfo[SatLabel]["CycleSlipDetectFlag"] = 0
+            CycleSlipDetectFlag[Slot] = 0
 
         # Build combinations
         # ----------------------------------------------------------
@@ -422,49 +620,40 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
         # Hatch filter (re)initialization
         # ----------------------------------------------------------
         # If Hatch filter shall be reset
-        if PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] == 1:
+        if ResetHatchFilter[Slot] == 1:
             # Lower Smoothing filter reset flag
-            PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 0
+            ResetHatchFilter[Slot] = 0
 
             # Ksmooth: Time index -> is equal to 1 at the beginning and is increasing by one
             # each epoch
-            PrevPreproObsInfo[SatLabel]["Ksmooth"] = 1
+            Ksmooth[Slot] = 1
 
             # Initialize smoothed values
             PreproObs["SmoothIF"] = PreproObs["IF_C"]
-            PrevPreproObsInfo[SatLabel]["PrevSmooth"] = \
-                PreproObs["SmoothIF"]
+            PrevSmooth[Slot] = PreproObs["SmoothIF"]
             
             # Reset Prealign Offset
-            PrevPreproObsInfo[SatLabel]["PrealignOffset"] = \
-                                        PreproObs["IF_C"] - PreproObs["IF_P"]
+            PrealignOffset[Slot] = PreproObs["IF_C"] - PreproObs["IF_P"]
 
             # Reinitialize some variables
-            PrevPreproObsInfo[SatLabel]["PrevC1"] = Const.NAN                               # Previous Code
-            PrevPreproObsInfo[SatLabel]["PrevL1"] = Const.NAN                               # Previous Phase
-            PrevPreproObsInfo[SatLabel]["PrevRangeRateL1"] = Const.NAN                      # Previous Code Rate
-            PrevPreproObsInfo[SatLabel]["PrevPhaseRateL1"] = Const.NAN                      # Previous Phase Rate
-            PrevPreproObsInfo[SatLabel]["PrevC2"] = Const.NAN                               # Previous Code
-            PrevPreproObsInfo[SatLabel]["PrevL2"] = Const.NAN                               # Previous Phase
-            PrevPreproObsInfo[SatLabel]["PrevRangeRateL2"] = Const.NAN                      # Previous Code Rate
-            PrevPreproObsInfo[SatLabel]["PrevPhaseRateL2"] = Const.NAN                      # Previous Phase Rate
+            PrevC[Slot] = Const.NAN                                   # Previous Codes
+            PrevL[Slot] = Const.NAN                                   # Previous Phases
+            PrevRangeRate[Slot] = Const.NAN                           # Previous Code Rates
+            PrevPhaseRate[Slot] = Const.NAN                           # Previous Phase Rates
 
         else:
             # Code Carrier Smoothing with a Hatch Filter
             # ----------------------------------------------------------
             # Update Smoothing iterator
-            PrevPreproObsInfo[SatLabel]["Ksmooth"] = \
-                    PrevPreproObsInfo[SatLabel]["Ksmooth"] + DeltaT
+            Ksmooth[Slot] = Ksmooth[Slot] + DeltaT
 
             # Smoothing Time computation
             # Smoothing Time is equal to the time index if the time index 
             # is lower than the Hatch filter and equal to the Hatch filter 
             # time constant otherwise
             SmoothingTime = \
-            (PrevPreproObsInfo[SatLabel]["Ksmooth"] <= Conf["HATCH_TIME"]) * \
-                            PrevPreproObsInfo[SatLabel]["Ksmooth"] + \
-            (PrevPreproObsInfo[SatLabel]["Ksmooth"] > Conf["HATCH_TIME"]) * \
-                            Conf["HATCH_TIME"]
+            (Ksmooth[Slot] <= Conf["HATCH_TIME"]) * Ksmooth[Slot] + \
+            (Ksmooth[Slot] > Conf["HATCH_TIME"]) * Conf["HATCH_TIME"]
 
             # Weighting factor of the Smoothing filter
             Alpha = float(DeltaT) / SmoothingTime
@@ -472,104 +661,100 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
             # Compute Smoothed C1
             PreproObs["SmoothIF"] = \
                 Alpha * PreproObs["IF_C"] + \
-                (1-Alpha) * \
-                    (PrevPreproObsInfo[SatLabel]["PrevSmooth"] + \
-                        PreproObs["IF_P"] - PrevPreproObsInfo[SatLabel]["IF_P_Prev"])
+                (1-Alpha) * (PrevSmooth[Slot] + PreproObs["IF_P"] - IF_P_Prev[Slot])
 
-        # End of if PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] == 1:
+        # End of if ResetHatchFilter[Slot] == 1:
 
         # Loop over frequencies
-        for freq in ['1', '2']:
+        for iFreq, (LKey, CKey, WaveKey, PhaseRateKey, PhaseRateStepKey, RangeRateKey, RangeRateStepKey, 
+            PhaseRateCause, PhaseRateStepCause, RangeRateCause, RangeRateStepCause) in enumerate(FreqInfo):
             # If previous information is available
-            if(PrevPreproObsInfo[SatLabel]["PrevL" + freq] != Const.NAN):
+            if(PrevL[Slot, iFreq] != Const.NAN):
                 # Check Phase Rate (only if activated in conf)
                 # --------------------------------------------------------------------------------------------------------------------
                 # Compute Phase Rate in meters/second
-                PreproObs["PhaseRateL" + freq] = ((PreproObs["L" + freq] - PrevPreproObsInfo[SatLabel]["PrevL" + freq]) / DeltaT) * Wave["F" + freq]
+                PreproObs[PhaseRateKey] = ((PreproObs[LKey] - PrevL[Slot, iFreq]) / DeltaT) * Wave[WaveKey]
 
-                # 55560 E07 -1e6 cy in f2
                 # Check Phase Rate
                 if (Conf["MAX_PHASE_RATE"][FLAG] == 1) \
-                        and (abs(PreproObs["PhaseRateL" + freq]) > Conf["MAX_PHASE_RATE"][VALUE]):
+                        and (abs(PreproObs[PhaseRateKey]) > Conf["MAX_PHASE_RATE"][VALUE]):
                             # Indicate the rejection cause
-                            PreproObs["RejectionCause"] = REJECTION_CAUSE["MAX_PHASE_RATE_F" + freq]
+                            PreproObs["RejectionCause"] = PhaseRateCause
                             PreproObs["Valid"] = 0
 
                             # Raise flag to reset Hatch filter
-                            PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 1
+                            ResetHatchFilter[Slot] = 1
 
                 # If there are enough samples
-                if (PrevPreproObsInfo[SatLabel]["PrevPhaseRateL" + freq] != Const.NAN):
+                if (PrevPhaseRate[Slot, iFreq] != Const.NAN):
                     # Check Phase Rate Step (only if activated in conf)
                     # ----------------------------------------------------------
                     # Compute Phase Rate Step in meters/second^2
-                    PreproObs["PhaseRateStepL" + freq] = (PreproObs["PhaseRateL" + freq] - PrevPreproObsInfo[SatLabel]["PrevPhaseRateL" + freq]) / DeltaT
+                    PreproObs[PhaseRateStepKey] = (PreproObs[PhaseRateKey] - PrevPhaseRate[Slot, iFreq]) / DeltaT
 
                     if (Conf["MAX_PHASE_RATE_STEP"][FLAG] == 1) \
-                        and (abs(PreproObs["PhaseRateStepL" + freq]) > Conf["MAX_PHASE_RATE_STEP"][VALUE]):
+                        and (abs(PreproObs[PhaseRateStepKey]) > Conf["MAX_PHASE_RATE_STEP"][VALUE]):
                             # Indicate the rejection cause
-                            PreproObs["RejectionCause"] = REJECTION_CAUSE["MAX_PHASE_RATE_STEP_F" + freq]
+                            PreproObs["RejectionCause"] = PhaseRateStepCause
                             PreproObs["Valid"] = 0
 
                             # Raise flag to reset Hatch filter
-                            PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 1
+                            ResetHatchFilter[Slot] = 1
 
                 else: PreproObs["Valid"] = 0
 
-                # End of if (PrevPreproObsInfo[SatLabel]["PrevPhaseRateL" + freq] != Const.NAN):
+                # End of if (PrevPhaseRate[Slot, iFreq] != Const.NAN):
 
             else: PreproObs["Valid"] = 0
 
-            # End of if(PrevPreproObsInfo[SatLabel]["PrevL" + freq] != Const.NAN):
+            # End of if(PrevL[Slot, iFreq] != Const.NAN):
 
             # If previous information is available
-            if(PrevPreproObsInfo[SatLabel]["PrevC" + freq] != Const.NAN):
+            if(PrevC[Slot, iFreq] != Const.NAN):
                 # Check Code Step (only if activated in conf)
                 # --------------------------------------------------------------------------------------------------------------------
                 # Compute Code Rate in meters/second
-                PreproObs["RangeRateL" + freq] = (PreproObs["C" + freq] - PrevPreproObsInfo[SatLabel]["PrevC" + freq]) / DeltaT
+                PreproObs[RangeRateKey] = (PreproObs[CKey] - PrevC[Slot, iFreq]) / DeltaT
 
                 # Check Code Rate
                 if (Conf["MAX_CODE_RATE"][FLAG] == 1) \
-                        and (abs(PreproObs["RangeRateL" + freq]) > Conf["MAX_CODE_RATE"][VALUE]):
+                        and (abs(PreproObs[RangeRateKey]) > Conf["MAX_CODE_RATE"][VALUE]):
                             # Indicate the rejection cause
-                            PreproObs["RejectionCause"] = REJECTION_CAUSE["MAX_CODE_RATE_F" + freq]
+                            PreproObs["RejectionCause"] = RangeRateCause
                             PreproObs["Valid"] = 0
 
                             # Raise flag to reset Hatch filter
-                            PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 1
+                            ResetHatchFilter[Slot] = 1
 
                 # If there are enough samples
-                if (PrevPreproObsInfo[SatLabel]["PrevRangeRateL" + freq] != Const.NAN):
+                if (PrevRangeRate[Slot, iFreq] != Const.NAN):
                     # Compute Code Rate Step in meters/second^2
-                    PreproObs["RangeRateStepL" + freq] = (PreproObs["RangeRateL" + freq] - \
-                        PrevPreproObsInfo[SatLabel]["PrevRangeRateL" + freq]) / DeltaT
+                    PreproObs[RangeRateStepKey] = (PreproObs[RangeRateKey] - PrevRangeRate[Slot, iFreq]) / DeltaT
                     # Check Code Rate Step (only if activated in conf)
                     # ----------------------------------------------------------
                     if (Conf["MAX_CODE_RATE_STEP"][FLAG] == 1) \
-                            and (abs(PreproObs["RangeRateStepL" + freq]) > Conf["MAX_CODE_RATE_STEP"][VALUE]):
+                            and (abs(PreproObs[RangeRateStepKey]) > Conf["MAX_CODE_RATE_STEP"][VALUE]):
                                 # Indicate the rejection cause
-                                PreproObs["RejectionCause"] = REJECTION_CAUSE["MAX_CODE_RATE_STEP_F" + freq]
+                                PreproObs["RejectionCause"] = RangeRateStepCause
                                 PreproObs["Valid"] = 0
 
                                 # Raise flag to reset Hatch filter
-                                PrevPreproObsInfo[SatLabel]["ResetHatchFilter"] = 1
+                                ResetHatchFilter[Slot] = 1
 
                 else: PreproObs["Valid"] = 0
 
-                # End of if (PrevPreproObsInfo[SatLabel]["PrevRangeRateL" + freq] != Const.NAN):
+                # End of if (PrevRangeRate[Slot, iFreq] != Const.NAN):
 
             else: PreproObs["Valid"] = 0
 
-            # End of if(PrevPreproObsInfo[SatLabel]["PrevC" + freq] != Const.NAN)
+            # End of if(PrevC[Slot, iFreq] != Const.NAN)
 
-        # End of for freq in ['1', '2']:
+        # End of for iFreq, ... in enumerate(FreqInfo):
 
         # Set Status flag
         # ----------------------------------------------------------
         # 1 if convergence was reached, 0 otherwise
-        if(PrevPreproObsInfo[SatLabel]["Ksmooth"] > \
-            Conf["HATCH_STATE_F"] * Conf["HATCH_TIME"]) and \
+        if(Ksmooth[Slot] > Conf["HATCH_STATE_F"] * Conf["HATCH_TIME"]) and \
               (PreproObs["Valid"] != 0) :
             PreproObs["Status"] = 1
         else: 
@@ -577,28 +762,331 @@ def runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo):
 
         # Update previous values
         # ----------------------------------------------------------
-        PrevPreproObsInfo[SatLabel]["PrevC1"] = PreproObs["C1"]
-        PrevPreproObsInfo[SatLabel]["PrevL1"] = PreproObs["L1"]
-        PrevPreproObsInfo[SatLabel]["PrevC2"] = PreproObs["C2"]
-        PrevPreproObsInfo[SatLabel]["PrevL2"] = PreproObs["L2"]
-        PrevPreproObsInfo[SatLabel]["PrevSmooth"] = PreproObs["SmoothIF"]
-        PrevPreproObsInfo[SatLabel]["IF_P_Prev"] = PreproObs["IF_P"]
-        PrevPreproObsInfo[SatLabel]["PrevRangeRateL1"] = PreproObs["RangeRateL1"]
-        PrevPreproObsInfo[SatLabel]["PrevRangeRateL2"] = PreproObs["RangeRateL2"]
-        PrevPreproObsInfo[SatLabel]["PrevPhaseRateL1"] = PreproObs["PhaseRateL1"]
-        PrevPreproObsInfo[SatLabel]["PrevPhaseRateL2"] = PreproObs["PhaseRateL2"]
-        PrevPreproObsInfo[SatLabel]["PrevRej"] = PreproObs["RejectionCause"]
-        PrevPreproObsInfo[SatLabel]["PrevEpoch"] = Epoch
+        PrevC[Slot, 0] = PreproObs["C1"]
+        PrevL[Slot, 0] = PreproObs["L1"]
+        PrevC[Slot, 1] = PreproObs["C2"]
+        PrevL[Slot, 1] = PreproObs["L2"]
+        PrevSmooth[Slot] = PreproObs["SmoothIF"]
+        IF_P_Prev[Slot] = PreproObs["IF_P"]
+        PrevRangeRate[Slot, 0] = PreproObs["RangeRateL1"]
+        PrevRangeRate[Slot, 1] = PreproObs["RangeRateL2"]
+        PrevPhaseRate[Slot, 0] = PreproObs["PhaseRateL1"]
+        PrevPhaseRate[Slot, 1] = PreproObs["PhaseRateL2"]
+        PrevPreproObsInfo["PrevRej"][Slot] = PreproObs["RejectionCause"]
+        PrevEpoch[Slot] = Epoch
 
         # Pre-align the Phase
-        PreproObs["IF_P"] +=  PrevPreproObsInfo[SatLabel]["PrealignOffset"]
+        PreproObs["IF_P"] +=  PrealignOffset[Slot]
 
-    # End of for SatLabel, PreproObs in PreproObsInfo.items():
+    # End of for iObs, SatCodesObs in enumerate(CodesObs):
 
     return PreproObsInfo
 
 # End of function runPreprocessing()
 
+
+def rejectMeas(RejectionCause, Valid, Rejected, Cause):
+
+    # Purpose: reject the measurements flagged in Rejected and indicate the
+    #          rejection cause (the last cause set prevails, as in the
+    #          satellite by satellite loop)
+
+    RejectionCause[Rejected] = Cause
+    Valid[Rejected] = 0
+
+# End of function rejectMeas()
+
+
+def buildPreproObsInfo(Slots, Fields):
+
+    # Purpose: build the per-satellite output of the preprocessing from
+    #          the arrays of the fields
+
+    # Parameters
+    # ==========
+    # Slots: np.array
+    #         Satellite slot of each row
+    # Fields: OrderedDict
+    #         Arrays of the output fields, one row per satellite
+
+    # Returns
+    # =======
+    # PreproObsInfo: dict
+    #         Preprocessed observations per sat
+    #         PreproObsInfo["G01"]["C1"]
+
+    PreproObsInfo = OrderedDict({})
+    Keys = list(Fields.keys())
+    for Slot, Values in zip(Slots, zip(*[Field.tolist() for Field in Fields.values()])):
+        PreproObsInfo[SatSlotLabels[Slot]] = dict(zip(Keys, Values))
+
+    return PreproObsInfo
+
+# End of function buildPreproObsInfo()
+
+
+def preprocessEpochs(Conf, ObsEpochs, PrevPreproObsInfo):
+
+    # Purpose: preprocess the OBS epochs one by one (PREPRO_MODE 0)
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # ObsEpochs: iterable
+    #         OBS info of each epoch, as yielded by readObsEpochs
+    # PrevPreproObsInfo: dict
+    #         Preprocessing state (see initPreproState)
+
+    # Returns
+    # =======
+    # Generator of PreproObsInfo: dict
+    #         Preprocessed observations of each epoch per sat
+
+    for ObsInfo in ObsEpochs:
+        yield runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo)
+
+# End of function preprocessEpochs()
+
+
+def runPreprocessingBatch(Conf, ObsInfo):
+
+    # Purpose: preprocess a whole day of OBS measurements at once, giving
+    #          the same results as the epoch by epoch processing.
+    #          The measurements are sorted by satellite, and the data gaps,
+    #          the rates and rate steps checks, the combinations and the 
+    #          Hatch filter weights are computed over the satellite series
+    #          as arrays. Only the truly recursive pieces run sequentially:
+    #          the cycle slips detection, the resets raised by the
+    #          rate checks (visiting only the epochs failing a check) and
+    #          the smoothing recursion
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # ObsInfo: list
+    #         OBS info of the whole day, as returned by readObsDay
+
+    # Returns
+    # =======
+    # Generator of PreproObsInfo: dict
+    #         Preprocessed observations of each epoch per sat
+    #         PreproObsInfo["G01"]["C1"]
+
+    # Get Observations
+    CodesObs = ObsInfo[0]
+    PhaseObs = ObsInfo[1]
+    NObs = len(CodesObs)
+
+    # Sort the measurements by satellite, keeping the epochs order
+    Slots = CodesObs[:, ObsIdxC["PRN"]].astype(int)
+    Order = np.argsort(Slots, kind='stable')
+    SatSlots = Slots[Order]
+    SatCodesObs = CodesObs[Order]
+    SatPhaseObs = PhaseObs[Order]
+
+    # First measurement of each satellite and row of the previous one
+    First = np.r_[True, SatSlots[1:] != SatSlots[:-1]]
+    PrevRow = np.r_[0, np.arange(NObs - 1)][:NObs]
+
+    # Get wavelengths and Gamma
+    Wave = SlotWave[SatSlots]
+    GammaF1F2 = SlotGamma[SatSlots]
+
+    # Get measurements (one column per frequency)
+    Epoch = SatCodesObs[:, ObsIdxC["SOD"]]
+    Elevation = SatCodesObs[:, ObsIdxC["ELEV"]]
+    Codes = SatCodesObs[:, [ObsIdxC["C1"], ObsIdxC["C2"]]]
+    Snr = SatCodesObs[:, [ObsIdxC["S1"], ObsIdxC["S2"]]]
+    Phases = SatPhaseObs[:, [ObsIdxP["L1"], ObsIdxP["L2"]]]
+    PhasesMeters = Phases * Wave
+
+    # Initialize outputs
+    Valid = np.ones(NObs, dtype=int)
+    RejectionCause = np.zeros(NObs, dtype=int)
+
+    # Check data gaps
+    # ----------------------------------------------------------
+    # Compute gap between previous and current observation
+    PrevEpoch = Epoch[PrevRow]
+    PrevEpoch[First] = 86400.0
+    DeltaT = Epoch - PrevEpoch
+
+    # If there is a gap
+    Gap = DeltaT > Conf["MAX_DATA_GAP"][TH]
+    if Conf["MAX_DATA_GAP"][FLAG] == 1:
+        # Indicate the rejection cause (if it is not a non-visibility period)
+        RejectionCause[Gap & (DeltaT < 1000)] = REJECTION_CAUSE["DATA_GAP"]
+
+    # Detect cycle slips
+    # ----------------------------------------------------------
+    CycleSlip = np.zeros(NObs, dtype=bool)
+    if (Conf["CYCLE_SLIPS"][FLAG] == 1):
+        CsState = initPreproState(Conf)
+        CycleSlipDetectFlag = CsState["CycleSlipDetectFlag"]
+        for iObs, Slot in enumerate(SatSlots):
+            detectCycleSlips(Conf, SatPhaseObs[iObs:iObs + 1], CsState)
+            CycleSlip[iObs] = (CycleSlipDetectFlag[Slot] == 1)
+            CycleSlipDetectFlag[Slot] = 0
+
+            # Data gaps reinitialize CS detection
+            if Gap[iObs]:
+                resetCycleSlipState(CsState, Slot)
+
+    # End of if (Conf["CYCLE_SLIPS"][FLAG] == 1)
+
+    # Mask angle, C/N0 and Pseudorange Out-of-range checks
+    # ----------------------------------------------------------
+    rejectMeas(RejectionCause, Valid, 
+    Elevation < Conf["RCVR_MASK"], REJECTION_CAUSE["MASKANGLE"])
+
+    if (Conf["MIN_SNR"][FLAG] == 1):
+        MinSnr = float(Conf["MIN_SNR"][VALUE])
+        rejectMeas(RejectionCause, Valid, 
+        Snr[:, 0] < MinSnr, REJECTION_CAUSE["MIN_SNR_F1"])
+        rejectMeas(RejectionCause, Valid, 
+        Snr[:, 1] < MinSnr, REJECTION_CAUSE["MIN_SNR_F2"])
+
+    if (Conf["MAX_PSR_OUTRNG"][FLAG] == 1):
+        MaxPsr = float(Conf["MAX_PSR_OUTRNG"][VALUE])
+        rejectMeas(RejectionCause, Valid, 
+        Codes[:, 0] > MaxPsr, REJECTION_CAUSE["MAX_PSR_OUTRNG_F1"])
+        rejectMeas(RejectionCause, Valid, 
+        Codes[:, 1] > MaxPsr, REJECTION_CAUSE["MAX_PSR_OUTRNG_F2"])
+
+    rejectMeas(RejectionCause, Valid, 
+    CycleSlip, REJECTION_CAUSE["CYCLE_SLIP"])
+
+    # Rates and rate steps over the whole series
+    # ----------------------------------------------------------
+    with np.errstate(divide='ignore', invalid='ignore'):
+        PhaseRate = ((Phases - Phases[PrevRow]) / DeltaT[:, None]) * Wave
+        PhaseRateStep = (PhaseRate - PhaseRate[PrevRow]) / DeltaT[:, None]
+        RangeRate = (Codes - Codes[PrevRow]) / DeltaT[:, None]
+        RangeRateStep = (RangeRate - RangeRate[PrevRow]) / DeltaT[:, None]
+
+    # Failed checks, in the order they are applied
+    Checks = [(PhaseRate, "MAX_PHASE_RATE", 7, False),
+    (PhaseRateStep, "MAX_PHASE_RATE_STEP", 8, True),
+    (RangeRate, "MAX_CODE_RATE", 9, False),
+    (RangeRateStep, "MAX_CODE_RATE_STEP", 10, True)]
+    Failed = {}
+    for Values, Key, _, _ in Checks:
+        Failed[Key] = (Conf[Key][FLAG] == 1) & (np.abs(Values) > Conf[Key][VALUE])
+    RateFailed = (Failed["MAX_PHASE_RATE"] | Failed["MAX_CODE_RATE"]).any(axis=1)
+    StepFailed = (Failed["MAX_PHASE_RATE_STEP"] | Failed["MAX_CODE_RATE_STEP"]).any(axis=1)
+
+    # Hatch filter resets
+    # ----------------------------------------------------------
+    # The filter is reset on the first measurement, on data gaps and on
+    # cycle slips. A measurement rejected by the rate checks resets it 
+    # on the next epoch, which in turn disables the checks there
+    Reset = First | Gap | CycleSlip
+    for iObs in np.flatnonzero(RateFailed | StepFailed):
+        if not Reset[iObs] and (RateFailed[iObs] or \
+            (StepFailed[iObs] and not Reset[iObs - 1])):
+            if iObs + 1 < NObs and not First[iObs + 1]:
+                Reset[iObs + 1] = True
+
+    # Rates are available out of the resets, rate steps one epoch later
+    RateAvail = ~Reset
+    StepAvail = RateAvail & ~Reset[PrevRow]
+    Valid[~StepAvail] = 0
+
+    # Apply the rate checks rejection causes
+    for iFreq, FreqKeys in enumerate(FreqInfo):
+        for Values, Key, CauseIdx, IsStep in Checks:
+            Avail = StepAvail if IsStep else RateAvail
+            rejectMeas(RejectionCause, Valid, 
+            Avail & Failed[Key][:, iFreq], FreqKeys[CauseIdx])
+
+    PhaseRate[~RateAvail] = Const.NAN
+    RangeRate[~RateAvail] = Const.NAN
+    PhaseRateStep[~StepAvail] = Const.NAN
+    RangeRateStep[~StepAvail] = Const.NAN
+
+    # Build combinations
+    # ----------------------------------------------------------
+    GeomFree_P = (Phases[:, 1] - Phases[:, 0]) / (1 - GammaF1F2)
+    IF_C = (Codes[:, 1] - GammaF1F2 * Codes[:, 0]) / (1 - GammaF1F2)
+    IF_P = (PhasesMeters[:, 1] - GammaF1F2 * PhasesMeters[:, 0]) / (1 - GammaF1F2)
+
+    # Code Carrier Smoothing with a Hatch Filter
+    # ----------------------------------------------------------
+    # Smoothing iterator, starting from 1 at each reset
+    ArcStarts = np.flatnonzero(Reset)
+    Ksmooth = np.empty(NObs)
+    for Start, End in zip(ArcStarts, np.r_[ArcStarts[1:], NObs]):
+        Ksmooth[Start:End] = np.cumsum(np.r_[1.0, DeltaT[Start + 1:End]])
+
+    # Weighting factor of the Smoothing filter
+    SmoothingTime = np.where(Ksmooth <= Conf["HATCH_TIME"], 
+    Ksmooth, Conf["HATCH_TIME"])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        Alpha = DeltaT / SmoothingTime
+
+    # Smoothing recursion
+    WeightedIF_C = (Alpha * IF_C).tolist()
+    Beta = (1-Alpha).tolist()
+    IF_P_List = IF_P.tolist()
+    SmoothIF = IF_C.tolist()
+    for iObs in np.flatnonzero(~Reset).tolist():
+        SmoothIF[iObs] = WeightedIF_C[iObs] + \
+            Beta[iObs] * (SmoothIF[iObs - 1] + IF_P_List[iObs] - IF_P_List[iObs - 1])
+    SmoothIF = np.array(SmoothIF)
+
+    # Set Status flag
+    # ----------------------------------------------------------
+    Status = ((Ksmooth > Conf["HATCH_STATE_F"] * Conf["HATCH_TIME"]) & \
+        (Valid != 0)).astype(int)
+
+    # Pre-align the Phase with the offset of the start of the arc
+    ArcStart = np.maximum.accumulate(np.where(Reset, np.arange(NObs), 0))
+    IF_P = IF_P + (IF_C[ArcStart] - IF_P[ArcStart])
+
+    # Build the output per epoch
+    # ----------------------------------------------------------
+    Fields = OrderedDict({})
+    Fields["Sod"] = Epoch
+    Fields["Elevation"] = Elevation
+    Fields["Azimuth"] = SatCodesObs[:, ObsIdxC["AZIM"]]
+    Fields["C1"] = Codes[:, 0]
+    Fields["C2"] = Codes[:, 1]
+    Fields["L1"] = Phases[:, 0]
+    Fields["L1Meters"] = PhasesMeters[:, 0]
+    Fields["S1"] = Snr[:, 0]
+    Fields["L2"] = Phases[:, 1]
+    Fields["L2Meters"] = PhasesMeters[:, 1]
+    Fields["S2"] = Snr[:, 1]
+    Fields["GeomFree_P"] = GeomFree_P
+    Fields["IF_C"] = IF_C
+    Fields["IF_P"] = IF_P
+    Fields["SmoothIF"] = SmoothIF
+    Fields["Valid"] = Valid
+    Fields["RejectionCause"] = RejectionCause
+    Fields["Status"] = Status
+    for iFreq, FreqKeys in enumerate(FreqInfo):
+        Fields[FreqKeys[5]] = RangeRate[:, iFreq]
+        Fields[FreqKeys[6]] = RangeRateStep[:, iFreq]
+        Fields[FreqKeys[3]] = PhaseRate[:, iFreq]
+        Fields[FreqKeys[4]] = PhaseRateStep[:, iFreq]
+
+    # Back to the file order
+    Unsort = np.empty(NObs, dtype=int)
+    Unsort[Order] = np.arange(NObs)
+    for Key in Fields:
+        Fields[Key] = Fields[Key][Unsort]
+
+    # Yield the epochs
+    Bounds = np.flatnonzero(np.diff(CodesObs[:, ObsIdxC["SOD"]])) + 1
+    for Start, End in zip(np.r_[0, Bounds], np.r_[Bounds, NObs]):
+        if End > Start:
+            yield buildPreproObsInfo(Slots[Start:End], 
+            OrderedDict((Key, Values[Start:End]) for Key, Values in Fields.items()))
+
+# End of function runPreprocessingBatch()
+
 ########################################################################
 # END OF PREPROCESSING FUNCTIONS MODULE
 ########################################################################
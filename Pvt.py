@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+
+########################################################################
+# Pvt.py:
+# This is the PVT Module of SENTUS tool
+#
+#  Project:        SENTUS
+#  File:           Pvt.py
+#
+#   Author: GNSS Academy
+#   Copyright 2024 GNSS Academy
+#
+# -----------------------------------------------------------------
+# Date       | Author             | Action
+# -----------------------------------------------------------------
+#
+########################################################################
+
+
+# Import External and Internal functions and Libraries
+#----------------------------------------------------------------------
+import sys, os
+# Add path to find all modules
+Common = os.path.dirname(os.path.dirname(
+    os.path.abspath(sys.argv[0]))) + '/COMMON'
+sys.path.insert(0, Common)
+from collections import OrderedDict
+from COMMON import GnssConstants as Const
+from COMMON.Coordinates import xyz2llh
+import numpy as np
+
+# Constellations of each navigation solution
+NAV_SOLUTION_CONSTELS = OrderedDict({})
+NAV_SOLUTION_CONSTELS["GPS"] = "G"
+NAV_SOLUTION_CONSTELS["GAL"] = "E"
+NAV_SOLUTION_CONSTELS["GPSGAL"] = "GE"
+
+def buildPvtEpoch(Conf, CorrInfo):
+
+    # Purpose: extract from the corrected measurements of an epoch the
+    #          inputs of the navigation solution
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # CorrInfo: dict
+    #         Corrected measurements of the epoch per sat, after the
+    #         receiver clock estimation (see correctRcvrClk). The
+    #         satellites it rejected as outliers are not used, nor the
+    #         ones without a finite position or corrected code
+
+    # Returns
+    # =======
+    # PvtEpoch: dict
+    #         Inputs of the epoch, one row per satellite used:
+    #         SatPos (Satellite CoP), RcvrApo (Receiver APO), Code
+    #         (Corrected Code), Sigma (Sigma UERE) and Group (clock
+    #         estimated: 0 GPS or single clock, 1 Galileo), plus the
+    #         Sod and the LEO reference CoM position RefPos
+
+    Constels = NAV_SOLUTION_CONSTELS.get(Conf["NAV_SOLUTION"], "GE")
+    Isb = Conf["RCVR_CLK_ISB"] == 1
+
+    PvtEpoch = OrderedDict({})
+    PvtEpoch["Sod"] = 0
+    PvtEpoch["RefPos"] = np.zeros(3)
+    SatPos = []
+    RcvrApo = []
+    Code = []
+    Sigma = []
+    Group = []
+
+    for SatLabel, SatCorrInfo in CorrInfo.items():
+        PvtEpoch["Sod"] = SatCorrInfo["Sod"]
+
+        # Only the corrected satellites of the navigation solution
+        if "GEOM-RNGE" not in SatCorrInfo:
+            continue
+
+        # LEO reference CoM position
+        LeoApo = (SatCorrInfo["LeoApoX"], SatCorrInfo["LeoApoY"], SatCorrInfo["LeoApoZ"])
+        PvtEpoch["RefPos"] = np.array((SatCorrInfo["LeoX"], SatCorrInfo["LeoY"],
+        SatCorrInfo["LeoZ"])) - LeoApo
+
+        if SatLabel[0] not in Constels or SatCorrInfo["SigmaUere"] <= 0:
+            continue
+
+        # Nor the satellites rejected in the receiver clock estimation
+        if not SatCorrInfo.get("ClkUsed", True):
+            continue
+
+        # Nor the satellites without ephemeris (NaN position or code)
+        SatCop = (SatCorrInfo["SatX"] + SatCorrInfo["SatApoX"],
+        SatCorrInfo["SatY"] + SatCorrInfo["SatApoY"],
+        SatCorrInfo["SatZ"] + SatCorrInfo["SatApoZ"])
+        if not np.all(np.isfinite(SatCop + LeoApo + (SatCorrInfo["CorrCode"],))):
+            continue
+
+        SatPos.append(SatCop)
+        RcvrApo.append(LeoApo)
+        Code.append(SatCorrInfo["CorrCode"])
+        Sigma.append(SatCorrInfo["SigmaUere"])
+        Group.append(int(Isb and SatLabel[0] == 'E'))
+
+    # End of for SatLabel, SatCorrInfo in CorrInfo.items()
+
+    PvtEpoch["SatPos"] = np.array(SatPos, dtype=np.float64).reshape(-1, 3)
+    PvtEpoch["RcvrApo"] = np.array(RcvrApo, dtype=np.float64).reshape(-1, 3)
+    PvtEpoch["Code"] = np.array(Code, dtype=np.float64)
+    PvtEpoch["Sigma"] = np.array(Sigma, dtype=np.float64)
+    PvtEpoch["Group"] = np.array(Group, dtype=int)
+
+    return PvtEpoch
+
+# End of buildPvtEpoch()
+
+def stackPvtEpochs(PvtEpochs):
+
+    # Purpose: stack the inputs of several epochs in arrays padded to
+    #          the max. number of satellites
+
+    # Parameters
+    # ==========
+    # PvtEpochs: list
+    #         Inputs of each epoch, as returned by buildPvtEpoch
+
+    # Returns
+    # =======
+    # Stack: dict
+    #         Same fields as PvtEpoch with one more dimension (epoch),
+    #         plus Mask (True for the rows with a satellite)
+
+    NEpochs = len(PvtEpochs)
+    NSats = np.array([len(PvtEpoch["Code"]) for PvtEpoch in PvtEpochs], dtype=int)
+    MaxSats = max(NSats.max() if NEpochs > 0 else 0, 1)
+
+    Stack = OrderedDict({})
+    Stack["Sod"] = np.array([PvtEpoch["Sod"] for PvtEpoch in PvtEpochs], dtype=np.float64)
+    Stack["RefPos"] = np.array([PvtEpoch["RefPos"] for PvtEpoch in PvtEpochs],
+    dtype=np.float64).reshape(-1, 3)
+    Stack["Mask"] = np.arange(MaxSats) < NSats[:, None]
+    Stack["SatPos"] = np.zeros((NEpochs, MaxSats, 3))
+    Stack["RcvrApo"] = np.zeros((NEpochs, MaxSats, 3))
+    Stack["Code"] = np.zeros((NEpochs, MaxSats))
+    Stack["Sigma"] = np.ones((NEpochs, MaxSats))
+    Stack["Group"] = np.zeros((NEpochs, MaxSats), dtype=int)
+
+    Mask = Stack["Mask"]
+    if np.any(Mask):
+        for Field in ["SatPos", "RcvrApo", "Code", "Sigma", "Group"]:
+            Stack[Field][Mask] = np.concatenate([PvtEpoch[Field] for PvtEpoch in PvtEpochs])
+
+    return Stack
+
+# End of stackPvtEpochs()
+
+def buildGeometry(Stack, RcvrPos, NClks):
+
+    # Purpose: build the geometry matrices and geometrical ranges of all
+    #          the epochs at the given receiver CoM positions
+
+    # Parameters
+    # ==========
+    # Stack: dict
+    #         Stacked inputs, as returned by stackPvtEpochs
+    # RcvrPos: np.array
+    #         Receiver CoM position of each epoch [m] (NEpochs x 3)
+    # NClks: int
+    #         Number of receiver clocks estimated
+
+    # Returns
+    # =======
+    # G: np.array
+    #         Geometry matrices (NEpochs x MaxSats x 3+NClks), with the
+    #         rows of the padding set to 0
+    # Rho: np.array
+    #         Geometrical ranges (NEpochs x MaxSats)
+
+    # Line of sight from the receiver APC to the satellites
+    Los = Stack["SatPos"] - (RcvrPos[:, None, :] + Stack["RcvrApo"])
+    Rho = np.linalg.norm(Los, axis=2)
+    Rho[~Stack["Mask"]] = 1.0
+    Los = Los / Rho[..., None]
+
+    G = np.zeros(Stack["Mask"].shape + (3 + NClks,))
+    G[..., :3] = -Los
+    G[..., 3:] = Stack["Group"][..., None] == np.arange(NClks)
+    G[~Stack["Mask"]] = 0.0
+
+    return G, Rho
+
+# End of buildGeometry()
+
+def fixUnobservable(N):
+
+    # Purpose: make the normal matrices of all the epochs invertible,
+    #          fixing to 0 the clocks without satellites and replacing
+    #          by the identity the matrices not finite
+
+    # Parameters
+    # ==========
+    # N: np.array
+    #         Normal matrices (NEpochs x NUnknowns x NUnknowns)
+
+    # Returns
+    # =======
+    # Observed: np.array
+    #         Unknowns observed at each epoch (NEpochs x NUnknowns), none
+    #         if its matrix is not finite
+
+    # Epochs without a valid geometry (e.g. no reference position)
+    Finite = np.all(np.isfinite(N), axis=(1, 2))
+    N[~Finite] = np.eye(N.shape[-1])
+
+    Idx = np.arange(N.shape[-1])
+    Observed = (N[:, Idx, Idx] > 0) & Finite[:, None]
+    N[:, Idx, Idx] = np.where(Observed, N[:, Idx, Idx], 1.0)
+
+    return Observed
+
+# End of fixUnobservable()
+
+def solveNormal(N, b):
+
+    # Purpose: solve the normal equations of all the epochs at once
+
+    # Parameters
+    # ==========
+    # N: np.array
+    #         Normal matrices (NEpochs x NUnknowns x NUnknowns)
+    # b: np.array
+    #         Normal vectors (NEpochs x NUnknowns)
+
+    # Returns
+    # =======
+    # x: np.array
+    #         Solutions (NEpochs x NUnknowns)
+
+    try:
+        # Cholesky factorization of the normal matrices
+        L = np.linalg.cholesky(N)
+        y = np.linalg.solve(L, b[..., None])
+        x = np.linalg.solve(np.swapaxes(L, -1, -2), y)[..., 0]
+
+    except np.linalg.LinAlgError:
+        # Some geometry is singular: use the pseudo-inverse
+        x = np.einsum('eij,ej->ei', np.linalg.pinv(N), b)
+
+    return x
+
+# End of solveNormal()
+
+def runPvt(Conf, Doy, PvtEpochs):
+
+    # Purpose: compute the navigation solution of several epochs at once
+    #          with an iterative Weighted Least Squares, and its DOPs
+
+    #          More in detail, for all the epochs together:
+
+    #             *  Build the geometry matrices at the current receiver
+    #                position (starting from the LEO reference position)
+    #             *  Solve the weighted normal equations (weights 1/SigmaUERE^2)
+    #                for the position, receiver clock and, if RCVR_CLK_ISB
+    #                is 1, Galileo clock (Inter-System Bias)
+    #             *  Iterate the epochs not converged (position update
+    #                larger than LSQ_DELTA_EPS) up to MAX_LSQ_ITER times
+    #             *  Compute the DOPs and the position errors with respect
+    #                to the LEO reference position
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Doy: int
+    #         Day of Year
+    # PvtEpochs: list
+    #         Inputs of each epoch, as returned by buildPvtEpoch
+
+    # Returns
+    # =======
+    # PosInfo: dict
+    #         Navigation solution per field, one value per epoch
+    #         PosInfo["Hpe"][i] is the Horizontal Position Error of the
+    #         i-th epoch
+
+    Stack = stackPvtEpochs(PvtEpochs)
+    NEpochs = len(Stack["Sod"])
+    NClks = 2 if Conf["RCVR_CLK_ISB"] == 1 else 1
+    Mask = Stack["Mask"]
+    W = Mask / Stack["Sigma"]**2
+
+    # Enough satellites for the position and the clocks observed
+    NSats = Mask.sum(axis=1)
+    NClkSats = np.stack([np.sum(Mask & (Stack["Group"] == Clk), axis=1) 
+    for Clk in range(NClks)], axis=1)
+    MinSats = np.maximum(Const.MIN_NUM_SATS_PVT, 3 + np.sum(NClkSats > 0, axis=1))
+
+    # Initialize the solution at the LEO reference position
+    RcvrPos = Stack["RefPos"].copy()
+    RcvrClk = np.zeros((NEpochs, NClks))
+    NIter = np.zeros(NEpochs, dtype=int)
+    Converged = np.zeros(NEpochs, dtype=bool)
+    Active = NSats >= MinSats
+
+    # Iterate the Weighted Least Squares of all the active epochs
+    # ----------------------------------------------------------
+    while np.any(Active):
+        G, Rho = buildGeometry(Stack, RcvrPos, NClks)
+
+        # Prefit residuals
+        Clk = np.take_along_axis(RcvrClk, Stack["Group"], axis=1)
+        Res = (Stack["Code"] - Rho - Clk) * Mask
+
+        # Weighted normal equations
+        N = np.einsum('esi,es,esj->eij', G[Active], W[Active], G[Active])
+        b = np.einsum('esi,es,es->ei', G[Active], W[Active], Res[Active])
+        fixUnobservable(N)
+        Delta = solveNormal(N, b)
+
+        # Update the solution
+        RcvrPos[Active] += Delta[:, :3]
+        RcvrClk[Active] += Delta[:, 3:]
+        NIter[Active] += 1
+
+        # Stop the epochs converged or out of iterations
+        Converged[Active] = np.linalg.norm(Delta[:, :3], axis=1) < Const.LSQ_DELTA_EPS
+        Active &= ~Converged & (NIter < Conf["MAX_LSQ_ITER"])
+
+    # End of while np.any(Active)
+
+    # DOPs at the solution
+    # ----------------------------------------------------------
+    G, Rho = buildGeometry(Stack, RcvrPos, NClks)
+    N = np.einsum('esi,esj->eij', G, G)
+    Observed = fixUnobservable(N)
+    Q = np.linalg.pinv(N)
+
+    # Rotation to the local frame (East, North, Up) of each epoch
+    LonDeg, LatDeg, Alt = xyz2llh(RcvrPos[:, 0], RcvrPos[:, 1], RcvrPos[:, 2])
+    Lon = np.deg2rad(LonDeg)
+    Lat = np.deg2rad(LatDeg)
+    Enu = np.stack([
+        np.stack([-np.sin(Lon), np.cos(Lon), np.zeros(NEpochs)], axis=1),
+        np.stack([-np.sin(Lat)*np.cos(Lon), -np.sin(Lat)*np.sin(Lon), np.cos(Lat)], axis=1),
+        np.stack([np.cos(Lat)*np.cos(Lon), np.cos(Lat)*np.sin(Lon), np.sin(Lat)], axis=1),
+        ], axis=1)
+    QEnu = np.einsum('eij,ejk,elk->eil', Enu, Q[:, :3, :3], Enu)
+
+    # Position errors with respect to the LEO reference position
+    PosError = np.einsum('eij,ej->ei', Enu, RcvrPos - Stack["RefPos"])
+
+    # Build the output
+    # ----------------------------------------------------------
+    PosInfo = OrderedDict({})
+    PosInfo["Sod"] = Stack["Sod"]
+    PosInfo["Doy"] = np.full(NEpochs, Doy, dtype=int)
+    PosInfo["Lon"] = LonDeg
+    PosInfo["Lat"] = LatDeg
+    PosInfo["Alt"] = Alt
+    PosInfo["X"] = RcvrPos[:, 0]
+    PosInfo["Y"] = RcvrPos[:, 1]
+    PosInfo["Z"] = RcvrPos[:, 2]
+
+    # Receiver clock (GPS clock if estimated) and Inter-System Bias
+    HasGps = Observed[:, 3]
+    PosInfo["RcvrClk"] = np.where(HasGps, RcvrClk[:, 0], RcvrClk[:, -1])
+    PosInfo["Isb"] = np.zeros(NEpochs)
+    if NClks > 1:
+        Both = Observed[:, 3] & Observed[:, 4]
+        PosInfo["Isb"][Both] = RcvrClk[Both, 1] - RcvrClk[Both, 0]
+
+    PosInfo["NSats"] = NSats
+    PosInfo["NIter"] = NIter
+    PosInfo["Gdop"] = np.sqrt(np.einsum('eii->e', Q) - np.sum(~Observed, axis=1))
+    PosInfo["Pdop"] = np.sqrt(np.einsum('eii->e', Q[:, :3, :3]))
+    PosInfo["Hdop"] = np.sqrt(QEnu[:, 0, 0] + QEnu[:, 1, 1])
+    PosInfo["Vdop"] = np.sqrt(QEnu[:, 2, 2])
+    PosInfo["Tdop"] = np.sqrt(np.where(HasGps, Q[:, 3, 3], Q[:, -1, -1]))
+    NoSolution = (NSats < MinSats) | ~Observed[:, 0]
+    for Dop in ["Gdop", "Pdop", "Hdop", "Vdop", "Tdop"]:
+        PosInfo[Dop][NoSolution] = 0.0
+    PosInfo["Hpe"] = np.linalg.norm(PosError[:, :2], axis=1)
+    PosInfo["Vpe"] = np.abs(PosError[:, 2])
+
+    # Solution available if there are enough satellites, the LSQ has
+    # converged and the geometry is good enough
+    PosInfo["Flag"] = ((NSats >= MinSats) & Converged &
+    (PosInfo["Pdop"] <= Conf["PDOP_MAX"])).astype(int)
+
+    return PosInfo
+
+# End of runPvt()
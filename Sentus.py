@@ -11,10 +11,23 @@
 #   Copyright 2024 GNSS Academy
 #
 # Usage:
-#   Sentus.py $SCEN_PATH
+#   Sentus.py $SCEN_PATH [-j N] [-s N|const] [-p N]
+#   -j N: use up to N worker processes in total, shared by the days 
+#         processed in parallel (up to N) and, within each day, by its 
+#         satellite groups and figures. Without -j the days are processed
+#         one after another, each with all the CPUs
+#   -s N: split each day in N groups of satellites processed in parallel
+#   -s const: split each day by constellation
+#   -p N: render the figures of each day with up to N processes
+#   -p 0: do not render the figures (see CorrectionsPlots.py to render
+#         them afterwards)
 ########################################################################
 
 import sys, os
+import io
+import traceback
+from contextlib import redirect_stdout, redirect_stderr
+from concurrent.futures import ProcessPoolExecutor
 
 # Update Path to reach COMMON
 Common = os.path.dirname(
@@ -30,61 +43,415 @@ from InputOutput import readConf
 from InputOutput import processConf
 from InputOutput import createOutputFile
 from InputOutput import openInputFile
-from InputOutput import readObsEpoch
+from InputOutput import readObsEpochs
+from InputOutput import readObsDay
+from InputOutput import splitObsEpochs
+from InputOutput import ObsIdxC, SatSlotLabels
 from InputOutput import generatePreproFile
+from InputOutput import buildPreproRecords
+from InputOutput import createBinOutput, appendBinOutput, closeBinOutput
 from InputOutput import readLeoPos
 from InputOutput import readLeoQuat
 from InputOutput import readSatPos
-from InputOutput import readSatApo
 from InputOutput import readSatClk
 from InputOutput import readSatBia
-from InputOutput import ObsIdxP
+from InputOutput import loadStaticInput
 from InputOutput import generateCorrFile
-from InputOutput import PreproHdr, CorrHdr
-from InputOutput import CSNEPOCHS, CSNPOINTS
-from Preprocessing import runPreprocessing
+from InputOutput import generatePosFile
+from InputOutput import PreproHdr, CorrHdr, PosHdr
+from InputOutput import PreproIdx, PreproFmt, PreproLineFmt, CorrIdx, CorrFmt
+import numpy as np
+from Preprocessing import preprocessEpochs
+from Preprocessing import runPreprocessingBatch
+from Preprocessing import initPreproState
 # from PreprocessingPlots import generatePreproPlots
 from CorrectionsPlots import generateCorrPlots
 from COMMON.Dates import convertJulianDay2YearMonthDay
 from COMMON.Dates import convertYearMonthDay2Doy
-from Corrections import runCorrectMeas
+from COMMON.Misc import buildSunTable
+from Corrections import runCorrectMeas, runCorrectMeasVect, correctRcvrClk
+from Pvt import buildPvtEpoch, runPvt
+from Correction_functions import buildSatPosStore
+from Correction_functions import buildLeoPosStore
+from Correction_functions import buildSatBiaTable
+from Correction_functions import buildSatClkStore
+from Correction_functions import buildLeoAttStore
 
 #----------------------------------------------------------------------
 # INTERNAL FUNCTIONS
 #----------------------------------------------------------------------
 
 def displayUsage():
-    sys.stderr.write("ERROR: Please provide path to SCENARIO as a unique argument\n")
-
-#######################################################
-# MAIN BODY
-#######################################################
-
-# Check InputOutput Arguments
-if len(sys.argv) != 2:
-    displayUsage()
-    sys.exit()
-
-# Extract the arguments
-Scen = sys.argv[1]
-
-# Select the Configuratiun file name
-CfgFile = Scen + '/CFG/sentus.cfg'
-
-# Read conf file
-Conf = readConf(CfgFile)
+    sys.stderr.write("ERROR: Please provide path to SCENARIO as a unique argument, "\
+        "optionally followed by -j N (total number of worker processes), "\
+        "-s N|const (satellite groups of a day processed in parallel) "\
+        "and -p N (processes rendering the figures, 0 to skip them)\n")
+
+def parseArguments(Args):
+
+    # Purpose: parse the command line arguments
+
+    # Parameters
+    # ==========
+    # Args: list
+    #         Command line arguments (without the program name)
+
+    # Returns
+    # =======
+    # Scen: str
+    #         Path to the scenario (None if the arguments are wrong)
+    # NJobs: int
+    #         Total number of worker processes (None if not given)
+    # Split: int or str
+    #         Number of satellite groups of a day processed in parallel,
+    #         "const" to split by constellation (None if days are not split)
+    # PlotProcs: int
+    #         Number of processes rendering the figures of a day (0 if
+    #         the figures are not rendered)
+
+    Scen = None
+    NJobs = None
+    Split = None
+    PlotProcs = 1
+
+    i = 0
+    while i < len(Args):
+        # Number of parallel jobs
+        if Args[i] == '-j':
+            try:
+                NJobs = int(Args[i + 1])
+            except (IndexError, ValueError):
+                return None, NJobs, Split, PlotProcs
+            if NJobs < 1:
+                return None, NJobs, Split, PlotProcs
+            i = i + 2
+
+        # Satellite groups processed in parallel
+        elif Args[i] == '-s':
+            try:
+                Split = Args[i + 1] if Args[i + 1] == "const" else int(Args[i + 1])
+            except (IndexError, ValueError):
+                return None, NJobs, Split, PlotProcs
+            if Split != "const" and Split < 1:
+                return None, NJobs, Split, PlotProcs
+            i = i + 2
+
+        # Processes rendering the figures
+        elif Args[i] == '-p':
+            try:
+                PlotProcs = int(Args[i + 1])
+            except (IndexError, ValueError):
+                return None, NJobs, Split, PlotProcs
+            if PlotProcs < 0:
+                return None, NJobs, Split, PlotProcs
+            i = i + 2
+
+        # Scenario path
+        elif Scen is None:
+            Scen = Args[i]
+            i = i + 1
+
+        else:
+            return None, NJobs, Split, PlotProcs
+
+    # A single group is the whole day
+    if Split == 1:
+        Split = None
+
+    return Scen, NJobs, Split, PlotProcs
+
+# End of parseArguments()
+
+def readStaticInputs(Conf, Scen):
+
+    # Purpose: read the input products fixed by the configuration for the
+    #          whole scenario (SAT BIA file). They are kept
+    #          in a binary cache in OUT/CACHE, so that later runs of the
+    #          scenario do not parse them again unless they change
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Scen: str
+    #         Path to the scenario
+
+    # Returns
+    # =======
+    # StaticInputs: dict
+    #         StaticInputs["SatBiaInfo"]: iono-free satellite biases table
+
+    StaticInputs = OrderedDict({})
+    CacheDir = Scen + '/OUT/CACHE'
+
+    # The SAT APO file (SAT_APO_FILE) is not read: the satellite APO is
+    # computed from the satellite attitude only (see computeSatApo)
+
+    # Define the full path and name to the SAT_BIA file to read
+    SatBiaFile = Scen + \
+        '/INP/BIA/' + Conf["SAT_BIA_FILE"]
+    # Display Message
+    print("INFO: Reading file: %s..." %
+    SatBiaFile)
+    # Read the file
+    SatBiaInfo = loadStaticInput(SatBiaFile, readSatBia, CacheDir)
+    # Build the iono-free biases table
+    StaticInputs["SatBiaInfo"] = buildSatBiaTable(SatBiaInfo)
+
+    return StaticInputs
+
+# End of readStaticInputs()
+
+def partitionSatellites(ObsInfo, Split):
+
+    # Purpose: split the satellites of a day in groups to be processed
+    #          in parallel
+
+    # Parameters
+    # ==========
+    # ObsInfo: list
+    #         OBS info of the whole day, as returned by readObsDay
+    # Split: int or str
+    #         Number of groups, balanced by number of measurements, or
+    #         "const" for one group per constellation
+
+    # Returns
+    # =======
+    # Partitions: list
+    #         OBS rows of each group (non-empty groups only)
+
+    Slots = ObsInfo[0][:, ObsIdxC["PRN"]].astype(int)
+
+    # One group per constellation
+    if Split == "const":
+        SlotGroup = np.array([0 if Label[0] == 'G' else 1 for Label in SatSlotLabels])
+
+    # Greedy balance of the measurements: the satellites with more
+    # measurements go first, each one to the lightest group
+    else:
+        NObs = np.bincount(Slots, minlength=len(SatSlotLabels))
+        SlotGroup = np.zeros(len(SatSlotLabels), dtype=int)
+        Load = np.zeros(Split, dtype=int)
+        for Slot in np.argsort(-NObs, kind='stable'):
+            SlotGroup[Slot] = np.argmin(Load)
+            Load[SlotGroup[Slot]] += NObs[Slot]
+
+    Groups = SlotGroup[Slots]
+    Partitions = [np.flatnonzero(Groups == Group) for Group in np.unique(Groups)]
+
+    return Partitions
+
+# End of partitionSatellites()
+
+def correctEpochs(Conf, Year, Doy, PreproEpochs, Inputs, EpochClk=True):
+
+    # Purpose: correct the measurements of the preprocessed epochs every
+    #          configured sampling rate
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Year, Doy: int
+    #         Year and Day of Year
+    # PreproEpochs: iterable
+    #         Preprocessed observations of each epoch per sat
+    # Inputs: dict
+    #         Input products of the day, read in processDay
+    # EpochClk: bool
+    #         Estimate the receiver clock of each epoch (False when only
+    #         a group of the satellites is corrected, see correctRcvrClk)
+
+    # Returns
+    # =======
+    # Generator of (PreproObsInfo, CorrInfo)
+    #         Preprocessed and corrected measurements of each epoch per sat
+    #         (CorrInfo is None out of the sampling rate)
 
-# Process Configuration Parameters
-Conf = processConf(Conf)
+    # Initialize Variables
+    CorrPrevInfo = {}
+    for const in ['G', 'E']:
+        for prn in range(1, Const.MAX_NUM_SATS_CONSTEL + 1):
+            CorrPrevInfo["%s%02d" % (const,prn)] = {
+            "Sod_Prev": 0,
+            "SatComPos_Prev": (0, 0, 0)
+            } # End of SatPreproObsInfo
 
-# Print header
-print( '------------------------------------')
-print( '--> RUNNING SENTUS:')
-print( '------------------------------------')
+    # Select the corrections engine
+    if Conf["CORR_MODE"] == 1:
+        RunCorrectMeas = runCorrectMeasVect
+    else:
+        RunCorrectMeas = runCorrectMeas
+
+    # LOOP over all Epochs
+    # ----------------------------------------------------------
+    for PreproObsInfo in PreproEpochs:
+        CorrInfo = None
+
+        # Get SoD
+        Sod = int(next(iter(PreproObsInfo.values()))["Sod"])
+
+        # The rest of the analyses are executed every configured sampling rate
+        if(Sod % Conf["SAMPLING_RATE"] == 0):
+            # Correct measurements and estimate the variances
+            # ----------------------------------------------------------
+            CorrInfo, RcvrRefPosXyz, RcvrRefPosLlh = RunCorrectMeas(Year,
+                                                                    Doy,
+                                                                    Conf, 
+                                                                    PreproObsInfo, 
+                                                                    Inputs["LeoPosInfo"],
+                                                                    Inputs["LeoQuatInfo"],
+                                                                    Inputs["SatPosInfo"],
+                                                                    Inputs["SatClkInfo"],
+                                                                    Inputs["SatBiaInfo"],
+                                                                    Inputs["SunInfo"],
+                                                                    CorrPrevInfo
+                                                                    # SatComPos_1,
+                                                                    # Sod_1
+                                                                    )
+
+            # Estimate the receiver clock with all the satellites
+            if EpochClk:
+                CorrInfo = correctRcvrClk(Conf, CorrInfo)
+
+            if len(CorrInfo) > 0:
+                for PRN in CorrInfo.keys():
+                    CorrPrevInfo["Sod_Prev"] = CorrInfo[PRN]["Sod"]
+                    CorrPrevInfo["SatComPos_Prev"] = (CorrInfo[PRN]["SatX"], CorrInfo[PRN]["SatY"], CorrInfo[PRN]["SatZ"])
+
+        yield PreproObsInfo, CorrInfo
+
+# End of correctEpochs()
+
+def processSatPartition(Conf, Year, Doy, ObsInfo, Inputs):
+
+    # Purpose: preprocess and correct the measurements of a group of
+    #          satellites in a worker process, and build their outputs, 
+    #          capturing its log so that the day displays it in order
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Year, Doy: int
+    #         Year and Day of Year
+    # ObsInfo: list
+    #         OBS info of the satellites of the group for the whole day
+    # Inputs: dict
+    #         Input products of the day, read in processDay
+
+    # Returns
+    # =======
+    # PreproRows: list
+    #         PREPRO OBS output record of each OBS row (None if the 
+    #         output is disabled), see buildPreproRecords
+    # CorrRows: list
+    #         (SatLabel, SatCorrInfo) of each OBS row (None for the rows 
+    #         out of the sampling rate or if the CORR and PVT outputs are 
+    #         disabled), without the receiver clock, which needs all the 
+    #         satellites
+    # Out, Err: str
+    #         Messages displayed while processing the group, to stdout
+    #         and stderr
+
+    Out = io.StringIO()
+    Err = io.StringIO()
+    with redirect_stdout(Out), redirect_stderr(Err):
+        PreproRows, CorrRows = processSatGroup(Conf, Year, Doy, ObsInfo, Inputs)
+
+    return PreproRows, CorrRows, Out.getvalue(), Err.getvalue()
+
+# End of processSatPartition()
+
+def processSatGroup(Conf, Year, Doy, ObsInfo, Inputs):
+
+    # Purpose: preprocess and correct the measurements of a group of
+    #          satellites and build their outputs (see processSatPartition)
+
+    PreproRows = []
+    CorrRows = []
+
+    # Preprocess the measurements of the group
+    if Conf["PREPRO_MODE"] == 2:
+        PreproEpochs = runPreprocessingBatch(Conf, ObsInfo)
+    else:
+        PreproEpochs = preprocessEpochs(Conf, splitObsEpochs(ObsInfo), 
+        initPreproState(Conf))
+
+    for PreproObsInfo, CorrInfo in correctEpochs(Conf, Year, Doy, PreproEpochs, Inputs,
+    EpochClk=False):
+        # Build the outputs of the epoch
+        if Conf["PREPRO_OUT"] == 1:
+            PreproRows.extend(buildPreproRecords(PreproObsInfo))
+        else:
+            PreproRows.extend([None] * len(PreproObsInfo))
+
+        if (Conf["CORR_OUT"] == 1 or Conf["PVT_OUT"] == 1) and CorrInfo is not None:
+            CorrRows.extend(CorrInfo.items())
+        else:
+            CorrRows.extend([None] * len(PreproObsInfo))
+
+    return PreproRows, CorrRows
+
+# End of processSatGroup()
+
+def gatherSatPartitions(Partitions, Results, PreproRows, CorrRows):
+
+    # Purpose: place the outputs of the satellite groups in the OBS file 
+    #          order and display their logs, in the order of the groups
+
+    # Parameters
+    # ==========
+    # Partitions: list
+    #         OBS rows of each group, see partitionSatellites
+    # Results: iterable
+    #         Result of each group, as returned by processSatPartition
+    # PreproRows, CorrRows: list
+    #         Outputs of each OBS row of the day, updated
+
+    # Returns
+    # =======
+    # Nothing
+
+    for Rows, (PartPreproRows, PartCorrRows, Out, Err) in zip(Partitions, Results):
+        sys.stdout.write(Out)
+        sys.stderr.write(Err)
+        for Row, PreproRow, CorrRow in zip(Rows, PartPreproRows, PartCorrRows):
+            PreproRows[Row] = PreproRow
+            CorrRows[Row] = CorrRow
+
+# End of gatherSatPartitions()
+
+def processDay(Conf, Scen, Jd, StaticInputs, Split=None, PlotProcs=1, NProcs=1):
+
+    # Purpose: process one Julian Day of the scenario: read its inputs,
+    #          preprocess and correct the measurements and write the
+    #          PREPRO OBS and CORR outputs of the day
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Scen: str
+    #         Path to the scenario
+    # Jd: int
+    #         Julian Day
+    # StaticInputs: dict
+    #         Input products fixed for the scenario (see readStaticInputs)
+    # Split: int or str
+    #         Satellite groups processed in parallel (see 
+    #         partitionSatellites), None to process the day as a whole
+    # PlotProcs: int
+    #         Number of processes rendering the figures of the day (0 if
+    #         the figures are not rendered)
+    # NProcs: int
+    #         Max. number of processes of the day, for its satellite 
+    #         groups and figures
+
+    # Returns
+    # =======
+    # Nothing
 
-# Loop over Julian Days in simulation
-#-----------------------------------------------------------------------
-for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
     # Compute Year, Month and Day in order to build input file name
     Year, Month, Day = convertJulianDay2YearMonthDay(Jd)
 
@@ -106,8 +473,13 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
     # Display Message
     print("INFO: Reading file: %s..." %
     SatPosFile)
+    # Input products of the day
+    Inputs = OrderedDict({})
+
     # Read the file
     LeoPosInfo = readLeoPos(SatPosFile)
+    # Build the trajectory store
+    Inputs["LeoPosInfo"] = buildLeoPosStore(LeoPosInfo)
     
     # Define the full path and name to the Sentinel Quaternions file to read and open the file
     SatQuatFile = Scen + \
@@ -118,6 +490,8 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
     SatQuatFile)
     # Read the file
     LeoQuatInfo = readLeoQuat(SatQuatFile)
+    # Build the attitude store
+    Inputs["LeoQuatInfo"] = buildLeoAttStore(LeoQuatInfo)
 
     # Define the full path and name to the SAT_POS file to read and open the file
     SatPosFile = Scen + \
@@ -128,15 +502,8 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
     SatPosFile)
     # Read the file
     SatPosInfo = readSatPos(SatPosFile)
-
-    # Define the full path and name to the SAT_APO file to read and open the file
-    SatApoFile = Scen + \
-        '/INP/ATX/' + Conf["SAT_APO_FILE"]
-    # Display Message
-    print("INFO: Reading file: %s..." %
-    SatApoFile)
-    # Read the file
-    SatApoInfo = readSatApo(SatApoFile)
+    # Build the per-satellite ephemeris store
+    Inputs["SatPosInfo"] = buildSatPosStore(SatPosInfo)
 
     # Define the full path and name to the SAT_CLK file to read and open the file
     SatClkFile = Scen + \
@@ -147,15 +514,14 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
     SatClkFile)
     # Read the file
     SatClkInfo = readSatClk(SatClkFile)
+    # Build the clock store
+    Inputs["SatClkInfo"] = buildSatClkStore(SatClkInfo)
 
-    # Define the full path and name to the SAT_BIA file to read and open the file
-    SatBiaFile = Scen + \
-        '/INP/BIA/' + Conf["SAT_BIA_FILE"]
-    # Display Message
-    print("INFO: Reading file: %s..." %
-    SatBiaFile)
-    # Read the file
-    SatBiaInfo = readSatBia(SatBiaFile)
+    # Satellite biases, loaded once for the scenario
+    Inputs["SatBiaInfo"] = StaticInputs["SatBiaInfo"]
+
+    # Sun positions of the day, at the sampling rate
+    Inputs["SunInfo"] = buildSunTable(Year, Doy, Conf["SAMPLING_RATE"])
 
 
 
@@ -185,6 +551,11 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
         # Create output file
         fpreprobs = createOutputFile(PreproObsFile, PreproHdr)
 
+    # Binary outputs, written along with the text ones
+    BinPrepro = None
+    if Conf["PREPRO_OUT"] == 1 and Conf["BIN_OUT"] == 1:
+        BinPrepro = createBinOutput(PreproObsFile, PreproIdx, PreproFmt)
+
     # If Corrected outputs are activated
     if Conf["CORR_OUT"] == 1:
         # Define the full path and name to the output CORR file
@@ -195,120 +566,139 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
         # Create output file
         fcorr = createOutputFile(CorrFile, CorrHdr)
 
-    # Initialize Variables
-    EndOfFile = False
-    ObsInfo = [None]
-    PrevPreproObsInfo = {}
-    for const in ['G', 'E']:
-        for prn in range(1, Const.MAX_NUM_SATS_CONSTEL + 1):
-            PrevPreproObsInfo["%s%02d" % (const,prn)] = {
-                "PrevEpoch": 86400,                                          # Previous SoD
-
-                "ResetHatchFilter": 1,                                       # Flag to reset Hatch filter
-                "Ksmooth": 0,                                                # Hatch filter K
-                "PrevSmooth": 0,                                             # Previous Smooth Observable
-                "IF_P_Prev": 0,                                              # Previous IF of the phases
-                
-                "PrevL1": Const.NAN,                                         # Previous L1
-                "PrevPhaseRateL1": Const.NAN,                                # Previous Phase Rate
-                "PrevC1": Const.NAN,                                         # Previous C1
-                "PrevRangeRateL1": Const.NAN,                                # Previous Code Rate
-                
-                "PrevL2": Const.NAN,                                         # Previous L1
-                "PrevPhaseRateL2": Const.NAN,                                # Previous Phase Rate
-                "PrevC2": Const.NAN,                                         # Previous C2
-                "PrevRangeRateL2": Const.NAN,                                # Previous Code Rate
-
-                "CycleSlipBuffIdx": 0,                                         # Index of CS buffer
-                "CycleSlipFlagIdx": 0,                                         # Index of CS flag array
-                "GF_L_Prev": [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS]),      # Array with previous GF carrier phase observables
-                "GF_Epoch_Prev": [0.0] * int(Conf["CYCLE_SLIPS"][CSNPOINTS]),  # Array with previous epochs
-                "CycleSlipFlags": [0.0] * int(Conf["CYCLE_SLIPS"][CSNEPOCHS]), # Array with last cycle slips flags
-                "CycleSlipDetectFlag": 0,                                      # Flag indicating if a cycle slip has been detected
-
-                "PrealignOffset": 0,                                           # Phase prealignment offset
-
-            } # End of SatPreproObsInfo
-
-
-
-        CorrPrevInfo = {}
-        for const in ['G', 'E']:
-            for prn in range(1, Const.MAX_NUM_SATS_CONSTEL + 1):
-                CorrPrevInfo["%s%02d" % (const,prn)] = {
-                "Sod_Prev": 0,
-                "SatComPos_Prev": (0, 0, 0)
-                } # End of SatPreproObsInfo
-
-
+    # Binary outputs, written along with the text ones
+    BinCorr = None
+    if Conf["CORR_OUT"] == 1 and Conf["BIN_OUT"] == 1:
+        BinCorr = createBinOutput(CorrFile, CorrIdx, CorrFmt)
 
+    # Inputs of the navigation solution of each epoch
+    PvtEpochs = []
 
     # Display Message
     print("INFO: Reading file: %s..." %
     ObsFile)
 
-    # Open OBS file
-    with open(ObsFile, 'r') as fobs:
+    # If the satellites are processed in parallel groups
+    # ----------------------------------------------------------
+    if Split is not None:
+        # Read the whole day
+        with open(ObsFile, 'r') as fobs:
+            ObsInfo = readObsDay(fobs)
+
+        # Outputs in the OBS file order
+        PreproRows = [None] * len(ObsInfo[0])
+        CorrRows = [None] * len(ObsInfo[0])
+
+        # Dispatch the groups to the workers (in this process if only 
+        # one is available) and gather their outputs and logs in order
+        Partitions = partitionSatellites(ObsInfo, Split)
+        GroupProcs = min(len(Partitions), NProcs)
+        if GroupProcs <= 1:
+            Results = (processSatPartition(Conf, Year, Doy, 
+            [ObsInfo[0][Rows], ObsInfo[1][Rows]], Inputs) for Rows in Partitions)
+            gatherSatPartitions(Partitions, Results, PreproRows, CorrRows)
+
+        else:
+            with ProcessPoolExecutor(max_workers=GroupProcs) as Pool:
+                Jobs = [Pool.submit(processSatPartition, Conf, Year, Doy, 
+                [ObsInfo[0][Rows], ObsInfo[1][Rows]], Inputs) for Rows in Partitions]
+                gatherSatPartitions(Partitions, (Job.result() for Job in Jobs), 
+                PreproRows, CorrRows)
+
+            # End of with ProcessPoolExecutor(...)
+
+        # If PREPRO outputs are requested
+        if Conf["PREPRO_OUT"] == 1:
+            # Generate output file
+            fpreprobs.write("".join([PreproLineFmt % PreproRow 
+            for PreproRow in PreproRows]))
+            if BinPrepro is not None:
+                appendBinOutput(BinPrepro, PreproRows)
+
+        # If CORR or PVT outputs are requested
+        if Conf["CORR_OUT"] == 1 or Conf["PVT_OUT"] == 1:
+            # Gather the corrected satellites of each epoch to estimate
+            # the receiver clock with all of them
+            CorrInfo = OrderedDict({})
+            for CorrRow in CorrRows + [None]:
+                if CorrRow is not None and (len(CorrInfo) == 0 or 
+                CorrRow[1]["Sod"] == next(iter(CorrInfo.values()))["Sod"]):
+                    CorrInfo[CorrRow[0]] = CorrRow[1]
+                    continue
+
+                # Generate outputs for the completed epoch
+                if len(CorrInfo) > 0:
+                    correctRcvrClk(Conf, CorrInfo)
+                    if Conf["CORR_OUT"] == 1:
+                        generateCorrFile(fcorr, CorrInfo, BinCorr)
+                    if Conf["PVT_OUT"] == 1:
+                        PvtEpochs.append(buildPvtEpoch(Conf, CorrInfo))
+                    CorrInfo = OrderedDict({})
+
+                if CorrRow is not None:
+                    CorrInfo[CorrRow[0]] = CorrRow[1]
+
+    # Else, process the day as a whole
+    # ----------------------------------------------------------
+    else:
+        # Open OBS file
+        with open(ObsFile, 'r') as fobs:
+
+            # Preprocess OBS measurements
+            # ----------------------------------------------------------
+            # If whole day batch mode
+            if Conf["PREPRO_MODE"] == 2:
+                # Preprocess the whole day at once
+                PreproEpochs = runPreprocessingBatch(Conf, readObsDay(fobs))
+
+            else:
+                # Preprocess the epochs one by one
+                PreproEpochs = preprocessEpochs(Conf, readObsEpochs(fobs), 
+                initPreproState(Conf))
+
+            # LOOP over all Epochs of OBS file
+            # ----------------------------------------------------------
+            for PreproObsInfo, CorrInfo in correctEpochs(Conf, Year, Doy,
+            PreproEpochs, Inputs):
+
+                # If PREPRO outputs are requested
+                if Conf["PREPRO_OUT"] == 1:
+                    # Generate output file
+                    generatePreproFile(fpreprobs, PreproObsInfo, BinPrepro)
 
-        # LOOP over all Epochs of OBS file
-        # ----------------------------------------------------------
-        while not EndOfFile:
+                # If CORR outputs are requested at this epoch
+                if Conf["CORR_OUT"] == 1 and CorrInfo is not None:
+                    # Generate output file
+                    generateCorrFile(fcorr, CorrInfo, BinCorr)
 
-            # If ObsInfo is not empty
-            if ObsInfo != []:
+                # If PVT outputs are requested at this epoch
+                if Conf["PVT_OUT"] == 1 and CorrInfo is not None:
+                    # Keep the inputs of the navigation solution
+                    PvtEpochs.append(buildPvtEpoch(Conf, CorrInfo))
 
-                # Read Only One Epoch
-                ObsInfo = readObsEpoch(fobs)
+    # End of if Split is not None:
 
-                # If ObsInfo is empty, exit loop
-                if ObsInfo == []:
-                    break
+    # If PVT outputs are requested
+    if Conf["PVT_OUT"] == 1:
+        # Compute the navigation solution of all the epochs at once
+        PosInfo = runPvt(Conf, Doy, PvtEpochs)
 
-                # Preprocess OBS measurements
-                # ----------------------------------------------------------
-                PreproObsInfo = runPreprocessing(Conf, ObsInfo, PrevPreproObsInfo)
+        # Define the full path and name to the output POS file
+        PosFile = Scen + \
+            '/OUT/PVT/' + "POS_%s_Y%02dD%03d.dat" % \
+                (Conf['SAT_ACRONYM'], Year % 100, Doy)
 
-                # If PREPRO outputs are requested
-                if Conf["PREPRO_OUT"] == 1:
-                    # Generate output file
-                    generatePreproFile(fpreprobs, PreproObsInfo)
-
-                # Get SoD
-                Sod = int(ObsInfo[1][0][ObsIdxP["SOD"]])
-
-                # The rest of the analyses are executed every configured sampling rate
-                if(Sod % Conf["SAMPLING_RATE"] == 0):
-                    # Correct measurements and estimate the variances
-                    # ----------------------------------------------------------
-                    CorrInfo, RcvrRefPosXyz, RcvrRefPosLlh = runCorrectMeas(Year,
-                                                                            Doy,
-                                                                            Conf, 
-                                                                            PreproObsInfo, 
-                                                                            LeoPosInfo,
-                                                                            LeoQuatInfo,
-                                                                            SatPosInfo,
-                                                                            SatApoInfo,
-                                                                            SatClkInfo,
-                                                                            SatBiaInfo,
-                                                                            CorrPrevInfo
-                                                                            # SatComPos_1,
-                                                                            # Sod_1
-                                                                            )
-
-                    if len(CorrInfo) > 0:
-                        for PRN in CorrInfo.keys():
-                            CorrPrevInfo["Sod_Prev"] = CorrInfo[PRN]["Sod"]
-                            CorrPrevInfo["SatComPos_Prev"] = (CorrInfo[PRN]["SatX"], CorrInfo[PRN]["SatY"], CorrInfo[PRN]["SatZ"])
-
-                    # If CORR outputs are requested
-                    if Conf["CORR_OUT"] == 1:
-                        # Generate output file
-                        generateCorrFile(fcorr, CorrInfo)
+        # Generate output file
+        fpos = createOutputFile(PosFile, PosHdr)
+        generatePosFile(fpos, PosInfo)
+        fpos.close()
 
     # If PREPRO outputs are requested
     if Conf["PREPRO_OUT"] == 1:
         # Close PREPRO output file
         fpreprobs.close()
+        if BinPrepro is not None:
+            closeBinOutput(BinPrepro)
 
         # Display Message
         print("INFO: Reading file: %s and generating PREPRO figures..." %
@@ -321,19 +711,156 @@ for Jd in range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1):
     if Conf["CORR_OUT"] == 1:
         # Close CORR output file
         # fcorr.close()
+        fcorr.flush()
+        if BinCorr is not None:
+            closeBinOutput(BinCorr)
+
+        # If figures are rendered in the run
+        if PlotProcs > 0:
+            # Display Message
+            print("INFO: Reading file: %s and generating PREPRO figures..." %
+            CorrFile)
+
+            # Generate Preprocessing plots
+            generateCorrPlots(CorrFile, min(PlotProcs, NProcs))
+
+# End of processDay()
+
+def runDay(Conf, Scen, Jd, StaticInputs, Split=None, PlotProcs=1, NProcs=1):
+
+    # Purpose: process one Julian Day in a worker process, capturing its
+    #          log so that the logs of the days can be displayed in order
+
+    # Parameters
+    # ==========
+    # Conf: dict
+    #         Configuration dictionary
+    # Scen: str
+    #         Path to the scenario
+    # Jd: int
+    #         Julian Day
+    # StaticInputs: dict
+    #         Input products fixed for the scenario (see readStaticInputs)
+    # Split: int or str
+    #         Satellite groups processed in parallel (see processDay)
+    # PlotProcs: int
+    #         Processes rendering the figures (see processDay)
+    # NProcs: int
+    #         Max. number of processes of the day (see processDay)
+
+    # Returns
+    # =======
+    # Log: str
+    #         Messages displayed while processing the day
+    # Error: str
+    #         Traceback of the failure (None if the day was processed)
+
+    Log = io.StringIO()
+    Error = None
+
+    with redirect_stdout(Log), redirect_stderr(Log):
+        try:
+            processDay(Conf, Scen, Jd, StaticInputs, Split, PlotProcs, NProcs)
+
+        except (Exception, SystemExit):
+            Error = traceback.format_exc()
+
+    return Log.getvalue(), Error
+
+# End of runDay()
 
-        # Display Message
-        print("INFO: Reading file: %s and generating PREPRO figures..." %
-        CorrFile)
-
-        # Generate Preprocessing plots
-        generateCorrPlots(CorrFile)
-
-# End of JD loop
+#######################################################
+# MAIN BODY
+#######################################################
 
-print( '\n------------------------------------')
-print( '--> END OF SENTUS ANALYSIS')
-print( '------------------------------------')
+if __name__ == "__main__":
+
+    # Check InputOutput Arguments
+    Scen, NJobs, Split, PlotProcs = parseArguments(sys.argv[1:])
+    if Scen is None:
+        displayUsage()
+        sys.exit()
+
+    # Select the Configuratiun file name
+    CfgFile = Scen + '/CFG/sentus.cfg'
+
+    # Read conf file
+    Conf = readConf(CfgFile)
+
+    # Process Configuration Parameters
+    Conf = processConf(Conf)
+
+    # Print header
+    print( '------------------------------------')
+    print( '--> RUNNING SENTUS:')
+    print( '------------------------------------')
+
+    # Read the input products fixed for the scenario, shared by all
+    # the days
+    StaticInputs = readStaticInputs(Conf, Scen)
+
+    # Julian Days in simulation
+    Days = list(range(Conf["INI_DATE_JD"], Conf["END_DATE_JD"] + 1))
+
+    # Share the worker processes between the days processed in parallel,
+    # the rest go to the satellite groups and figures of each day
+    if NJobs is None:
+        DayJobs = 1
+        DayProcs = os.cpu_count() or 1
+    else:
+        DayJobs = min(NJobs, len(Days))
+        DayProcs = max(NJobs // DayJobs, 1)
+
+    # If days are processed sequentially
+    #-----------------------------------------------------------------------
+    if DayJobs == 1:
+        # Loop over Julian Days in simulation
+        for Jd in Days:
+            processDay(Conf, Scen, Jd, StaticInputs, Split, PlotProcs, DayProcs)
+
+    # If days are processed in parallel
+    #-----------------------------------------------------------------------
+    else:
+        # Failed days
+        Failures = []
+
+        # Dispatch the days to the workers
+        with ProcessPoolExecutor(max_workers=DayJobs) as Pool:
+            Jobs = [Pool.submit(runDay, Conf, Scen, Jd, StaticInputs, Split, PlotProcs, 
+            DayProcs) for Jd in Days]
+
+            # Display the log of the days in order, as they are finished
+            for Jd, Job in zip(Days, Jobs):
+                try:
+                    Log, Error = Job.result()
+
+                except Exception:
+                    Log, Error = "", traceback.format_exc()
+
+                sys.stdout.write(Log)
+                sys.stdout.flush()
+
+                if Error is not None:
+                    Failures.append((Jd, Error))
+
+        # End of with ProcessPoolExecutor(...)
+
+        # Report the failed days
+        if len(Failures) > 0:
+            for Jd, Error in Failures:
+                Year, Month, Day = convertJulianDay2YearMonthDay(Jd)
+                sys.stderr.write("ERROR: Processing of Day of Year %d failed:\n%s" %
+                (convertYearMonthDay2Doy(Year, Month, Day), Error))
+
+            sys.stderr.write("ERROR: %d of %d days failed\n" % 
+            (len(Failures), len(Days)))
+            sys.exit(-1)
+
+    # End of if DayJobs == 1:
+
+    print( '\n------------------------------------')
+    print( '--> END OF SENTUS ANALYSIS')
+    print( '------------------------------------')
 
 #######################################################
 # End of Sentus.py
@@ -0,0 +1,11 @@
+########################################################################
+# conftest.py:
+# Make the SENTUS modules importable from the tests, as when the tool
+# is run from its own directory
+########################################################################
+
+import sys, os
+
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, Root)
+sys.path.insert(0, os.path.join(Root, 'COMMON'))
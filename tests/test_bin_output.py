@@ -0,0 +1,96 @@
+########################################################################
+# test_bin_output.py:
+# Binary columnar outputs written along with the text output files
+########################################################################
+
+import os
+
+import numpy as np
+
+import InputOutput
+from InputOutput import PreproIdx, PreproFmt
+from InputOutput import createBinOutput, appendBinOutput, closeBinOutput
+from InputOutput import readBinOutput, getBinOutputPath, isBinOutputUpToDate
+
+def buildRecords(NRows):
+
+    # PREPRO OBS records: the PRN labels get wider along the day
+    Records = []
+    for Row in range(NRows):
+        Record = [float(Row) for Field in PreproFmt]
+        Record[PreproIdx["SOD"]] = 30.0 * Row + 0.7
+        Record[PreproIdx["PRN"]] = "E5" if Row < 6 else "G%02d" % Row
+        Records.append(tuple(Record))
+
+    return Records
+
+def writeOutput(TextPath, Records, monkeypatch, Close=True):
+
+    # Small chunks, so that the columns are written in several pieces
+    monkeypatch.setattr(InputOutput, "BIN_OUTPUT_CHUNK_ROWS", 4)
+
+    with open(TextPath, 'w') as f:
+        f.write("# text output\n")
+
+    BinOut = createBinOutput(str(TextPath), PreproIdx, PreproFmt)
+    for Start in range(0, len(Records), 3):
+        appendBinOutput(BinOut, Records[Start:Start + 3])
+    if Close:
+        closeBinOutput(BinOut)
+
+    return BinOut
+
+def test_roundTrip(tmp_path, monkeypatch, capsys):
+    TextPath = tmp_path / "PREPRO_OBS.dat"
+    Records = buildRecords(11)
+    writeOutput(TextPath, Records, monkeypatch)
+
+    assert isBinOutputUpToDate(str(TextPath))
+    BinPath = getBinOutputPath(str(TextPath))
+    assert sorted(os.listdir(BinPath)) == sorted([Name + ".npy" for Name in PreproIdx] +
+    [InputOutput.BIN_OUTPUT_DONE])
+
+    for MemMap in [True, False]:
+        Data = readBinOutput(str(TextPath), MemMap=MemMap)
+        assert list(Data.keys()) == sorted(PreproIdx.keys())
+        for Name, Idx in PreproIdx.items():
+            Expected = [Record[Idx] for Record in Records]
+            if Name == "SOD":
+                # Same truncation as the %d text format
+                assert Data[Name].dtype == np.int64
+                np.testing.assert_array_equal(Data[Name], np.trunc(Expected))
+            elif Name == "PRN":
+                assert Data[Name].tolist() == Expected
+            else:
+                np.testing.assert_array_equal(Data[Name], Expected)
+
+def test_emptyOutput(tmp_path, monkeypatch, capsys):
+    TextPath = tmp_path / "PREPRO_OBS.dat"
+    writeOutput(TextPath, [], monkeypatch)
+
+    Data = readBinOutput(str(TextPath), ["SOD", "PRN"])
+    assert len(Data["SOD"]) == 0 and len(Data["PRN"]) == 0
+
+def test_interruptedOutput(tmp_path, monkeypatch, capsys):
+    TextPath = tmp_path / "PREPRO_OBS.dat"
+    writeOutput(TextPath, buildRecords(11), monkeypatch)
+
+    # A new run of the day interrupted before closing the output: the
+    # previous columns are not taken as up to date
+    BinOut = writeOutput(TextPath, buildRecords(9), monkeypatch, Close=False)
+    assert not isBinOutputUpToDate(str(TextPath))
+
+    # Only the chunks of the last run are joined when it is closed
+    closeBinOutput(BinOut)
+    assert isBinOutputUpToDate(str(TextPath))
+    assert len(readBinOutput(str(TextPath), ["SOD"])["SOD"]) == 9
+    assert not any(File.endswith(InputOutput.BIN_OUTPUT_CHUNK_SUFFIX)
+    for File in os.listdir(getBinOutputPath(str(TextPath))))
+
+def test_textNewerThanOutput(tmp_path, monkeypatch, capsys):
+    TextPath = tmp_path / "PREPRO_OBS.dat"
+    writeOutput(TextPath, buildRecords(5), monkeypatch)
+
+    Done = os.path.join(getBinOutputPath(str(TextPath)), InputOutput.BIN_OUTPUT_DONE)
+    os.utime(Done, (0, 0))
+    assert not isBinOutputUpToDate(str(TextPath))
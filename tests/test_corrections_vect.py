@@ -0,0 +1,260 @@
+########################################################################
+# test_corrections_vect.py:
+# Regression of the epoch-vectorized corrections engine (CORR_MODE 1)
+# against the satellite by satellite engine on a synthetic day
+########################################################################
+
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from COMMON import GnssConstants as Const
+from COMMON.Misc import buildSunTable
+from InputOutput import readLeoPos, readLeoQuat, readSatPos, readSatClk, readSatBia
+from Correction_functions import buildLeoPosStore, buildLeoAttStore
+from Correction_functions import buildSatPosStore, buildSatBiaTable, buildSatClkStore
+from Corrections import runCorrectMeas, runCorrectMeasVect
+
+YEAR = 2024
+DOY = 10
+SAMPLING_RATE = 10
+
+# Satellites of the day: the last one has no SP3, CLK nor BIA records
+SAT_LABELS = ["G01", "G05", "G12", "E03", "E19", "G30"]
+
+# Epochs of the day: SOD 300-319 have no attitude, SOD 700 is out of
+# the LEO trajectory
+LEO_SPAN = 600
+ATT_GAP = (300, 320)
+EPOCHS = list(range(100, LEO_SPAN + 1, SAMPLING_RATE)) + [LEO_SPAN + 100]
+
+# Known differences of runCorrectMeasVect with respect to runCorrectMeas
+# (the rest of the CorrInfo fields must match):
+#   * Flag: starts at 0 and is raised when the satellite is fully
+#     corrected, instead of starting at 1 and being cleared. The final
+#     flags are the same.
+#   * Norms: the flight time, geometrical range and residuals use row-wise
+#     norms of arrays, equal to the scalar ones up to rounding.
+FLOAT_TOLERANCE = OrderedDict({
+    "FlightTime": 1e-12,
+    "GEOM-RNGE": 1e-6,
+    "CodeResidual": 1e-6,
+    "PhaseResidual": 1e-6,
+})
+EXACT_FIELDS = ["Sod", "Doy", "Elevation", "Azimuth", "Flag"]
+
+def writeFile(Path, Hdr, Rows):
+
+    with open(Path, 'w') as f:
+        f.write(Hdr + "\n")
+        for Row in Rows:
+            f.write(" ".join(str(Field) for Field in Row) + "\n")
+
+    return str(Path)
+
+def satOrbit(SatLabel, Sods):
+
+    # Circular orbit of a GNSS satellite [km]
+    Seed = int(SatLabel[1:]) + (40 if SatLabel[0] == 'E' else 0)
+    Arg = 2 * np.pi * Sods / 43082.0 + 0.37 * Seed
+    Raan = 0.9 * Seed
+    Incl = 0.96
+    x = np.cos(Arg)
+    y = np.sin(Arg) * np.cos(Incl)
+    z = np.sin(Arg) * np.sin(Incl)
+    Xyz = 26560.0 * np.column_stack((np.cos(Raan)*x - np.sin(Raan)*y,
+    np.sin(Raan)*x + np.cos(Raan)*y, z))
+
+    return Xyz
+
+@pytest.fixture(scope="module")
+def Inputs(tmp_path_factory):
+
+    Dir = tmp_path_factory.mktemp("INP")
+    Inputs = OrderedDict({})
+
+    # LEO trajectory [km] and attitude, every second
+    Sods = np.arange(0, LEO_SPAN + 1)
+    Arg = 2 * np.pi * Sods / 6745.0
+    LeoFile = writeFile(Dir / "LEO_POS.dat", "#SOD DOY YEAR xCM yCM zCM",
+    [(Sod, DOY, YEAR, "%.6f" % (7700*np.cos(a)), "%.6f" % (7700*np.sin(a)*0.5),
+    "%.6f" % (7700*np.sin(a)*0.866)) for Sod, a in zip(Sods, Arg)])
+    Inputs["LeoPosInfo"] = buildLeoPosStore(readLeoPos(LeoFile))
+
+    AttSods = Sods[(Sods < ATT_GAP[0]) | (Sods >= ATT_GAP[1])]
+    Half = 1e-4 * AttSods
+    QuatFile = writeFile(Dir / "LEO_QUAT.dat", "#SOD q0 q1 q2 q3",
+    [(Sod, "%.9f" % np.cos(h), "%.9f" % (0.6*np.sin(h)), "%.9f" % (0.8*np.sin(h)),
+    "0.000000000") for Sod, h in zip(AttSods, Half)])
+    Inputs["LeoQuatInfo"] = buildLeoAttStore(readLeoQuat(QuatFile))
+
+    # SP3 positions and clocks of the GNSS satellites, every 300 s
+    Sp3Sods = np.arange(-1800, 86400 + 1800, 300)
+    PosRows = []
+    ClkRows = []
+    BiaRows = []
+    for SatLabel in SAT_LABELS[:-1]:
+        Xyz = satOrbit(SatLabel, Sp3Sods)
+        Prn = int(SatLabel[1:])
+        for Sod, Pos in zip(Sp3Sods, Xyz):
+            PosRows.append((Sod, DOY, YEAR, SatLabel[0], Prn,
+            "%.6f" % Pos[0], "%.6f" % Pos[1], "%.6f" % Pos[2]))
+            ClkRows.append((Sod, DOY, YEAR, SatLabel[0], Prn,
+            "%.6f" % (10 * Prn + 1e-3 * Sod)))
+        BiaRows.append((SatLabel[0], Prn) + tuple("%.4f" % (0.1 * Prn * k)
+        for k in range(-4, 4)))
+
+    PosFile = writeFile(Dir / "SAT_POS.dat", "#SOD DOY YEAR CONST PRN x y z", PosRows)
+    Inputs["SatPosInfo"] = buildSatPosStore(readSatPos(PosFile))
+
+    ClkFile = writeFile(Dir / "SAT_CLK.dat", "#SOD DOY YEAR CONST PRN CLK", ClkRows)
+    Inputs["SatClkInfo"] = buildSatClkStore(readSatClk(ClkFile))
+
+    BiaFile = writeFile(Dir / "SAT_BIA.dat", "CONST PRN a b c d e f g h", BiaRows)
+    Inputs["SatBiaInfo"] = buildSatBiaTable(readSatBia(BiaFile))
+
+    Inputs["SunInfo"] = buildSunTable(YEAR, DOY, SAMPLING_RATE)
+
+    return Inputs
+
+def buildConf():
+
+    Conf = OrderedDict({})
+    Conf["LEO_COM_POS"] = [1.0, 0.1, 0.2]
+    Conf["LEO_ARP_POS"] = [0.5, 0.3, -1.0]
+    Conf["LEO_PCO_GPS"] = [0.01, 0.02, 0.1]
+    Conf["LEO_PCO_GAL"] = [0.01, 0.02, 0.12]
+    Conf["GPS_UERE"] = 1.0
+    Conf["GAL_UERE"] = 1.2
+
+    return Conf
+
+def buildPreproEpoch(Sod):
+
+    # Preprocessed measurements of the epoch: G05 is not valid at odd
+    # tens of seconds
+    PreproObsInfo = OrderedDict({})
+    for iSat, SatLabel in enumerate(SAT_LABELS):
+        C1 = 2.2e7 + 1.5e3 * iSat + 0.8 * Sod
+        PreproObsInfo[SatLabel] = {
+            "Sod": float(Sod),
+            "Status": 0 if SatLabel == "G05" and (Sod // 10) % 2 else 1,
+            "Elevation": 10.0 + 7 * iSat,
+            "Azimuth": 30.0 * iSat,
+            "C1": C1,
+            "IF_C": C1 + 3.25,
+            "IF_P": C1 - 1.75,
+        }
+
+    return PreproObsInfo
+
+def buildCorrPrevInfo():
+
+    CorrPrevInfo = {}
+    for const in ['G', 'E']:
+        for prn in range(1, Const.MAX_NUM_SATS_CONSTEL + 1):
+            CorrPrevInfo["%s%02d" % (const,prn)] = {
+            "Sod_Prev": 0,
+            "SatComPos_Prev": (0, 0, 0)
+            }
+
+    return CorrPrevInfo
+
+def updateCorrPrevInfo(CorrPrevInfo, CorrInfo):
+
+    # Previous position of the corrected satellites, for the relativistic
+    # correction of the next epoch
+    for SatLabel, SatCorrInfo in CorrInfo.items():
+        if "GEOM-RNGE" in SatCorrInfo:
+            CorrPrevInfo[SatLabel]["Sod_Prev"] = SatCorrInfo["Sod"]
+            CorrPrevInfo[SatLabel]["SatComPos_Prev"] = (SatCorrInfo["SatX"],
+            SatCorrInfo["SatY"], SatCorrInfo["SatZ"])
+
+def runEngine(Engine, Inputs, Sod, CorrPrevInfo):
+
+    return Engine(YEAR, DOY, buildConf(), buildPreproEpoch(Sod),
+    Inputs["LeoPosInfo"], Inputs["LeoQuatInfo"], Inputs["SatPosInfo"],
+    Inputs["SatClkInfo"], Inputs["SatBiaInfo"],
+    Inputs["SunInfo"], CorrPrevInfo)
+
+# G30 has no ephemeris: its null position gives NaN attitudes in both engines
+@pytest.mark.filterwarnings("ignore:invalid value:RuntimeWarning")
+@pytest.mark.parametrize("WithPrev", [False, True])
+def test_vectMatchesScalar(Inputs, WithPrev):
+    # Without and with the previous satellite positions (relativistic 
+    # correction)
+    CorrPrevInfo = buildCorrPrevInfo()
+    NCorrected = 0
+    NDtr = 0
+    for Sod in EPOCHS:
+        CorrInfo, RcvrPos, _ = runEngine(runCorrectMeas, Inputs, Sod, CorrPrevInfo)
+        CorrInfoVect, RcvrPosVect, _ = runEngine(runCorrectMeasVect, Inputs, Sod,
+        CorrPrevInfo)
+        if WithPrev:
+            updateCorrPrevInfo(CorrPrevInfo, CorrInfo)
+
+        assert list(CorrInfoVect.keys()) == list(CorrInfo.keys())
+        np.testing.assert_allclose(RcvrPosVect, RcvrPos, rtol=0, atol=1e-6)
+
+        for SatLabel, SatCorrInfo in CorrInfo.items():
+            SatCorrInfoVect = CorrInfoVect[SatLabel]
+
+            # Same fields, including GEOM-RNGE only for corrected satellites
+            assert set(SatCorrInfoVect.keys()) == set(SatCorrInfo.keys())
+            NCorrected = NCorrected + ("GEOM-RNGE" in SatCorrInfo)
+            NDtr = NDtr + (SatCorrInfo["Dtr"] != 0)
+
+            for Field, Value in SatCorrInfo.items():
+                if Field in EXACT_FIELDS:
+                    assert SatCorrInfoVect[Field] == Value, (Sod, SatLabel, Field)
+                else:
+                    np.testing.assert_allclose(SatCorrInfoVect[Field], Value,
+                    rtol=1e-15, atol=FLOAT_TOLERANCE.get(Field, 1e-9),
+                    err_msg="%s %s %s" % (Sod, SatLabel, Field))
+
+    # Satellites corrected in most of the epochs, the rest are skipped
+    # for the LEO attitude or position
+    assert NCorrected > len(EPOCHS) * 3
+    assert (NDtr > len(EPOCHS) * 2) == WithPrev
+
+def test_skippedEpochs(Inputs, capsys):
+    for Sod in [ATT_GAP[0], LEO_SPAN + 100]:
+        CorrInfoVect, _, _ = runEngine(runCorrectMeasVect, Inputs, Sod, buildCorrPrevInfo())
+        assert all("GEOM-RNGE" not in SatCorrInfo for SatCorrInfo in CorrInfoVect.values())
+
+    Err = capsys.readouterr().err
+    assert "No LEO attitude at SOD %s" % float(ATT_GAP[0]) in Err
+    assert "No LEO position at SOD %s" % float(LEO_SPAN + 100) in Err
+
+@pytest.mark.filterwarnings("ignore:invalid value:RuntimeWarning")
+def test_dtrIsScalarProduct(Inputs):
+    Sod = 200
+    CorrInfo, _, _ = runEngine(runCorrectMeasVect, Inputs, Sod - SAMPLING_RATE,
+    buildCorrPrevInfo())
+
+    # Previous position of G01 only
+    CorrPrevInfo = buildCorrPrevInfo()
+    Prev = CorrInfo["G01"]
+    CorrPrevInfo["G01"]["Sod_Prev"] = Prev["Sod"]
+    CorrPrevInfo["G01"]["SatComPos_Prev"] = (Prev["SatX"], Prev["SatY"], Prev["SatZ"])
+
+    CorrInfoNoPrev, _, _ = runEngine(runCorrectMeasVect, Inputs, Sod, buildCorrPrevInfo())
+    for Engine in [runCorrectMeas, runCorrectMeasVect]:
+        CorrInfoPrev, _, _ = runEngine(Engine, Inputs, Sod, CorrPrevInfo)
+        Sat = CorrInfoPrev["G01"]
+        SatComPos = np.array([Sat["SatX"], Sat["SatY"], Sat["SatZ"]])
+
+        # Scalar -2 <r, v> / c, applied to the clock
+        Velocity = (SatComPos - np.array(CorrPrevInfo["G01"]["SatComPos_Prev"])) / \
+            (Sod - Prev["Sod"])
+        Dtr = -2 * np.dot(SatComPos, Velocity) / Const.SPEED_OF_LIGHT
+        assert np.ndim(Sat["Dtr"]) == 0 and Sat["Dtr"] != 0
+        assert Sat["Dtr"] == pytest.approx(Dtr, rel=1e-12)
+        assert Sat["SatClk"] == pytest.approx(CorrInfoNoPrev["G01"]["SatClk"] + Dtr, abs=1e-9)
+        assert Sat["CorrCode"] == pytest.approx(CorrInfoNoPrev["G01"]["CorrCode"] + Dtr, 
+        abs=1e-6)
+
+        # Fully corrected with a relativistic correction: used
+        assert Sat["Flag"] == 1
+        assert CorrInfoPrev["G12"]["Dtr"] == 0 and CorrInfoPrev["G12"]["Flag"] == 0
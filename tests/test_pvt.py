@@ -0,0 +1,122 @@
+########################################################################
+# test_pvt.py:
+# Navigation solution of synthetic epochs with a known receiver position
+########################################################################
+
+from collections import OrderedDict
+
+import numpy as np
+
+from Pvt import buildPvtEpoch, runPvt
+
+# True receiver CoM position, clock and Inter-System Bias [m]
+RCVR_POS = np.array([4.2e6, 2.1e6, 5.1e6])
+RCVR_CLK = 1234.5
+RCVR_ISB = -7.25
+
+# LEO reference position offset from the true one and its APO [m]
+REF_OFFSET = np.array([80.0, -60.0, 45.0])
+LEO_APO = np.array([0.3, -0.1, 0.8])
+
+# Satellite directions from the receiver (azimuth, elevation) [deg]
+SAT_DIRECTIONS = OrderedDict([("G01", (0, 80)), ("G04", (60, 35)),
+("G09", (150, 50)), ("G17", (250, 25)), ("E02", (20, 20)),
+("E05", (110, 65)), ("E08", (200, 40)), ("E11", (310, 55))])
+
+def buildConf():
+
+    Conf = OrderedDict({})
+    Conf["NAV_SOLUTION"] = "GPSGAL"
+    Conf["RCVR_CLK_ISB"] = 1
+    Conf["MAX_LSQ_ITER"] = 20
+    Conf["PDOP_MAX"] = 10.0
+
+    return Conf
+
+def buildCorrInfo(Sod):
+
+    # Local frame (East, North, Up) at the receiver
+    Up = RCVR_POS / np.linalg.norm(RCVR_POS)
+    East = np.cross([0, 0, 1], Up)
+    East = East / np.linalg.norm(East)
+    North = np.cross(Up, East)
+
+    CorrInfo = OrderedDict({})
+    for SatLabel, (Az, Elev) in SAT_DIRECTIONS.items():
+        Az, Elev = np.deg2rad(Az), np.deg2rad(Elev)
+        Los = np.cos(Elev) * (np.sin(Az) * East + np.cos(Az) * North) \
+        + np.sin(Elev) * Up
+        SatPos = RCVR_POS + LEO_APO + 2.2e7 * Los
+        SatApo = np.array([0.5, 0.4, -0.2])
+        Code = np.linalg.norm(SatPos - (RCVR_POS + LEO_APO)) + RCVR_CLK
+        if SatLabel[0] == "E":
+            Code = Code + RCVR_ISB
+
+        RefPos = RCVR_POS + REF_OFFSET + LEO_APO
+        CorrInfo[SatLabel] = {
+            "Sod": Sod,
+            "Flag": 1,
+            "LeoX": RefPos[0], "LeoY": RefPos[1], "LeoZ": RefPos[2],
+            "LeoApoX": LEO_APO[0], "LeoApoY": LEO_APO[1], "LeoApoZ": LEO_APO[2],
+            "SatX": SatPos[0] - SatApo[0], "SatY": SatPos[1] - SatApo[1],
+            "SatZ": SatPos[2] - SatApo[2],
+            "SatApoX": SatApo[0], "SatApoY": SatApo[1], "SatApoZ": SatApo[2],
+            "CorrCode": Code,
+            "SigmaUere": 1.0,
+            "GEOM-RNGE": 2.2e7,
+            "ClkUsed": True,
+        }
+
+    return CorrInfo
+
+def checkSolution(PosInfo, iEpoch):
+    np.testing.assert_allclose([PosInfo["X"][iEpoch], PosInfo["Y"][iEpoch],
+    PosInfo["Z"][iEpoch]], RCVR_POS, rtol=0, atol=1e-8)
+    np.testing.assert_allclose(PosInfo["RcvrClk"][iEpoch], RCVR_CLK, rtol=0, atol=1e-8)
+    np.testing.assert_allclose(PosInfo["Isb"][iEpoch], RCVR_ISB, rtol=0, atol=1e-8)
+    assert PosInfo["Flag"][iEpoch] == 1
+    assert PosInfo["NSats"][iEpoch] == len(SAT_DIRECTIONS)
+
+def test_cleanGeometry():
+    Conf = buildConf()
+    PvtEpochs = [buildPvtEpoch(Conf, buildCorrInfo(Sod)) for Sod in [0.0, 30.0]]
+    PosInfo = runPvt(Conf, 1, PvtEpochs)
+
+    for iEpoch in range(2):
+        checkSolution(PosInfo, iEpoch)
+
+    # Position errors with respect to the reference position
+    np.testing.assert_allclose(np.hypot(PosInfo["Hpe"], PosInfo["Vpe"]),
+    np.linalg.norm(REF_OFFSET), rtol=1e-9)
+
+def test_nanSatellite():
+    Conf = buildConf()
+
+    # G30 has no ephemeris: NaN position and code
+    CorrInfo = buildCorrInfo(30.0)
+    CorrInfo["G30"] = dict(CorrInfo["G01"], SatX=np.nan, SatY=np.nan,
+    SatZ=np.nan, SatApoX=np.nan, SatApoY=np.nan, SatApoZ=np.nan,
+    CorrCode=np.nan)
+    PvtEpoch = buildPvtEpoch(Conf, CorrInfo)
+    assert len(PvtEpoch["Code"]) == len(SAT_DIRECTIONS)
+
+    # The other epochs of the day are not affected
+    PosInfo = runPvt(Conf, 1, [buildPvtEpoch(Conf, buildCorrInfo(0.0)), PvtEpoch])
+    checkSolution(PosInfo, 0)
+    checkSolution(PosInfo, 1)
+
+def test_nanReferencePosition():
+    Conf = buildConf()
+
+    # An epoch without LEO reference position has no solution, the rest
+    # of the day is solved
+    CorrInfo = buildCorrInfo(30.0)
+    for SatCorrInfo in CorrInfo.values():
+        SatCorrInfo["LeoX"] = np.nan
+    PvtEpochs = [buildPvtEpoch(Conf, buildCorrInfo(0.0)),
+    buildPvtEpoch(Conf, CorrInfo)]
+    PosInfo = runPvt(Conf, 1, PvtEpochs)
+
+    checkSolution(PosInfo, 0)
+    assert PosInfo["Flag"][1] == 0
+    assert PosInfo["Pdop"][1] == 0
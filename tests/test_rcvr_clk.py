@@ -0,0 +1,92 @@
+########################################################################
+# test_rcvr_clk.py:
+# Receiver clock estimation of an epoch with outlier rejection
+########################################################################
+
+from collections import OrderedDict
+
+import numpy as np
+
+from Corrections import correctRcvrClk
+from Pvt import buildPvtEpoch
+
+RCVR_CLK = 1234.5
+
+def buildConf(OutlierThr):
+
+    Conf = OrderedDict({})
+    Conf["RCVR_CLK_ISB"] = 0
+    Conf["RCVR_CLK_OUT_THR"] = OutlierThr
+
+    return Conf
+
+def buildCorrInfo():
+
+    # Corrected satellites share the receiver clock in their residuals,
+    # except the outlier G09. E11 has not been corrected
+    Residuals = OrderedDict([("G01", 0.4), ("G04", -0.3), ("G09", 60.0),
+    ("E02", 0.2), ("E05", -0.5), ("E08", 0.1)])
+
+    CorrInfo = OrderedDict({})
+    for SatLabel, Residual in Residuals.items():
+        CorrInfo[SatLabel] = {
+            "Sod": 100.0,
+            "Flag": 1,
+            "CodeResidual": RCVR_CLK + Residual,
+            "PhaseResidual": RCVR_CLK + Residual,
+            "RcvrClk": 0.0,
+            "SigmaUere": 1.0,
+            "GEOM-RNGE": 2.2e7,
+        }
+    CorrInfo["E11"] = {"Sod": 100.0, "Flag": 0, "CodeResidual": 0.0,
+    "PhaseResidual": 0.0, "RcvrClk": 0.0, "SigmaUere": 0.0}
+
+    return CorrInfo
+
+def test_clkUsedWithoutRejection():
+    CorrInfo = correctRcvrClk(buildConf(0), buildCorrInfo())
+
+    assert all(CorrInfo[SatLabel]["ClkUsed"] for SatLabel in CorrInfo if SatLabel != "E11")
+    assert "ClkUsed" not in CorrInfo["E11"]
+
+def test_clkUsedWithRejection():
+    CorrInfo = correctRcvrClk(buildConf(3), buildCorrInfo())
+
+    # The outlier is rejected and the clock estimated with the rest
+    assert CorrInfo["G09"]["ClkUsed"] is False
+    assert CorrInfo["G09"]["Flag"] == 0
+    Used = [SatLabel for SatLabel in CorrInfo if CorrInfo[SatLabel].get("ClkUsed")]
+    assert Used == ["G01", "G04", "E02", "E05", "E08"]
+    np.testing.assert_allclose(CorrInfo["G01"]["RcvrClk"], RCVR_CLK - 0.02, atol=1e-9)
+    np.testing.assert_allclose(CorrInfo["G09"]["CodeResidual"], 60.02, atol=1e-9)
+
+def test_nanSatelliteLeftOut():
+    # G30 has no ephemeris: its residual is NaN
+    CorrInfo = buildCorrInfo()
+    CorrInfo["G30"] = dict(CorrInfo["G01"], CodeResidual=np.nan, 
+    PhaseResidual=np.nan, **{"GEOM-RNGE": np.nan})
+    CorrInfo = correctRcvrClk(buildConf(3), CorrInfo)
+
+    # The NaN stays on the satellite and does not reach the clock
+    assert CorrInfo["G30"]["ClkUsed"] is False
+    assert CorrInfo["G30"]["Flag"] == 0
+    assert np.isnan(CorrInfo["G30"]["CodeResidual"])
+    assert CorrInfo["G09"]["ClkUsed"] is False
+    for SatLabel in ["G01", "G04", "E02", "E05", "E08"]:
+        assert CorrInfo[SatLabel]["ClkUsed"]
+        np.testing.assert_allclose(CorrInfo[SatLabel]["RcvrClk"], RCVR_CLK - 0.02, 
+        atol=1e-9)
+        assert np.isfinite(CorrInfo[SatLabel]["PhaseResidual"])
+
+def test_pvtSkipsRejectedSatellites():
+    Conf = buildConf(3)
+    Conf["NAV_SOLUTION"] = "GPSGAL"
+    CorrInfo = correctRcvrClk(Conf, buildCorrInfo())
+    for SatCorrInfo in CorrInfo.values():
+        SatCorrInfo.update({Field: 1.0 for Field in ["LeoX", "LeoY", "LeoZ",
+        "LeoApoX", "LeoApoY", "LeoApoZ", "SatX", "SatY", "SatZ", "SatApoX",
+        "SatApoY", "SatApoZ", "CorrCode"]})
+
+    # Neither the outlier nor the satellite not corrected
+    PvtEpoch = buildPvtEpoch(Conf, CorrInfo)
+    assert len(PvtEpoch["Code"]) == 5
@@ -0,0 +1,77 @@
+########################################################################
+# test_sat_clk.py:
+# Satellite clock interpolation from the clock store of the day
+########################################################################
+
+from collections import OrderedDict
+
+import numpy as np
+
+from Correction_functions import buildSatClkStore
+from Correction_functions import computeSatClkBias, computeSatClkBiasVect
+
+def buildSatClkInfo():
+
+    # Per-satellite clock table, as returned by readSatClk: G05 has a
+    # single sample, G07 a gap and E11 starts late in the day
+    SatClkInfo = {}
+    Sods = np.arange(0.0, 86401.0, 300.0)
+    for iSat, SatLabel in enumerate(["G01", "G07", "G05", "E02", "E11"]):
+        Clk = 1e-4 * (iSat + 1) * np.cos(Sods / 7200.0 + iSat) * 3e8
+        Valid = np.ones(len(Sods), dtype=bool)
+        if SatLabel == "G05":
+            Valid = Sods == 3600.0
+        elif SatLabel == "G07":
+            Valid = (Sods < 30000) | (Sods > 33000)
+        elif SatLabel == "E11":
+            Valid = Sods >= 43200
+        SatClkInfo[SatLabel] = OrderedDict([("SOD", Sods[Valid]),
+        ("CLK-BIAS", Clk[Valid])])
+
+    return SatClkInfo
+
+def interpolateClk(SatClk, Sod):
+
+    # Reference: linear interpolation, 0 out of the samples
+    if SatClk is None or Sod < SatClk["SOD"][0] or Sod > SatClk["SOD"][-1]:
+        return 0.0
+
+    return np.interp(Sod, SatClk["SOD"], SatClk["CLK-BIAS"])
+
+def test_vectMatchesScalar():
+    SatClkInfo = buildSatClkInfo()
+    SatClkStore = buildSatClkStore(SatClkInfo)
+    SatLabels = ["G01", "G05", "G07", "G30", "E02", "E11"]
+
+    Sods = [-10.0, 0.0, 0.5, 150.0, 3599.9, 3600.0, 31000.0, 43199.0, 43200.0,
+    60000.25, 86400.0, 86410.0]
+    for Sod in Sods:
+        ClkBias = computeSatClkBiasVect(Sod, SatLabels, SatClkStore)
+        for iSat, SatLabel in enumerate(SatLabels):
+            Expected = interpolateClk(SatClkInfo.get(SatLabel), Sod)
+            assert ClkBias[iSat] == computeSatClkBias(Sod, SatLabel, SatClkStore)
+            np.testing.assert_allclose(ClkBias[iSat], Expected, rtol=1e-12, atol=1e-9)
+
+    # The samples are taken as they are at their own epochs
+    Sat = SatClkInfo["G01"]
+    np.testing.assert_array_equal(computeSatClkBiasVect(Sat["SOD"], ["G01"] * len(Sat["SOD"]),
+    SatClkStore), Sat["CLK-BIAS"])
+    assert computeSatClkBiasVect(3600.0, ["G05"], SatClkStore)[0] == \
+    SatClkInfo["G05"]["CLK-BIAS"][0]
+
+def test_sodPerSatellite():
+    SatClkStore = buildSatClkStore(buildSatClkInfo())
+    SatLabels = ["E11", "G01", "E11", "G07"]
+    Sods = np.array([100.0, 100.0, 50000.0, 31000.0])
+
+    ClkBias = computeSatClkBiasVect(Sods, SatLabels, SatClkStore)
+    for iSat, SatLabel in enumerate(SatLabels):
+        assert ClkBias[iSat] == computeSatClkBias(Sods[iSat], SatLabel, SatClkStore)
+    assert ClkBias[0] == 0 and ClkBias[2] != 0
+
+def test_emptyStore():
+    SatClkStore = buildSatClkStore({})
+
+    assert computeSatClkBias(100.0, "G01", SatClkStore) == 0
+    np.testing.assert_array_equal(computeSatClkBiasVect(100.0, ["G01", "E02"],
+    SatClkStore), [0, 0])
@@ -0,0 +1,102 @@
+########################################################################
+# test_sat_pos_interpolation.py:
+# Equivalence of the batched barycentric Lagrange engine with the scalar
+# 10 closest points interpolation it replaced
+########################################################################
+
+import numpy as np
+
+from Correction_functions import SP3_INTERP_POINTS
+from Correction_functions import lagrange_interpolation
+from Correction_functions import findInterpWindow
+from Correction_functions import interpolateSatPos
+from Correction_functions import computeSatComPos
+
+# SP3 sampling [s] and orbits of the synthetic satellites
+SP3_STEP = 300.0
+ORBIT_RADIUS = 26560e3
+ORBIT_PERIOD = 43082.0
+
+def buildEphemeris(SatLabels):
+
+    # SP3 ephemeris store of circular orbits with different planes and
+    # phases, sampled over a whole day
+    Sods = np.arange(0.0, 86400.0, SP3_STEP)
+    SatPosStore = {}
+    for i, SatLabel in enumerate(SatLabels):
+        Arg = 2 * np.pi * Sods / ORBIT_PERIOD + 0.7 * i
+        Incl = 0.96 + 0.05 * i
+        Xyz = ORBIT_RADIUS * np.column_stack((np.cos(Arg),
+        np.sin(Arg) * np.cos(Incl),
+        np.sin(Arg) * np.sin(Incl)))
+        SatPosStore[SatLabel] = {"SOD": Sods, "XYZ": Xyz}
+
+    return SatPosStore
+
+def interpolateClosestPoints(Time, SatEph):
+
+    # Reference scalar path: Lagrange polynomial through the 10 samples
+    # closest to the interpolation epoch
+    Closest = np.argsort(np.abs(SatEph["SOD"] - Time))[:SP3_INTERP_POINTS]
+
+    return np.array([lagrange_interpolation(Time, SatEph["SOD"][Closest],
+    SatEph["XYZ"][Closest, Axis]) for Axis in range(3)])
+
+def test_interpolateSatPosMatchesScalarPath():
+    SatLabels = ["G01", "G12", "E05"]
+    SatPosStore = buildEphemeris(SatLabels)
+    Rng = np.random.default_rng(2024)
+
+    # Random epochs, including the day edges and epochs on the nodes
+    Times = Rng.uniform(0.0, 86400.0 - SP3_STEP, 2000)
+    Times[:100] = Rng.choice(SatPosStore["G01"]["SOD"], 100)
+    Times[100:110] = Rng.uniform(0.0, SP3_STEP, 10)
+    Labels = Rng.choice(SatLabels, len(Times))
+
+    SatComPos = interpolateSatPos(Times, Labels, SatPosStore)
+
+    Expected = np.array([interpolateClosestPoints(Time, SatPosStore[Label]) 
+    for Time, Label in zip(Times, Labels)])
+    np.testing.assert_allclose(SatComPos, Expected, rtol=0, atol=1e-6)
+
+    # Epochs on a node take the sample exactly
+    Node = np.searchsorted(SatPosStore["G01"]["SOD"], Times[:100])
+    for Row in range(100):
+        np.testing.assert_array_equal(SatComPos[Row], 
+        SatPosStore[Labels[Row]]["XYZ"][Node[Row]])
+
+def test_computeSatComPosMatchesBatch():
+    SatPosStore = buildEphemeris(["G07"])
+    Times = np.array([12.5, 43200.0, 86000.25])
+
+    SatComPos = interpolateSatPos(Times, ["G07"] * len(Times), SatPosStore)
+    for Row, Time in enumerate(Times):
+        np.testing.assert_array_equal(computeSatComPos(Time, SatPosStore, "G07"),
+        SatComPos[Row])
+
+def test_interpolateSatPosShortOrUnknownEphemeris():
+    SatPosStore = buildEphemeris(["G02"])
+    for SatEph in SatPosStore.values():
+        SatEph["SOD"] = SatEph["SOD"][:6]
+        SatEph["XYZ"] = SatEph["XYZ"][:6]
+
+    # Fewer samples than the polynomial order: all of them are used
+    SatComPos = interpolateSatPos([400.0, 700.0], ["G02", "G30"], SatPosStore)
+    np.testing.assert_allclose(SatComPos[0], 
+    interpolateClosestPoints(400.0, SatPosStore["G02"]), rtol=0, atol=1e-6)
+
+    # Satellites without ephemeris are left at 0
+    np.testing.assert_array_equal(SatComPos[1], np.zeros(3))
+
+def test_findInterpWindow():
+    Times = np.arange(0.0, 3000.0, SP3_STEP)
+
+    # Centered around the epoch and clipped to the data
+    assert findInterpWindow(Times, 1510.0, 4) == (4, 8)
+    assert findInterpWindow(Times, 10.0, 4) == (0, 4)
+    assert findInterpWindow(Times, 2990.0, 4) == (6, 10)
+    assert findInterpWindow(Times, 1510.0, 20) == (0, 10)
+
+    Start, End = findInterpWindow(Times, np.array([10.0, 1510.0, 2990.0]), 4)
+    np.testing.assert_array_equal(Start, [0, 4, 6])
+    np.testing.assert_array_equal(End, [4, 8, 10])